@@ -0,0 +1,146 @@
+"""
+Parse-pool throughput benchmark — search pages parsed per second with the
+parsing in-process vs in N worker processes (utils/parse_pool.py). No
+network.
+
+Usage (from backend/scrapers):
+  python3 -m benchmarks.bench_parse_pool
+  python3 -m benchmarks.bench_parse_pool --workers 0,2,4 --rounds 40
+  python3 -m benchmarks.bench_parse_pool --output pool.json
+
+Every recorded search fixture (benchmarks/fixtures/<store>/search*) is
+parsed --rounds times by --threads threads at once, the way a busy worker
+parses pages from many concurrent searches, through
+BaseScraper._parsed_listings(). Workers 0 is the in-process baseline; a
+pool only pays off with more cores than one, so counts above cpu_count()
+are still run but flagged. Each configuration's output is checked against
+the in-process parse, and the run exits 1 on a mismatch. Before timing,
+every fixture's listings also go through a pickled ListingBatch and must
+come back with the same values of the same types.
+"""
+
+import argparse
+import glob
+import json
+import os
+import pickle
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from run_search import SCRAPERS
+from utils import parse_pool
+from utils.listing import ListingBatch, json_default
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def search_pages() -> list:
+    """(scraper, parser, body) for every search fixture."""
+    pages = []
+    for store, scraper_class in SCRAPERS.items():
+        scraper = scraper_class()
+        scraper.price_history = scraper.listing_index = None
+        for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, store, 'search*'))):
+            with open(path, encoding='utf-8') as f:
+                body = f.read()
+            parser = 'parse_api_response' if path.endswith('.json') else 'parse_search_results'
+            pages.append((scraper, parser, body))
+    return pages
+
+
+def exact(listing) -> str:
+    # repr tells True from 1 and 1 from 1.0, which == and the JSON compare let slide
+    return repr(listing.to_dict())
+
+
+def round_trip_mismatches(pages: list) -> int:
+    """Listings, over every fixture, that a pickled ListingBatch doesn't give back exactly."""
+    mismatches = 0
+    for scraper, parser, body in pages:
+        listings = scraper.parse_listings(body, parser)
+        returned = list(pickle.loads(pickle.dumps(ListingBatch(listings))))
+        if len(returned) != len(listings):
+            mismatches += max(len(returned), len(listings))
+            continue
+        mismatches += sum(exact(a) != exact(b) for a, b in zip(listings, returned))
+    return mismatches
+
+
+def run_config(workers: int, pages: list, rounds: int, threads: int, expected: list) -> dict:
+    pool = parse_pool.configure(workers)
+    if pool is not None:
+        pool.min_bytes = 0  # the fixtures are all worth shipping; measure the pool itself
+        for scraper, parser, body in pages:  # wait for the workers to spawn and warm
+            scraper._parsed_listings(body, parser)
+
+    def parse(page):
+        scraper, parser, body = page
+        started = time.perf_counter()
+        listings = scraper._parsed_listings(body, parser)
+        return time.perf_counter() - started, listings
+
+    jobs = pages * rounds
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(parse, jobs))
+    elapsed = time.perf_counter() - started
+    parse_pool.configure(0)
+
+    outputs = [json.dumps(listings, default=json_default, sort_keys=True) for _, listings in results]
+    latencies = sorted(seconds for seconds, _ in results)
+    return {
+        'workers': workers,
+        'pages': len(jobs),
+        'pages_per_sec': round(len(jobs) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+        'matches_inline': outputs == expected * rounds,
+        'oversubscribed': workers > (os.cpu_count() or 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse-pool throughput benchmark')
+    parser.add_argument('--workers', type=str, default='0,1,2,4', help='Comma-separated worker counts (0 = in-process)')
+    parser.add_argument('--rounds', type=int, default=20, help='Times every fixture is parsed per configuration')
+    parser.add_argument('--threads', type=int, default=16, help='Concurrent callers')
+    parser.add_argument('--output', type=str, help='Write JSON results here (default: stdout)')
+    args = parser.parse_args()
+
+    pages = search_pages()
+    round_trip = round_trip_mismatches(pages)
+    if round_trip:
+        print(f"ListingBatch round trip: {round_trip} listings came back changed", file=sys.stderr)
+    expected = [json.dumps(scraper.parse_listings(body, p), default=json_default, sort_keys=True)
+                for scraper, p, body in pages]
+
+    results = []
+    for workers in (int(w) for w in args.workers.split(',')):
+        r = run_config(workers, pages, max(1, args.rounds), max(1, args.threads), expected)
+        results.append(r)
+        print(f"workers {workers:>2}  {r['pages_per_sec']:>8.1f} pages/s  p50 {r['p50_ms']:>7.2f}ms"
+              f"{'  (more workers than cores)' if r['oversubscribed'] else ''}"
+              f"{'' if r['matches_inline'] else '  OUTPUT MISMATCH'}", file=sys.stderr)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'round_trip_mismatches': round_trip,
+        'results': results,
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(payload + '\n')
+    else:
+        print(payload)
+    sys.exit(0 if not round_trip and all(r['matches_inline'] for r in results) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""
+Offline parser benchmarks over recorded store pages — no network.
+
+Usage (from backend/scrapers):
+  python3 -m benchmarks.bench_parsers
+  python3 -m benchmarks.bench_parsers --output bench.json
+  python3 -m benchmarks.bench_parsers --baseline bench.json --max-regression 0.25
+
+Benchmarks every store's search parser and product-page parser (full parse
+and the early-exit streaming scan) against
+benchmarks/fixtures/<store>/, and both product paths again on ~1MB pages
+whose product block comes late (product_late: a long menu first;
+product_script: a large inline script first), plus group_products(), columnar grouping over a
+ListingBatch, parse_price(), and serializing a multi-store result in both
+wire formats (run_search.py --wire).
+For each one it records throughput, p50/p95/p99 latency and peak Python
+heap (tracemalloc — libxml2's own allocations aren't traced; the report's
+maxrss_kb covers the whole run). Results are written as JSON. With --baseline, the run exits 1 if
+any benchmark's p50 is more than --max-regression slower than the baseline.
+"""
+
+import argparse
+import fnmatch
+import gc
+import glob
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+from run_search import SCRAPERS, encode, wire_result
+from stores.base_scraper import SCAN_CHUNK_BYTES
+from utils.listing import ListingBatch
+from utils.price_parser import parse_price
+from utils.product_matcher import group_products
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Padding for the large product pages: the product block arrives after about 1MB
+LATE_PAGE_BYTES = 1_000_000
+NAV_ITEM = '<li class="nav-item"><a href="/c/{0}">Category {0}</a><ul>{1}</ul></li>'
+
+PRICE_SAMPLES = [
+    'Rs. 345,000', 'PKR 12,500', '₨ 85000', 'Rs.65,000/-', 'Rs 1,399', '245999.00',
+    '', 'Call for price', 'PKR 1,23,456', '₨ 9,999.50',
+]
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def measure(fn, min_time: float, min_iterations: int, units: int = 1) -> dict:
+    """Time fn() repeatedly; latency stats are per call, throughput per unit."""
+    fn()  # warm-up (imports, compiled selectors, caches)
+
+    timings = []
+    started = time.perf_counter()
+    while True:
+        elapsed = time.perf_counter() - started
+        # At least min_time; at least min_iterations unless each call is slow
+        if elapsed >= min_time and (len(timings) >= min_iterations or elapsed >= 5 * min_time):
+            break
+        t0 = time.perf_counter_ns()
+        fn()
+        timings.append(time.perf_counter_ns() - t0)
+    total_s = sum(timings) / 1e9
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    ms = [t / 1e6 for t in timings]
+    return {
+        'iterations': len(timings),
+        'units_per_call': units,
+        'throughput_per_s': round(len(timings) * units / total_s, 1) if total_s else 0.0,
+        'mean_ms': round(statistics.fmean(ms), 4),
+        'p50_ms': round(percentile(ms, 50), 4),
+        'p95_ms': round(percentile(ms, 95), 4),
+        'p99_ms': round(percentile(ms, 99), 4),
+        'peak_mem_kb': round(peak / 1024, 1),
+    }
+
+
+def scan_product(scraper, chunks: list) -> dict:
+    scan = scraper.PRODUCT_SPEC.scan()
+    scan.read(chunks)
+    return scraper.product_from_page(scan)
+
+
+def late_pages(body: str) -> dict:
+    """A product page with its product block pushed back ~1MB, by a menu or by an inline script."""
+    cut = body.find('<main>')
+    if cut == -1:
+        cut = body.index('<body>') + len('<body>')
+    items = []
+    size = 0
+    while size < LATE_PAGE_BYTES:
+        i = len(items)
+        item = NAV_ITEM.format(i, ''.join(f'<li><a href="/c/{i}/{j}">Sub {j}</a></li>' for j in range(8)))
+        items.append(item)
+        size += len(item)
+    nav = '<nav><ul class="mega-menu">' + ''.join(items) + '</ul></nav>'
+    script = '<script>window.__state="' + 'y' * LATE_PAGE_BYTES + '";</script>'
+    return {'product_late': body[:cut] + nav + body[cut:], 'product_script': body[:cut] + script + body[cut:]}
+
+
+def fixture_benchmarks() -> list:
+    """(name, fn, units) for every store parser and recorded fixture."""
+    benches = []
+    for store, scraper_class in SCRAPERS.items():
+        scraper = scraper_class()
+        for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, store, 'search*'))):
+            with open(path, encoding='utf-8') as f:
+                body = f.read()
+            label = os.path.splitext(os.path.basename(path))[0]
+            if path.endswith('.json'):
+                parse = scraper.parse_api_response
+            else:
+                parse = scraper.parse_search_results
+            cards = len(list(parse(body)))
+            benches.append((f'{store}.{label}', lambda parse=parse, body=body: list(parse(body)), max(cards, 1)))
+
+        product_path = os.path.join(FIXTURES_DIR, store, 'product.html')
+        if os.path.exists(product_path):
+            with open(product_path, encoding='utf-8') as f:
+                body = f.read()
+            pages = {'product': body}
+            pages.update(late_pages(body))
+            for label, page in pages.items():
+                benches.append((f'{store}.{label}', lambda s=scraper, page=page: s.parse_product_page(page), 1))
+                # The streaming check the scrapers actually run: 16KB chunks, stop once resolved
+                raw = page.encode('utf-8')
+                chunks = [raw[i:i + SCAN_CHUNK_BYTES] for i in range(0, len(raw), SCAN_CHUNK_BYTES)]
+                benches.append((f'{store}.{label}_scan', lambda s=scraper, chunks=chunks: scan_product(s, chunks), 1))
+    return benches
+
+
+def listing_pool() -> list:
+    """Every listing the search fixtures produce — input for grouping benchmarks."""
+    listings = []
+    for store, scraper_class in SCRAPERS.items():
+        scraper = scraper_class()
+        for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, store, 'search*'))):
+            with open(path, encoding='utf-8') as f:
+                body = f.read()
+            if path.endswith('.json'):
+                listings.extend(scraper.parse_api_response(body))
+            else:
+                listings.extend(scraper.parse_search_results(body))
+    return listings
+
+
+def run(min_time: float, min_iterations: int, only: str = None) -> dict:
+    benches = fixture_benchmarks()
+
+    pool = listing_pool()
+    for size in (len(pool), 500, 2000):
+        listings = (pool * (size // max(len(pool), 1) + 1))[:size]
+        benches.append((f'group_products.{size}', lambda l=listings: group_products(l), size))
+        batch = ListingBatch(listings)
+        benches.append((f'batch_group.{size}', lambda b=batch: b.best_offers(b.group()), size))
+
+    benches.append(('parse_price', lambda: [parse_price(s) for s in PRICE_SAMPLES], len(PRICE_SAMPLES)))
+
+    # Worker output for one multi-store search, in both wire formats
+    result = {'results': pool, 'stores': {}}
+    benches.append(('serialize.json', lambda: encode(result), len(pool)))
+    benches.append(('serialize.rows', lambda: encode(wire_result(result, 'rows'), compact=True), len(pool)))
+
+    results = {}
+    for name, fn, units in benches:
+        if only and not fnmatch.fnmatch(name, only):
+            continue
+        results[name] = measure(fn, min_time, min_iterations, units)
+        r = results[name]
+        print(f"{name:32} p50 {r['p50_ms']:>9.3f}ms  p99 {r['p99_ms']:>9.3f}ms  "
+              f"{r['throughput_per_s']:>11,.0f}/s  peak {r['peak_mem_kb']:>8.1f}KB", file=sys.stderr)
+    return results
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list:
+    """Benchmarks whose p50 regressed past the allowed ratio."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or not previous.get('p50_ms'):
+            continue
+        ratio = current['p50_ms'] / previous['p50_ms']
+        if ratio > 1 + max_regression:
+            regressions.append({'benchmark': name, 'baseline_p50_ms': previous['p50_ms'],
+                                'p50_ms': current['p50_ms'], 'ratio': round(ratio, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline scraper parser benchmarks')
+    parser.add_argument('--output', type=str, help='Write JSON results here (default: stdout)')
+    parser.add_argument('--baseline', type=str, help='Previous results JSON to gate against')
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help='Allowed p50 slowdown vs baseline (0.25 = 25%%)')
+    parser.add_argument('--min-time', type=float, default=1.0, help='Seconds per benchmark')
+    parser.add_argument('--min-iterations', type=int, default=20)
+    parser.add_argument('--only', type=str, help="Glob over benchmark names, e.g. '*.product' or 'daraz.*'")
+    args = parser.parse_args()
+
+    import lxml.etree
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'lxml': '.'.join(map(str, lxml.etree.LXML_VERSION)),
+        'platform': platform.platform(),
+        'results': run(args.min_time, args.min_iterations, args.only),
+    }
+    report['maxrss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        report['regressions'] = compare(report['results'], baseline, args.max_regression)
+        for r in report['regressions']:
+            print(f"REGRESSION {r['benchmark']}: p50 {r['baseline_p50_ms']}ms -> {r['p50_ms']}ms "
+                  f"(x{r['ratio']})", file=sys.stderr)
+        exit_code = 1 if report['regressions'] else 0
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(payload + '\n')
+    else:
+        print(payload)
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
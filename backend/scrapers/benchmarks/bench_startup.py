@@ -0,0 +1,146 @@
+"""
+Startup import-time benchmark — what every spawned scraper process pays
+before its first request. No network.
+
+Usage (from backend/scrapers):
+  python3 -m benchmarks.bench_startup
+  python3 -m benchmarks.bench_startup --output startup.json
+  python3 -m benchmarks.bench_startup --budget-scale 2   # slower machine
+
+Each scenario runs --runs times in a fresh interpreter under
+`python -X importtime`. Its import time is the sum of the top-level imports
+the scenario triggers (interpreter startup and site excluded); the median
+over the runs is checked against the scenario's budget. A scenario also
+fails if it loads a module it should have left for later (DEFERRED), e.g.
+`import run_search` pulling in requests or lxml. Results are written as
+JSON; the run exits 1 on any failure.
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRAPERS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MARKER = '-- bench_startup --'
+
+# name -> (code, budget in ms, modules it must not load)
+SCENARIOS = {
+    # Modes that never scrape (history, query, prewarmed, stats) stop here
+    'cli': (
+        'import run_search',
+        50, ('requests', 'asyncio', 'aiohttp', 'lxml', 'cssselect', 'stores.daraz_scraper', 'cProfile'),
+    ),
+    # Single-store blocking search: one scraper plus requests, no HTML parser (Daraz is JSON)
+    'search.daraz': (
+        "import run_search; run_search.SCRAPERS['daraz']().session",
+        200, ('asyncio', 'aiohttp', 'lxml', 'cssselect', 'stores.mega_scraper'),
+    ),
+    # Product check: one scraper, requests and the HTML parser
+    'product.mega': (
+        "import run_search; s = run_search.SCRAPERS['mega'](); s.session; s.parse_product_page('<html></html>')",
+        230, ('asyncio', 'aiohttp', 'stores.daraz_scraper'),
+    ),
+}
+
+# "import time:  self |  cumulative | <indent>module"
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def measure_once(code: str, env: dict) -> dict:
+    """One fresh interpreter: {'ms', 'modules', 'top': [(module, ms)]} for the imports after the marker."""
+    script = f'import sys; sys.stderr.write({MARKER!r} + "\\n"); {code}'
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', script],
+                          cwd=SCRAPERS_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f'scenario failed: {code}\n{proc.stderr[-2000:]}')
+    lines = proc.stderr.splitlines()
+    lines = lines[lines.index(MARKER) + 1:]
+    modules = []
+    top = []
+    for line in lines:
+        match = _LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, module = match.groups()
+        modules.append(module)
+        if not indent:
+            top.append((module, int(cumulative) / 1000))
+    return {'ms': sum(ms for _, ms in top), 'modules': modules, 'top': top}
+
+
+def run_scenario(code: str, runs: int, env: dict) -> dict:
+    measure_once(code, env)  # warm-up: writes bytecode caches, warms the OS file cache
+    samples = [measure_once(code, env) for _ in range(runs)]
+    timings = sorted(s['ms'] for s in samples)
+    heaviest = sorted(samples[-1]['top'], key=lambda t: t[1], reverse=True)[:8]
+    return {
+        'runs': runs,
+        'median_ms': round(statistics.median(timings), 2),
+        'min_ms': round(timings[0], 2),
+        'max_ms': round(timings[-1], 2),
+        'modules': len(samples[-1]['modules']),
+        'heaviest': [{'module': m, 'ms': round(ms, 2)} for m, ms in heaviest],
+        'loaded': set(samples[-1]['modules']),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scraper startup import-time benchmark')
+    parser.add_argument('--output', type=str, help='Write JSON results here (default: stdout)')
+    parser.add_argument('--runs', type=int, default=7, help='Interpreters per scenario (median is gated)')
+    parser.add_argument('--budget-scale', type=float, default=1.0,
+                        help='Multiply every budget (slower or busier machines)')
+    parser.add_argument('--only', type=str, choices=SCENARIOS.keys(), help='Run one scenario')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)  # measure imports from bytecode, as deployed
+    env['BHAO_SCRAPER_DATA_DIR'] = tempfile.mkdtemp(prefix='bhao-startup-')
+
+    results = {}
+    failures = []
+    for name, (code, budget_ms, deferred) in SCENARIOS.items():
+        if args.only and name != args.only:
+            continue
+        r = run_scenario(code, max(1, args.runs), env)
+        loaded = r.pop('loaded')
+        r['budget_ms'] = round(budget_ms * args.budget_scale, 1)
+        r['deferred_loaded'] = [m for m in deferred if m in loaded]
+        results[name] = r
+        print(f"{name:16} median {r['median_ms']:>7.1f}ms  (budget {r['budget_ms']:.0f}ms)  "
+              f"{r['modules']:>4} modules", file=sys.stderr)
+        if r['median_ms'] > r['budget_ms']:
+            failures.append(f"{name}: median {r['median_ms']}ms over budget {r['budget_ms']}ms "
+                            f"(heaviest: {', '.join(h['module'] for h in r['heaviest'][:3])})")
+        if r['deferred_loaded']:
+            failures.append(f"{name}: imports {', '.join(r['deferred_loaded'])} at startup")
+
+    for failure in failures:
+        print(f"OVER BUDGET {failure}", file=sys.stderr)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+        'failures': failures,
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(payload + '\n')
+    else:
+        print(payload)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
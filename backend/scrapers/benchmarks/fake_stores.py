@@ -0,0 +1,229 @@
+"""
+Local stand-in for the five stores, for load tests — serves the recorded
+fixtures (benchmarks/fixtures/<store>/) with realistic misbehaviour.
+
+Usage (from backend/scrapers):
+  python3 -m benchmarks.fake_stores --port 8800
+  python3 -m benchmarks.fake_stores --latency lognormal:250,0.6 --error-rate 0.02 \
+      --throttle-rps 5 --drip-fraction 0.1 --drip-kbps 32
+  python3 -m benchmarks.fake_stores --store-latency daraz=fixed:800 --store-latency mega=uniform:50,400
+
+Point the scrapers at it with BHAO_SCRAPER_STORE_ORIGIN=http://127.0.0.1:8800
+(stores/base_scraper.py). A request for a store URL then arrives as
+/<store key><path>: the store's search path gets its search fixture (the
+ajax JSON for Daraz), any other path its product page.
+
+Each response:
+  - waits a delay drawn from the store's latency distribution before the
+    headers: fixed:MS, uniform:LO,HI or lognormal:MEDIAN,SIGMA (ms);
+  - fails with a 500 with probability --error-rate;
+  - gets a 429 with Retry-After once the store is asked for more than
+    --throttle-rps requests per second (token bucket, --throttle-burst);
+  - with probability --drip-fraction, sends its body in 1KB pieces at
+    --drip-kbps instead of all at once.
+
+GET /_stats returns request counts per store and status, and resets them
+with ?reset=1.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from stores import SCRAPERS
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+DRIP_CHUNK_BYTES = 1024
+
+
+def parse_latency(spec: str):
+    """A callable returning one delay in seconds, from 'fixed:MS', 'uniform:LO,HI' or 'lognormal:MEDIAN,SIGMA'."""
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',') if v]
+    if kind == 'fixed' and len(values) == 1:
+        return lambda: values[0] / 1000
+    if kind == 'uniform' and len(values) == 2:
+        return lambda: random.uniform(*values) / 1000
+    if kind == 'lognormal' and len(values) == 2:
+        mu = math.log(max(values[0], 0.001))
+        return lambda: random.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f'bad latency spec {spec!r} (fixed:MS, uniform:LO,HI or lognormal:MEDIAN,SIGMA)')
+
+
+class Bucket:
+    """Token bucket: rate requests per second, up to burst at once."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class FakeStore:
+    def __init__(self, key: str, latency, bucket):
+        self.key = key
+        self.latency = latency
+        self.bucket = bucket
+        template = SCRAPERS[key].search_url_template
+        # '/search/{keyword}' -> '/search/', '/search?q={keyword}' -> '/search'
+        self.search_path = urlsplit(template.split('{keyword}')[0]).path
+        is_json = key == 'daraz'
+        self.search_body = self._fixture('search.json' if is_json else 'search.html')
+        self.search_type = 'application/json' if is_json else 'text/html'
+        self.product_body = self._fixture('product.html')
+
+    def _fixture(self, name: str) -> bytes:
+        with open(os.path.join(FIXTURES_DIR, self.key, name), 'rb') as f:
+            return f.read()
+
+    def page(self, path: str) -> tuple:
+        """(body, content type) for a request path (without the /<store> prefix)."""
+        if path.startswith(self.search_path):
+            return self.search_body, self.search_type
+        return self.product_body, 'text/html'
+
+
+class FakeStoreServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, stores: dict, error_rate: float, drip_fraction: float, drip_kbps: float):
+        super().__init__(address, Handler)
+        self.stores = stores
+        self.error_rate = error_rate
+        self.drip_fraction = drip_fraction
+        self.drip_kbps = drip_kbps
+        self.counts = {}
+        self.counts_lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # A scraper dropping a keep-alive connection (early close, timeout) is routine here
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    def count(self, store: str, status):
+        with self.counts_lock:
+            per_store = self.counts.setdefault(store, {})
+            per_store[str(status)] = per_store.get(str(status), 0) + 1
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real stores
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        if parts.path == '/_stats':
+            with server.counts_lock:
+                body = json.dumps(server.counts).encode()
+                if parse_qs(parts.query).get('reset'):
+                    server.counts = {}
+            return self._send(200, body, 'application/json')
+
+        key, _, rest = parts.path.lstrip('/').partition('/')
+        store = server.stores.get(key)
+        if store is None:
+            server.count('unknown', 404)
+            return self._send(404, b'unknown store', 'text/plain')
+
+        time.sleep(store.latency())
+        if store.bucket is not None and not store.bucket.take():
+            server.count(key, 429)
+            return self._send(429, b'Too Many Requests', 'text/plain', {'Retry-After': '1'})
+        if random.random() < server.error_rate:
+            server.count(key, 500)
+            return self._send(500, b'Internal Server Error', 'text/plain')
+
+        body, content_type = store.page('/' + rest)
+        server.count(key, 200)
+        self._send(200, body, content_type, drip=random.random() < server.drip_fraction)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict = None, drip: bool = False):
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            if not drip:
+                self.wfile.write(body)
+                return
+            pause = DRIP_CHUNK_BYTES / (self.server.drip_kbps * 1024)
+            for i in range(0, len(body), DRIP_CHUNK_BYTES):
+                self.wfile.write(body[i:i + DRIP_CHUNK_BYTES])
+                self.wfile.flush()
+                time.sleep(pause)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # the scraper stopped reading (early close)
+
+
+def build_server(host: str, port: int, latency: str, store_latency: list, error_rate: float,
+                 throttle_rps: float, throttle_burst: int, drip_fraction: float, drip_kbps: float):
+    overrides = dict(spec.split('=', 1) for spec in store_latency)
+    unknown = set(overrides) - set(SCRAPERS)
+    if unknown:
+        raise ValueError(f"unknown store in --store-latency: {', '.join(sorted(unknown))}")
+    stores = {
+        key: FakeStore(key, parse_latency(overrides.get(key, latency)),
+                       Bucket(throttle_rps, throttle_burst) if throttle_rps > 0 else None)
+        for key in SCRAPERS
+    }
+    return FakeStoreServer((host, port), stores, error_rate, drip_fraction, drip_kbps)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """The stand-in's options (shared with benchmarks/load_test.py)."""
+    parser.add_argument('--latency', type=str, default='lognormal:200,0.5',
+                        help='Delay before the headers: fixed:MS, uniform:LO,HI or lognormal:MEDIAN,SIGMA')
+    parser.add_argument('--store-latency', type=str, action='append', default=[],
+                        help='Per-store override, e.g. daraz=fixed:800 (repeatable)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with a 500')
+    parser.add_argument('--throttle-rps', type=float, default=0.0,
+                        help='Requests per second per store before answering 429 (0 = never)')
+    parser.add_argument('--throttle-burst', type=int, default=5, help='Requests per store allowed back-to-back')
+    parser.add_argument('--drip-fraction', type=float, default=0.0, help='Share of bodies sent slowly')
+    parser.add_argument('--drip-kbps', type=float, default=64.0, help='Speed of a slow body, in KB/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in stores serving recorded pages')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = build_server(args.host, args.port, args.latency, args.store_latency, args.error_rate,
+                          args.throttle_rps, args.throttle_burst, args.drip_fraction, args.drip_kbps)
+    print(f"Fake stores on http://{args.host}:{server.server_port} "
+          f"(BHAO_SCRAPER_STORE_ORIGIN=http://{args.host}:{server.server_port})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
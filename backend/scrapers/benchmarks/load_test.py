@@ -0,0 +1,347 @@
+"""
+End-to-end load test — run_search.py --serve workers answering searches and
+product checks at a target rate, against the stand-in stores
+(benchmarks/fake_stores.py) instead of the real ones.
+
+Usage (from backend/scrapers):
+  python3 -m benchmarks.load_test --qps 5 --duration 30
+  python3 -m benchmarks.load_test --qps 20 --processes 2 --serve-args "--engine async"
+  python3 -m benchmarks.load_test --qps 10 --latency lognormal:400,0.7 --error-rate 0.05 \
+      --throttle-rps 8 --drip-fraction 0.1 --output load.json
+  python3 -m benchmarks.load_test --origin http://127.0.0.1:8800   # stores already running
+
+Unless --origin is given, the stand-in stores run in this process (same
+options as benchmarks/fake_stores.py). --processes workers are started the
+way Node starts them, with BHAO_SCRAPER_STORE_ORIGIN pointing at the
+stand-in, a fresh temporary data directory (cold caches and history) and
+every store's rate limit scaled by --rate-limit-scale (0: off, since the
+point is to load the scraper, not to be polite to a local server).
+
+Jobs go out open-loop at --qps for --duration seconds, round-robin over the
+workers: a --product-ratio share are product checks of a store URL, the
+rest searches of --store over --distinct-keywords different keywords
+(fewer keywords: more answers from the query cache). A job's latency is
+measured from when it was due to be sent, not when it was, so a backed-up
+worker shows up in the tail instead of slowing the load down. Jobs still
+unanswered --drain seconds after the last one was sent count as timeouts.
+
+The report (JSON) has throughput, p50/p95/p99/max latency per job kind,
+failed jobs, the per-store statuses of searches, the stand-in's responses
+by status, and the workers' process count (parse-pool workers included)
+and resident memory (sum sampled across the run, and each process's peak).
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks import fake_stores
+from stores import SCRAPERS
+from stores.base_scraper import RATE_LIMIT_SCALE_ENV, STORE_ORIGIN_ENV
+
+SCRAPERS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KEYWORDS = ['iphone 15', 'samsung galaxy s24', 'airpods pro', 'dell laptop', 'gaming mouse',
+            'redmi note 13', 'sony headphones', 'power bank', 'smart watch', 'infinix hot 40']
+SAMPLE_INTERVAL = 0.5  # seconds between process/memory samples
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile of sorted values (0.0 when empty)."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+
+def latency_summary(seconds: list) -> dict:
+    values = sorted(seconds)
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 1),
+        'max_ms': round(values[-1] * 1000, 1) if values else 0.0,
+    }
+
+
+def process_tree(root: int) -> list:
+    """root and every descendant pid, from /proc."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        ppid = int(stat[stat.rindex(')') + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    pids, stack = [], [root]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, ()))
+    return pids
+
+
+def memory_kb(pid: int) -> tuple:
+    """(current, peak) resident memory of pid in KB, (0, 0) once it's gone."""
+    values = {}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith(('VmRSS:', 'VmHWM:')):
+                    values[line[:5]] = int(line.split()[1])
+    except OSError:
+        pass
+    return values.get('VmRSS', 0), values.get('VmHWM', 0)
+
+
+class Worker:
+    """One run_search.py --serve process; answers are matched to jobs by id."""
+
+    def __init__(self, env: dict, serve_args: list):
+        self.process = subprocess.Popen(
+            [sys.executable, 'run_search.py', '--serve', *serve_args],
+            cwd=SCRAPERS_DIR, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        self.write_lock = threading.Lock()
+        self.on_answer = None
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            try:
+                answer = json.loads(line)
+            except ValueError:
+                continue
+            if self.on_answer is not None and 'ok' in answer:
+                self.on_answer(answer, time.perf_counter())
+
+    def send(self, job: dict):
+        with self.write_lock:
+            self.process.stdin.write(json.dumps(job) + '\n')
+            self.process.stdin.flush()
+
+    def stop(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def start_workers(count: int, origin: str, rate_limit_scale: float, data_dir: str, serve_args: list) -> list:
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    env[STORE_ORIGIN_ENV] = origin
+    env[RATE_LIMIT_SCALE_ENV] = str(rate_limit_scale)
+    env['BHAO_SCRAPER_DATA_DIR'] = data_dir
+    workers = [Worker(env, serve_args) for _ in range(count)]
+
+    # Ready once a stats job comes back: imports done, before the clock starts
+    ready = threading.Semaphore(0)
+    for worker in workers:
+        worker.on_answer = lambda answer, at: ready.release()
+        worker.send({'id': 'ready', 'mode': 'stats'})
+    for worker in workers:
+        if not ready.acquire(timeout=60):
+            raise RuntimeError('a worker did not start within 60s')
+    return workers
+
+
+def job_stream(store: str, product_ratio: float, distinct_keywords: int):
+    """Endless (kind, job) pairs: product checks spread over every store, searches over the keyword pool."""
+    stores = itertools.cycle(SCRAPERS)
+    for n in itertools.count():
+        if int((n + 1) * product_ratio) > int(n * product_ratio):
+            key = next(stores)
+            url = f"{SCRAPERS[key].base_url}/load-test-product-{n}"
+            yield 'product', {'mode': 'product', 'store': key, 'url': url}
+        else:
+            base = KEYWORDS[n % len(KEYWORDS)]
+            pool = n % max(1, distinct_keywords)
+            keyword = base if pool < len(KEYWORDS) else f'{base} {pool}'
+            yield 'search', {'mode': 'search', 'store': store, 'keyword': keyword}
+
+
+def run_load(workers: list, qps: float, duration: float, drain: float, jobs) -> dict:
+    sent = {}  # id -> (kind, due time)
+    answers = {}  # id -> (answered time, answer)
+    lock = threading.Lock()
+    all_answered = threading.Event()
+    finished_sending = threading.Event()
+
+    def on_answer(answer, at):
+        with lock:
+            if answer.get('id') in sent and answer['id'] not in answers:
+                answers[answer['id']] = (at, answer)
+                if finished_sending.is_set() and len(answers) == len(sent):
+                    all_answered.set()
+
+    for worker in workers:
+        worker.on_answer = on_answer
+
+    samples = []
+    stop_sampling = threading.Event()
+
+    def sample():
+        while not stop_sampling.wait(SAMPLE_INTERVAL):
+            pids = [pid for worker in workers for pid in process_tree(worker.process.pid)]
+            samples.append((len(pids), sum(memory_kb(pid)[0] for pid in pids)))
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+
+    interval = 1.0 / qps
+    started = time.perf_counter()
+    total = int(duration * qps)
+    late = 0
+    for n, (kind, job) in zip(range(total), jobs):
+        due = started + n * interval
+        wait = due - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        elif wait < -interval:
+            late += 1
+        job_id = str(n)
+        with lock:
+            sent[job_id] = (kind, due)
+        workers[n % len(workers)].send({'id': job_id, **job})
+    sent_at = time.perf_counter()
+    with lock:
+        finished_sending.set()
+        if len(answers) == len(sent):
+            all_answered.set()
+    all_answered.wait(drain)
+    ended = time.perf_counter()
+
+    peaks = {pid: memory_kb(pid)[1] for worker in workers for pid in process_tree(worker.process.pid)}
+    stop_sampling.set()
+    sampler.join()
+
+    with lock:
+        sent, answers = dict(sent), dict(answers)
+    latencies = {}
+    failed = {}
+    store_statuses = {}
+    for job_id, (kind, due) in sent.items():
+        if job_id not in answers:
+            failed[kind] = failed.get(kind, 0) + 1
+            continue
+        at, answer = answers[job_id]
+        latencies.setdefault(kind, []).append(at - due)
+        if not answer.get('ok'):
+            failed[kind] = failed.get(kind, 0) + 1
+        result = answer.get('result')
+        if kind == 'search' and isinstance(result, dict):
+            for store, status in (result.get('stores') or {}).items():
+                counts = store_statuses.setdefault(store, {})
+                counts[status.get('status')] = counts.get(status.get('status'), 0) + 1
+
+    all_latencies = [s for values in latencies.values() for s in values]
+    return {
+        'jobs_sent': len(sent),
+        'jobs_answered': len(answers),
+        'jobs_unanswered': len(sent) - len(answers),
+        'jobs_failed': failed,
+        'sent_late': late,
+        'send_seconds': round(sent_at - started, 2),
+        'elapsed_seconds': round(ended - started, 2),
+        'throughput_qps': round(len(answers) / (ended - started), 2),
+        'latency': latency_summary(all_latencies),
+        'latency_by_kind': {kind: latency_summary(values) for kind, values in sorted(latencies.items())},
+        'search_store_statuses': store_statuses,
+        'processes': max((count for count, _ in samples), default=len(peaks)),
+        'rss_mb': {
+            'sum_peak': round(max((rss for _, rss in samples), default=0) / 1024, 1),
+            'sum_final': round(samples[-1][1] / 1024, 1) if samples else 0.0,
+            'per_process_peak': round(max(peaks.values(), default=0) / 1024, 1),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end load test against stand-in stores')
+    parser.add_argument('--qps', type=float, default=5.0, help='Jobs sent per second')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to send jobs for')
+    parser.add_argument('--drain', type=float, default=30.0, help='Seconds to wait for answers after the last job')
+    parser.add_argument('--processes', type=int, default=1, help='run_search.py --serve workers')
+    parser.add_argument('--serve-args', type=str, default='', help='Extra worker options, e.g. "--engine async"')
+    parser.add_argument('--store', type=str, default='all', help='Store(s) searched: a key, comma-separated keys or all')
+    parser.add_argument('--product-ratio', type=float, default=0.2, help='Share of jobs that are product checks')
+    parser.add_argument('--distinct-keywords', type=int, default=1000, help='Different search keywords sent')
+    parser.add_argument('--rate-limit-scale', type=float, default=0.0,
+                        help='Scale every store rate limit by this (0 = none, 1 = production)')
+    parser.add_argument('--origin', type=str, help='Use stand-in stores already running here')
+    parser.add_argument('--port', type=int, default=0, help='Port for the in-process stand-in (0 = any free port)')
+    fake_stores.add_arguments(parser)
+    parser.add_argument('--output', type=str, help='Write JSON results here (default: stdout)')
+    args = parser.parse_args()
+    if args.qps <= 0 or args.duration <= 0:
+        parser.error('--qps and --duration must be positive')
+
+    server = None
+    origin = args.origin
+    if not origin:
+        server = fake_stores.build_server('127.0.0.1', args.port, args.latency, args.store_latency, args.error_rate,
+                                          args.throttle_rps, args.throttle_burst, args.drip_fraction, args.drip_kbps)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        origin = f'http://127.0.0.1:{server.server_port}'
+
+    data_dir = tempfile.mkdtemp(prefix='bhao-load-')
+    workers = []
+    try:
+        workers = start_workers(max(1, args.processes), origin, args.rate_limit_scale, data_dir,
+                                shlex.split(args.serve_args))
+        if server is not None:
+            with server.counts_lock:
+                server.counts = {}
+        print(f"Sending {int(args.duration * args.qps)} jobs at {args.qps:g}/s to {len(workers)} worker(s) "
+              f"against {origin}", file=sys.stderr)
+        result = run_load(workers, args.qps, args.duration, args.drain,
+                          job_stream(args.store, args.product_ratio, args.distinct_keywords))
+    finally:
+        for worker in workers:
+            worker.stop()
+        if server is not None:
+            server.shutdown()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    if server is not None:
+        result['upstream_responses'] = server.counts
+    latency = result['latency']
+    print(f"{result['throughput_qps']:.2f} jobs/s  p50 {latency['p50_ms']:.0f}ms  p95 {latency['p95_ms']:.0f}ms  "
+          f"p99 {latency['p99_ms']:.0f}ms  unanswered {result['jobs_unanswered']}  "
+          f"{result['processes']} processes  {result['rss_mb']['sum_peak']:.0f}MB peak RSS", file=sys.stderr)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {k: v for k, v in vars(args).items() if k != 'output'},
+        'result': result,
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(payload + '\n')
+    else:
+        print(payload)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Re-record benchmark fixtures from the live stores.
+
+Usage (from backend/scrapers):
+  python3 -m benchmarks.record_fixtures --keyword "iPhone 15"
+  python3 -m benchmarks.record_fixtures --keyword "iPhone 15" --store daraz
+
+Writes fixtures/<store>/search.html (search.json for Daraz's ajax API) and
+fixtures/<store>/product.html for the first product found. Goes through
+the normal scraper fetch path, so store rate limits apply.
+"""
+
+import argparse
+import os
+import sys
+from urllib.parse import quote
+
+from run_search import SCRAPERS
+from benchmarks.bench_parsers import FIXTURES_DIR
+
+
+def record(store: str, keyword: str):
+    scraper = SCRAPERS[store]()
+    url = scraper.search_url_template.format(keyword=quote(keyword))
+    out_dir = os.path.join(FIXTURES_DIR, store)
+    os.makedirs(out_dir, exist_ok=True)
+
+    if store == 'daraz':
+        response = scraper.session.get(url, headers=scraper._api_headers(), timeout=scraper.request_timeout)
+        response.raise_for_status()
+        body, search_file = response.text, 'search.json'
+        products = scraper.parse_api_response(body)
+    else:
+        body, search_file = scraper.fetch(url), 'search.html'
+        products = list(scraper.parse_search_results(body))
+
+    with open(os.path.join(out_dir, search_file), 'w', encoding='utf-8') as f:
+        f.write(body)
+    print(f"{store}: {search_file} ({len(body):,} bytes, {len(products)} products)", file=sys.stderr)
+
+    product_url = next((p['url'] for p in products if p.get('url')), None)
+    if product_url:
+        html = scraper.fetch(product_url)
+        with open(os.path.join(out_dir, 'product.html'), 'w', encoding='utf-8') as f:
+            f.write(html)
+        print(f"{store}: product.html ({len(html):,} bytes) from {product_url}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record benchmark fixtures from live stores')
+    parser.add_argument('--keyword', type=str, default='iPhone 15')
+    parser.add_argument('--store', type=str, choices=SCRAPERS.keys(), help='Only this store')
+    args = parser.parse_args()
+
+    for store in ([args.store] if args.store else SCRAPERS):
+        try:
+            record(store, args.keyword)
+        except Exception as e:
+            print(f"{store}: failed to record ({e})", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
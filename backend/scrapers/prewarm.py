@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Background prewarmer for popular searches.
+
+Usage:
+  python3 prewarm.py                        # run until interrupted
+  python3 prewarm.py --once                 # refresh whatever is due, then exit
+  python3 prewarm.py --db ../prisma/dev.db --max-age 3600 --window-days 7
+
+Popular queries are read from the backend's SearchHistory table. Each one
+gets a priority of
+
+  popularity × staleness
+  popularity = searches for it in the last --window-days
+  staleness  = age of its stored result / --max-age (never fetched: STALENESS_CAP)
+
+and the crawler refreshes the highest priority first, as soon as a result
+passes REFRESH_AT of --max-age. A popular result is therefore replaced
+well before Node would treat it as expired.
+
+It shares the stores' rate limiters with live searches (same SQLite
+buckets) and yields to them: before each refresh it waits until no store
+has more than MAX_BACKLOG seconds of requests already queued.
+
+Results are saved with utils/search_results.py. Node reads them on a Redis
+miss with a {"mode": "prewarmed", "keyword": ...} worker job.
+"""
+
+import argparse
+import heapq
+import os
+import sqlite3
+import sys
+import time
+
+from run_search import MULTI_STORE_TIMEOUT, SCRAPERS, link_catalog, search_stores
+from utils.catalog import Catalog
+from utils.search_results import normalize_query, shared_search_results
+
+PRISMA_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'prisma', 'dev.db')
+
+MAX_AGE = 3600.0  # seconds — matches the backend's Redis TTL for searches
+REFRESH_AT = 0.5  # refresh once a result is this far into MAX_AGE
+STALENESS_CAP = 4.0  # staleness of a query that has never been fetched
+WINDOW_DAYS = 7.0
+TOP_QUERIES = 200  # most popular queries considered per pass
+MIN_SEARCHES = 2  # one-off queries aren't worth prewarming
+MAX_BACKLOG = 4.0  # seconds of queued requests on any store before we back off
+POLL_SECONDS = 60.0  # re-read search history at least this often
+
+# Prisma stores DateTime as epoch milliseconds; rows written with the
+# column default are text timestamps instead
+_POPULAR_SQL = '''
+SELECT lower(trim(query)) AS q, COUNT(*) AS n
+FROM SearchHistory
+WHERE CASE typeof(createdAt)
+          WHEN 'integer' THEN createdAt
+          WHEN 'real' THEN createdAt
+          ELSE CAST(strftime('%s', createdAt) AS INTEGER) * 1000
+      END >= ?
+  AND trim(query) != ''
+GROUP BY q
+HAVING n >= ?
+ORDER BY n DESC
+LIMIT ?
+'''
+
+
+def load_popularity(db_path: str, window_days: float = WINDOW_DAYS, limit: int = TOP_QUERIES,
+                    min_searches: int = MIN_SEARCHES, now: float = None) -> dict:
+    """{normalized query: searches in the window} from SearchHistory (read-only)."""
+    since_ms = int(((now if now is not None else time.time()) - window_days * 86400) * 1000)
+    conn = sqlite3.connect(f'file:{os.path.abspath(db_path)}?mode=ro', uri=True, timeout=30)
+    try:
+        rows = conn.execute(_POPULAR_SQL, (since_ms, min_searches, limit)).fetchall()
+    finally:
+        conn.close()
+    return {normalize_query(query): count for query, count in rows}
+
+
+def build_queue(popularity: dict, fetched_at: dict, max_age: float = MAX_AGE, now: float = None) -> list:
+    """Heap of (-priority, query) for every query that is due for a refresh."""
+    now = now if now is not None else time.time()
+    queue = []
+    for query, count in popularity.items():
+        if query in fetched_at:
+            age = now - fetched_at[query]
+            if age < max_age * REFRESH_AT:
+                continue
+            staleness = min(age / max_age, STALENESS_CAP)
+        else:
+            staleness = STALENESS_CAP
+        queue.append((-(count * staleness), query))
+    heapq.heapify(queue)
+    return queue
+
+
+def next_due(popularity: dict, fetched_at: dict, max_age: float = MAX_AGE, now: float = None) -> float:
+    """Seconds until the next query comes due (0 if one already is)."""
+    now = now if now is not None else time.time()
+    waits = [max(0.0, fetched_at.get(query, 0) + max_age * REFRESH_AT - now) for query in popularity]
+    return min(waits) if waits else float('inf')
+
+
+def wait_for_budget(scrapers: dict, max_backlog: float = MAX_BACKLOG):
+    """Block until live traffic leaves every store's rate limiter some room."""
+    while True:
+        backlog = max((s.rate_limiter.backlog() for s in scrapers.values()), default=0.0)
+        if backlog <= max_backlog:
+            return
+        time.sleep(min(backlog - max_backlog + 0.5, POLL_SECONDS))
+
+
+def refresh(query: str, scrapers: dict, catalog: Catalog, results, pages: int = None,
+            timeout: float = MULTI_STORE_TIMEOUT):
+    """
+    Scrape one query across every store and store the result. Returns
+    (result, saved). When every store failed nothing is saved, so the last
+    good result keeps being served.
+    """
+    result = search_stores(scrapers, query, timeout=timeout, pages=pages)
+    link_catalog(catalog, result)
+    saved = any(s['status'] == 'ok' for s in result['stores'].values())
+    if saved:
+        results.put(query, result)
+    return result, saved
+
+
+def run(db_path: str, max_age: float = MAX_AGE, window_days: float = WINDOW_DAYS, pages: int = None,
+        max_backlog: float = MAX_BACKLOG, once: bool = False):
+    scrapers = {store: cls() for store, cls in SCRAPERS.items()}
+    catalog = Catalog()
+    results = shared_search_results()
+    failed_at = {}  # query -> last attempt that saved nothing; retried like a stale result
+
+    while True:
+        try:
+            popularity = load_popularity(db_path, window_days)
+        except sqlite3.Error as e:
+            print(f"Prewarm: can't read search history from {db_path} ({e})", file=sys.stderr)
+            popularity = {}
+        queue = build_queue(popularity, {**results.fetched_at(popularity), **failed_at}, max_age)
+
+        pass_started = time.monotonic()
+        refreshed = 0
+        while queue and (once or time.monotonic() - pass_started < POLL_SECONDS):
+            neg_priority, query = heapq.heappop(queue)
+            wait_for_budget(scrapers, max_backlog)
+            started = time.monotonic()
+            result, saved = refresh(query, scrapers, catalog, results, pages=pages)
+            if saved:
+                refreshed += 1
+                failed_at.pop(query, None)
+            else:
+                failed_at[query] = time.time()
+            print(f"Prewarm: {query!r} (priority {-neg_priority:.1f}, {popularity[query]} searches): "
+                  f"{len(result['results'])} results in {time.monotonic() - started:.1f}s"
+                  f"{'' if saved else ', every store failed'}", file=sys.stderr)
+
+        if once:
+            print(f"Prewarm: {refreshed} queries refreshed, {len(popularity)} popular", file=sys.stderr)
+            return
+        if not queue:
+            due = next_due(popularity, {**results.fetched_at(popularity), **failed_at}, max_age)
+            time.sleep(min(max(due, 1.0), POLL_SECONDS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bhao.pk search prewarmer')
+    parser.add_argument('--db', type=str, default=PRISMA_DB, help='Prisma SQLite database with SearchHistory')
+    parser.add_argument('--max-age', type=float, default=MAX_AGE,
+                        help='Seconds a stored result stays valid; refreshed at half of this')
+    parser.add_argument('--window-days', type=float, default=WINDOW_DAYS,
+                        help='How far back search history counts towards popularity')
+    parser.add_argument('--pages', type=int, default=None, help='Results pages per store')
+    parser.add_argument('--max-backlog', type=float, default=MAX_BACKLOG,
+                        help="Back off while any store's rate limiter has more than this many seconds queued")
+    parser.add_argument('--once', action='store_true', help='Refresh what is due, then exit')
+    args = parser.parse_args()
+
+    try:
+        run(args.db, max_age=args.max_age, window_days=args.window_days, pages=args.pages,
+            max_backlog=args.max_backlog, once=args.once)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
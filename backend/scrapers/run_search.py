@@ -5,53 +5,955 @@ Called by Node.js via child_process.spawn.
 
 Usage:
   python3 run_search.py --keyword "iPhone 15" --store daraz
+  python3 run_search.py --keyword "iPhone 15" --store all --stream
   python3 run_search.py --url "https://daraz.pk/..." --store daraz --mode product
+  python3 run_search.py --mode batch --input jobs.ndjson
+  python3 run_search.py --serve --engine async
 
-Outputs JSON to stdout.
+Outputs JSON to stdout; see --help for the other modes and options.
 """
 
 import argparse
 import json
+import os
+import queue
+import sqlite3
 import sys
+import threading
+import time
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
 
-from stores.daraz_scraper import DarazScraper
-from stores.telemart_scraper import TelemartScraper
-from stores.shophive_scraper import ShophiveScraper
-from stores.mega_scraper import MegaScraper
-from stores.priceoye_scraper import PriceOyeScraper
+from stores import SCRAPERS
+from utils import metrics, parse_pool
+from utils.catalog import Catalog
+from utils.http_cache import normalize_url, shared_cache
+from utils.listing import json_default, to_rows
+from utils.listing_index import shared_index
+from utils.paths import data_path
+from utils.price_history import shared_history
+from utils.query_cache import shared_query_cache
+from utils.search_results import normalize_query, shared_search_results
+from utils.store_health import StoreUnavailable, store_health
 
 
-SCRAPERS = {
-    'daraz': DarazScraper,
-    'telemart': TelemartScraper,
-    'shophive': ShophiveScraper,
-    'mega': MegaScraper,
-    'priceoye': PriceOyeScraper,
-}
+SERVE_WORKERS = 16
+BATCH_PER_STORE = 2  # product checks in flight per store in --mode batch
+MULTI_STORE_TIMEOUT = 25.0  # seconds — stays under Node's 30s SCRAPER_TIMEOUT
+PREWARMED_MAX_AGE = 3600.0  # oldest prewarmed result a "prewarmed" job returns
+INDEX_QUERY_LIMIT = 100  # results a --mode query answer returns
+TIMEOUT = object()  # store_status() error for a store that missed the deadline
+WIRE_FORMATS = ('json', 'rows')  # how search results are written (see --wire)
+LOCAL_MODES = ('query', 'prewarmed', 'history')  # worker jobs answered from local storage, no scraping
+
+
+def resolve_stores(value: str) -> list:
+    """Turn 'all', 'daraz' or 'daraz,mega' into a list of store keys."""
+    if value == 'all':
+        return list(SCRAPERS.keys())
+    stores = [s.strip() for s in value.split(',') if s.strip()]
+    unknown = [s for s in stores if s not in SCRAPERS]
+    if unknown or not stores:
+        raise ValueError(f"Unknown store: {', '.join(unknown) or repr(value)}")
+    return stores
+
+
+def store_status(store: str, scraper, count: int, error, elapsed: float) -> dict:
+    """
+    One store's entry in "stores": status ok, error, unavailable (circuit
+    breaker open, the store wasn't contacted) or timeout (error=TIMEOUT),
+    plus the breaker's state after the search.
+    """
+    status = {'status': 'ok', 'count': count, 'elapsed': round(elapsed, 3)}
+    if error is TIMEOUT:
+        status['status'] = 'timeout'
+    elif error is not None:
+        print(f"Scraper error ({store}): {error}", file=sys.stderr)
+        status.update(status='unavailable' if isinstance(error, StoreUnavailable) else 'error', error=str(error))
+    status['breaker'] = scraper.health.state()
+    return status
+
+
+def _merge_outcomes(scrapers: dict, outcomes: dict, timeout: float) -> dict:
+    """
+    Build the multi-store payload from {store: (products, error, elapsed)}.
+    Stores missing from outcomes didn't answer before the deadline.
+    """
+    results = []
+    status = {}
+    # Merge in request order so output is stable regardless of finish order
+    for store, scraper in scrapers.items():
+        if store not in outcomes:
+            status[store] = store_status(store, scraper, 0, TIMEOUT, timeout)
+            continue
+        products, error, elapsed = outcomes[store]
+        status[store] = store_status(store, scraper, len(products), error, elapsed)
+        results.extend(products)
+    return {'results': results, 'stores': status}
+
+
+def search_stores(scrapers: dict, keyword: str, timeout: float = MULTI_STORE_TIMEOUT, pages: int = None) -> dict:
+    """
+    Run every store's search concurrently and merge the results.
+    Wall time is bounded by the slowest store (or the timeout); stores that
+    fail or don't answer in time are reported instead of failing the search.
+    """
+    if not keyword:
+        return {'results': [], 'stores': {}}
+
+    finished = queue.Queue()
+
+    def run(store, scraper):
+        started = time.monotonic()
+        try:
+            products = scraper.search(keyword, pages)
+            finished.put((store, (products, None, time.monotonic() - started)))
+        except Exception as e:
+            finished.put((store, ([], e, time.monotonic() - started)))
+
+    # Daemon threads so a hung store can't keep the process alive after we answer
+    for store, scraper in scrapers.items():
+        threading.Thread(target=metrics.bind(run), args=(store, scraper), daemon=True).start()
+
+    deadline = time.monotonic() + timeout
+    outcomes = {}
+    while len(outcomes) < len(scrapers):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            store, outcome = finished.get(timeout=remaining)
+        except queue.Empty:
+            break
+        outcomes[store] = outcome
+
+    return _merge_outcomes(scrapers, outcomes, timeout)
+
+
+async def asearch_stores(scrapers: dict, keyword: str, timeout: float = MULTI_STORE_TIMEOUT,
+                         pages: int = None) -> dict:
+    """asyncio variant of search_stores() — one event loop, no thread per store."""
+    import asyncio
+
+    if not keyword:
+        return {'results': [], 'stores': {}}
+
+    async def run(scraper):
+        started = time.monotonic()
+        try:
+            return await scraper.asearch(keyword, pages), None, time.monotonic() - started
+        except Exception as e:
+            return [], e, time.monotonic() - started
+
+    tasks = {store: asyncio.ensure_future(run(scraper)) for store, scraper in scrapers.items()}
+    await asyncio.wait(list(tasks.values()), timeout=timeout)
+
+    outcomes = {}
+    for store, task in tasks.items():
+        if task.done():
+            outcomes[store] = task.result()
+        else:
+            task.cancel()
+    return _merge_outcomes(scrapers, outcomes, timeout)
+
+
+def stream_stores(scrapers: dict, keyword: str, emit, timeout: float = MULTI_STORE_TIMEOUT, link=None,
+                  pages: int = None) -> dict:
+    """
+    search_stores(), streamed: emit() a product event for every listing as
+    soon as its store has parsed it, and a store event as each store
+    finishes, so fast stores aren't held back by slow ones. link, if given,
+    is called with each one-listing list before it goes out (catalog ids).
+    Stores that miss the deadline get a timeout event and emit nothing more.
+    Returns {'count', 'stores'} with the same per-store status as
+    search_stores().
+    """
+    status = {}
+    if not keyword:
+        return {'count': 0, 'stores': status}
+
+    open_stores = set(scrapers)
+    lock = threading.Lock()
+    all_done = threading.Event()
+
+    def close(store: str, final: dict):
+        # Caller holds lock
+        open_stores.discard(store)
+        status[store] = final
+        emit({'event': 'store', 'store': store, **final})
+        if not open_stores:
+            all_done.set()
+
+    def run(store, scraper):
+        started = time.monotonic()
+        count = 0
+        error = None
+        try:
+            for listing in scraper.iter_search(keyword, pages):
+                if link is not None:
+                    link([listing])
+                with lock:
+                    if store not in open_stores:
+                        return
+                    emit({'event': 'product', 'store': store, 'product': listing})
+                count += 1
+        except Exception as e:
+            error = e
+        finished = store_status(store, scraper, count, error, time.monotonic() - started)
+        with lock:
+            if store in open_stores:
+                close(store, finished)
+
+    for store, scraper in scrapers.items():
+        threading.Thread(target=metrics.bind(run), args=(store, scraper), daemon=True).start()
+
+    all_done.wait(timeout)
+    with lock:
+        for store in [s for s in scrapers if s in open_stores]:
+            close(store, store_status(store, scrapers[store], 0, TIMEOUT, timeout))
+
+    return {'count': sum(s['count'] for s in status.values()),
+            'stores': {store: status[store] for store in scrapers}}
+
+
+async def astream_stores(scrapers: dict, keyword: str, emit, timeout: float = MULTI_STORE_TIMEOUT,
+                         link=None, pages: int = None) -> dict:
+    """
+    asyncio variant of stream_stores(). asearch() parses a whole page in the
+    executor, so each store's products go out together when it finishes.
+    """
+    import asyncio
+
+    status = {}
+    if not keyword:
+        return {'count': 0, 'stores': status}
+
+    loop = asyncio.get_running_loop()
+
+    async def run(store, scraper):
+        started = time.monotonic()
+        try:
+            products = await scraper.asearch(keyword, pages)
+            if link is not None:
+                await loop.run_in_executor(None, metrics.bind(link), products)
+        except Exception as e:
+            status[store] = store_status(store, scraper, 0, e, time.monotonic() - started)
+        else:
+            for listing in products:
+                emit({'event': 'product', 'store': store, 'product': listing})
+            status[store] = store_status(store, scraper, len(products), None, time.monotonic() - started)
+        emit({'event': 'store', 'store': store, **status[store]})
+
+    tasks = [asyncio.ensure_future(run(store, scraper)) for store, scraper in scrapers.items()]
+    await asyncio.wait(tasks, timeout=timeout)
+    for task in tasks:
+        task.cancel()
+    for store in scrapers:
+        if store not in status:
+            status[store] = store_status(store, scrapers[store], 0, TIMEOUT, timeout)
+            emit({'event': 'store', 'store': store, **status[store]})
+
+    return {'count': sum(s['count'] for s in status.values()),
+            'stores': {store: status[store] for store in scrapers}}
+
+
+def query_index(keyword: str, stores: list, limit: int = INDEX_QUERY_LIMIT) -> dict:
+    """
+    Answer a keyword from the local listing index, no scraping:
+    {'results', 'count', 'age', 'stale'} (see utils/listing_index.py).
+    """
+    return shared_index().query(keyword, stores=[SCRAPERS.store_name(s) for s in stores], limit=limit)
+
+
+def needs_refresh(answer: dict) -> bool:
+    return answer['stale'] or answer['count'] == 0
+
+
+def store_health_report() -> dict:
+    """{store: {'breaker', 'p95'}} for every store, from the shared health state."""
+    return {store: store_health(SCRAPERS.store_name(store).lower()).report() for store in SCRAPERS}
+
+
+def link_catalog(catalog: Catalog, result):
+    """Tag search results with their canonical productId (best effort)."""
+    listings = result.get('results', []) if isinstance(result, dict) else result
+    try:
+        product_ids = catalog.match(listings)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Catalog unavailable ({e}), results not linked", file=sys.stderr)
+        return result
+    for listing, product_id in zip(listings, product_ids):
+        listing['productId'] = product_id
+    return result
+
+
+def run_job(scraper, mode: str, keyword: str = None, url: str = None, pages: int = None):
+    """Run one search or product job against a scraper instance."""
+    if mode == 'product' and url:
+        return scraper.scrape_product_page(url)
+    if keyword:
+        return scraper.search(keyword, pages)
+    return []
+
+
+async def arun_job(scraper, mode: str, keyword: str = None, url: str = None, pages: int = None):
+    """asyncio variant of run_job()."""
+    if mode == 'product' and url:
+        return await scraper.ascrape_product_page(url)
+    if keyword:
+        return await scraper.asearch(keyword, pages)
+    return []
+
+
+def read_batch_jobs(lines) -> list:
+    """Parse NDJSON batch jobs; unusable lines come back as {'id', 'error'}."""
+    jobs = []
+    for n, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError:
+            jobs.append({'id': None, 'error': f'Invalid JSON job on line {n}'})
+            continue
+        if not isinstance(job, dict):
+            jobs.append({'id': None, 'error': f'Invalid JSON job on line {n}'})
+        elif not job.get('url'):
+            jobs.append({'id': job.get('id'), 'error': 'Missing url'})
+        elif job.get('store') not in SCRAPERS:
+            jobs.append({'id': job.get('id'), 'error': f"Unknown store: {job.get('store')!r}"})
+        else:
+            jobs.append(job)
+    return jobs
+
+
+def run_batch(jobs: list, emit, per_store: int = BATCH_PER_STORE, engine: str = 'thread') -> dict:
+    """
+    Check every job's product page and emit() one result per job as it
+    finishes. Jobs for the same store and URL share one fetch. Each store gets
+    its own scraper and up to per_store checks in flight, so a slow store
+    doesn't hold up the others. The shared rate limiter keeps every store
+    within its request budget.
+    """
+    started = time.monotonic()
+    summary = {'jobs': len(jobs), 'fetches': 0, 'ok': 0, 'errors': 0}
+    summary_lock = threading.Lock()
+
+    unique = {}  # (store, normalized url) -> [jobs]
+    for job in jobs:
+        if 'error' in job:
+            emit({'id': job.get('id'), 'ok': False, 'error': job['error']})
+            summary['errors'] += 1
+            continue
+        unique.setdefault((job['store'], normalize_url(job['url'])), []).append(job)
+    summary['fetches'] = len(unique)
+
+    def report(group: list, result, error, elapsed: float):
+        for i, job in enumerate(group):
+            line = {'id': job.get('id'), 'store': job['store'], 'url': job['url'], 'ok': error is None}
+            if error is None:
+                line['result'] = result
+            else:
+                line['error'] = str(error)
+            line.update(elapsed=round(elapsed, 3), deduped=i > 0)
+            emit(line)
+        with summary_lock:
+            summary['ok' if error is None else 'errors'] += len(group)
+
+    scrapers = {store: SCRAPERS[store]() for store in {store for store, _ in unique}}
+
+    if engine == 'async':
+        import asyncio
+        async def check(semaphore, scraper, group):
+            async with semaphore:
+                t0 = time.monotonic()
+                try:
+                    result = await scraper.ascrape_product_page(group[0]['url'])
+                    report(group, result, None, time.monotonic() - t0)
+                except Exception as e:
+                    report(group, None, e, time.monotonic() - t0)
+
+        async def check_all():
+            semaphores = {store: asyncio.Semaphore(per_store) for store in scrapers}
+            await asyncio.gather(*(check(semaphores[store], scrapers[store], group)
+                                   for (store, _), group in unique.items()))
+
+        asyncio.run(_run_async(check_all(), scrapers.values()))
+    else:
+        def check(scraper, group):
+            t0 = time.monotonic()
+            try:
+                report(group, scraper.scrape_product_page(group[0]['url']), None, time.monotonic() - t0)
+            except Exception as e:
+                report(group, None, e, time.monotonic() - t0)
+
+        pools = {store: ThreadPoolExecutor(max_workers=per_store) for store in scrapers}
+        pending = [pools[store].submit(check, scrapers[store], group) for (store, _), group in unique.items()]
+        futures.wait(pending)
+        for pool in pools.values():
+            pool.shutdown()
+        for scraper in scrapers.values():
+            scraper.close()
+
+    summary['elapsed'] = round(time.monotonic() - started, 3)
+    return summary
+
+
+def read_alert_jobs(lines) -> list:
+    """Parse NDJSON alerts ({"id", "url", "targetPrice"}); unusable lines come back as {'id', 'error'}."""
+    alerts = []
+    for n, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            alert = json.loads(line)
+        except ValueError:
+            alerts.append({'id': None, 'error': f'Invalid JSON alert on line {n}'})
+            continue
+        if not isinstance(alert, dict):
+            alerts.append({'id': None, 'error': f'Invalid JSON alert on line {n}'})
+        elif not alert.get('url'):
+            alerts.append({'id': alert.get('id'), 'error': 'Missing url'})
+        elif not isinstance(alert.get('targetPrice'), (int, float)) or isinstance(alert['targetPrice'], bool):
+            alerts.append({'id': alert.get('id'), 'error': 'Missing targetPrice'})
+        else:
+            alerts.append(alert)
+    return alerts
+
+
+def run_alerts(alerts: list, emit, per_store: int = BATCH_PER_STORE, engine: str = 'thread') -> dict:
+    """
+    Check price alerts (utils/alert_scheduler.py): one product check per
+    URL that is due, every alert on it settled from that one price. emit()
+    gets one line per checked URL, with the ids of the alerts it
+    triggered, and one per alert that can't be checked.
+    """
+    from utils.alert_scheduler import RETRY_INTERVAL, check_interval, collapse, daily_move, shared_schedule
+
+    started = time.monotonic()
+    summary = {'alerts': len(alerts), 'urls': 0, 'due': 0, 'checked': 0, 'triggered': 0, 'errors': 0}
+    summary_lock = threading.Lock()
+
+    valid = []
+    for alert in alerts:
+        if 'error' in alert:
+            emit({'ids': [alert.get('id')], 'ok': False, 'error': alert['error']})
+            summary['errors'] += 1
+        else:
+            valid.append(alert)
+    groups, unknown = collapse(valid)
+    for alert in unknown:
+        emit({'url': alert['url'], 'ids': [alert.get('id')], 'ok': False, 'error': 'No scraper for this store'})
+    summary.update(urls=len(groups), errors=summary['errors'] + len(unknown))
+
+    schedule = shared_schedule()
+    due = schedule.due(groups)
+    summary['due'] = len(due)
+
+    def settle(line: dict):
+        key = line['id']
+        group = groups[key]
+        result = (line.get('result') if line['ok'] else None) or {}
+        price = result.get('price') or 0
+        now = time.time()
+        out = {'url': group.url, 'store': group.store, 'ids': group.ids, 'ok': price > 0}
+        if price > 0:
+            triggered = group.triggered(price)
+            next_check = now + check_interval(price, group.nearest_target(price),
+                                              daily_move(shared_history(), group.url, now=now))
+            out.update(price=price, inStock=result.get('inStock', True), triggered=triggered)
+        else:
+            triggered = []
+            next_check = now + RETRY_INTERVAL
+            out.update(error=line.get('error') or 'No price on the page', triggered=triggered)
+        schedule.checked(key, group.store, price if price > 0 else None, next_check, now=now)
+        out['nextCheck'] = round(next_check)
+        emit(out)
+        with summary_lock:
+            summary['checked' if price > 0 else 'errors'] += 1
+            summary['triggered'] += len(triggered)
+
+    run_batch([{'id': key, 'store': groups[key].store, 'url': groups[key].url} for key in due],
+              settle, per_store=per_store, engine=engine)
+    summary['elapsed'] = round(time.monotonic() - started, 3)
+    return summary
+
+
+def encode(payload, compact: bool = False) -> str:
+    """One JSON output document, timed as the serialize stage; compact drops the spaces after separators."""
+    with metrics.timer('serialize'):
+        return json.dumps(payload, ensure_ascii=False, default=json_default,
+                          separators=(',', ':') if compact else None)
+
+
+def wire_result(result, wire: str = 'json'):
+    """A search result with its listings in the requested wire format ('rows': utils.listing.to_rows())."""
+    if wire != 'rows':
+        return result
+    if isinstance(result, list):
+        return to_rows(result)
+    if isinstance(result, dict) and isinstance(result.get('results'), list):
+        return {**result, 'results': to_rows(result['results'])}
+    return result
+
+
+def parse_pool_stats():
+    """The parse pool's settings for the "stats" job, or None when parsing in-process."""
+    pool = parse_pool.shared_parse_pool()
+    return pool.stats() if pool is not None else None
+
+
+def serve_metrics(port: int, host: str = '127.0.0.1'):
+    """Serve the process's stage metrics as Prometheus text at /metrics, on a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.registry().prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # stdout is the job protocol; keep scrapes out of stderr too
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def serve(max_workers: int = SERVE_WORKERS, engine: str = 'thread', metrics_port: int = 0):
+    """
+    Long-lived worker mode. Scraper instances (and their pooled HTTP
+    connections) are created once per store and reused across jobs.
+    Reads one job per line, {"id", "mode", ...the CLI's options}, and
+    writes {"id", "ok", "result"} or {"id", "ok": false, "error"}.
+
+    engine='thread' runs jobs on a thread pool of max_workers threads;
+    engine='async' runs every job as a coroutine on one event loop, so
+    in-flight jobs are bounded only by the per-host connection caps.
+    """
+    if metrics_port:
+        try:
+            serve_metrics(metrics_port)
+        except OSError as e:
+            print(f"Metrics endpoint unavailable on port {metrics_port} ({e})", file=sys.stderr)
+
+    scrapers = {}
+    scrapers_lock = threading.Lock()
+    output_lock = threading.Lock()
+    catalog = Catalog()
+
+    def get_scraper(store: str):
+        with scrapers_lock:
+            if store not in scrapers:
+                scrapers[store] = SCRAPERS[store]()
+            return scrapers[store]
+
+    def respond(payload: dict, compact: bool = False):
+        line = encode(payload, compact)
+        with output_lock:
+            sys.stdout.write(line + '\n')
+            sys.stdout.flush()
+
+    def wants_catalog(job: dict) -> bool:
+        return bool(job.get('catalog')) and job.get('mode', 'search') == 'search'
+
+    def job_pages(job: dict):
+        return int(job['pages']) if job.get('pages') else None
+
+    def wants_stream(job: dict) -> bool:
+        return bool(job.get('stream')) and job.get('mode', 'search') == 'search'
+
+    def stream_args(job: dict, stores: list) -> dict:
+        return {
+            'scrapers': {s: get_scraper(s) for s in stores},
+            'keyword': job.get('keyword') or '',
+            'emit': lambda event: respond({'id': job.get('id'), **event}),
+            'timeout': float(job.get('timeout', MULTI_STORE_TIMEOUT)),
+            'link': (lambda listings: link_catalog(catalog, listings)) if wants_catalog(job) else None,
+            'pages': job_pages(job),
+        }
+
+    def handle(job: dict):
+        if job.get('mode') in LOCAL_MODES:
+            return answer_locally(job)
+        stores = resolve_stores(job.get('store') or '')
+        if wants_stream(job):
+            return stream_stores(**stream_args(job, stores))
+        if len(stores) > 1 or job.get('store') == 'all':
+            result = search_stores(
+                {s: get_scraper(s) for s in stores},
+                job.get('keyword') or '',
+                timeout=float(job.get('timeout', MULTI_STORE_TIMEOUT)),
+                pages=job_pages(job),
+            )
+        else:
+            result = run_job(get_scraper(stores[0]), job.get('mode', 'search'),
+                             keyword=job.get('keyword'), url=job.get('url'), pages=job_pages(job))
+        return link_catalog(catalog, result) if wants_catalog(job) else result
+
+    async def ahandle(job: dict):
+        if job.get('mode') in LOCAL_MODES:
+            # Local SQLite reads (and the catalog's writes) can wait on another process's lock
+            return await asyncio.get_running_loop().run_in_executor(None, metrics.bind(answer_locally), job)
+        stores = resolve_stores(job.get('store') or '')
+        if wants_stream(job):
+            return await astream_stores(**stream_args(job, stores))
+        if len(stores) > 1 or job.get('store') == 'all':
+            result = await asearch_stores(
+                {s: get_scraper(s) for s in stores},
+                job.get('keyword') or '',
+                timeout=float(job.get('timeout', MULTI_STORE_TIMEOUT)),
+                pages=job_pages(job),
+            )
+        else:
+            result = await arun_job(get_scraper(stores[0]), job.get('mode', 'search'),
+                                    keyword=job.get('keyword'), url=job.get('url'), pages=job_pages(job))
+        if wants_catalog(job):
+            # SQLite calls block — keep them off the event loop
+            result = await asyncio.get_running_loop().run_in_executor(None, link_catalog, catalog, result)
+        return result
+
+    def handle_measured(job: dict):
+        """(result, error, metrics) of handle(); metrics only when the job asks for them."""
+        with metrics.collect() as run:
+            try:
+                result, error = handle(job), None
+            except Exception as e:
+                result, error = None, e
+        return result, error, run.snapshot() if job.get('metrics') else None
+
+    async def ahandle_measured(job: dict):
+        with metrics.collect() as run:
+            try:
+                result, error = await ahandle(job), None
+            except Exception as e:
+                result, error = None, e
+        return result, error, run.snapshot() if job.get('metrics') else None
+
+    def on_done(job: dict, future):
+        try:
+            result, error, job_metrics = future.result()
+        except Exception as e:
+            result, error, job_metrics = None, e, None
+        if error is None:
+            payload = {'id': job.get('id'), 'ok': True, 'result': wire_result(result, job.get('wire'))}
+        else:
+            print(f"Scraper error ({job.get('store')}): {error}", file=sys.stderr)
+            payload = {'id': job.get('id'), 'ok': False, 'error': str(error)}
+        if job_metrics is not None:
+            payload['metrics'] = job_metrics
+        respond(payload, compact=job.get('wire') == 'rows')
+
+    if engine == 'async':
+        import asyncio
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+
+        def submit(job):
+            return asyncio.run_coroutine_threadsafe(ahandle_measured(job), loop)
+    else:
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+
+        def submit(job):
+            return pool.submit(handle_measured, job)
+
+    in_flight = set()
+    in_flight_lock = threading.Lock()
+
+    def finished(job, future):
+        with in_flight_lock:
+            in_flight.discard(future)
+        on_done(job, future)
+
+    refreshing = set()  # (query, stores) with a background refresh in flight
+
+    def refresh_in_background(keyword: str, stores: list) -> bool:
+        """Search live without answering anyone; the scrapers index what they find."""
+        key = (normalize_query(keyword), tuple(stores))
+        with in_flight_lock:
+            if key in refreshing:
+                return False
+            refreshing.add(key)
+
+        def done(future):
+            with in_flight_lock:
+                in_flight.discard(future)
+                refreshing.discard(key)
+            error = future.exception() or future.result()[1]
+            if error is not None:
+                print(f"Background refresh of {keyword!r} failed: {error}", file=sys.stderr)
+
+        future = submit({'mode': 'search', 'store': ','.join(stores), 'keyword': keyword})
+        with in_flight_lock:
+            in_flight.add(future)
+        future.add_done_callback(done)
+        return True
+
+    def answer_query(job: dict) -> dict:
+        stores = resolve_stores(job.get('store') or 'all')
+        keyword = job.get('keyword') or ''
+        answer = query_index(keyword, stores, int(job.get('limit', INDEX_QUERY_LIMIT)))
+        if job.get('catalog'):
+            link_catalog(catalog, answer)
+        # Below minResults the caller will search live itself, so don't refresh twice
+        answer['refreshing'] = (job.get('refresh', True) and needs_refresh(answer)
+                                and answer['count'] >= int(job.get('minResults', 0))
+                                and bool(keyword.strip()) and refresh_in_background(keyword, stores))
+        return answer
+
+    def answer_locally(job: dict):
+        """query, prewarmed and history jobs: answered from local storage, no scraping."""
+        if job['mode'] == 'query':
+            return answer_query(job)
+        if job['mode'] == 'prewarmed':
+            return shared_search_results().get(job.get('keyword') or '', float(job.get('maxAge', PREWARMED_MAX_AGE)))
+        return shared_history().summary(job.get('url') or '', float(job.get('days', 30)))
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError:
+            respond({'id': None, 'ok': False, 'error': 'Invalid JSON job'})
+            continue
+        if job.get('mode') == 'ping':
+            respond({'id': job.get('id'), 'ok': True, 'result': 'pong'})
+            continue
+        if job.get('mode') == 'stats':
+            respond({'id': job.get('id'), 'ok': True,
+                     'result': {'http_cache': shared_cache().stats(), 'query_cache': shared_query_cache().stats(),
+                                'parse_pool': parse_pool_stats(), 'metrics': metrics.registry().snapshot(),
+                                'stores': store_health_report()}})
+            continue
+        future = submit(job)
+        with in_flight_lock:
+            in_flight.add(future)
+        future.add_done_callback(lambda f, job=job: finished(job, f))
+
+    # stdin closed — finish what's in flight before exiting
+    with in_flight_lock:
+        pending = list(in_flight)
+    futures.wait(pending)
+    if engine == 'async':
+        asyncio.run_coroutine_threadsafe(_close_all(list(scrapers.values())), loop).result()
+    else:
+        for scraper in scrapers.values():
+            scraper.close()
+
+
+def ndjson_emitter():
+    """emit(dict) that writes one flushed JSON line to stdout; safe across threads."""
+    output_lock = threading.Lock()
+
+    def emit(line: dict):
+        line = encode(line)
+        with output_lock:
+            sys.stdout.write(line + '\n')
+            sys.stdout.flush()
+
+    return emit
+
+
+async def _close_all(scrapers):
+    """Close the scrapers' aiohttp sessions and hedge threads."""
+    import asyncio
+
+    await asyncio.gather(*(s.aclose() for s in scrapers), return_exceptions=True)
+
+
+async def _run_async(coro, scrapers):
+    """Await coro, then close the scrapers' aiohttp sessions."""
+    try:
+        return await coro
+    finally:
+        await _close_all(scrapers)
 
 
 def main():
     parser = argparse.ArgumentParser(description='Bhao.pk product scraper')
     parser.add_argument('--keyword', type=str, help='Search keyword')
-    parser.add_argument('--store', type=str, required=True, choices=SCRAPERS.keys())
+    parser.add_argument('--store', type=str,
+                        help=f"Store key ({', '.join(SCRAPERS)}), 'all', or a comma-separated list")
     parser.add_argument('--url', type=str, help='Product URL (for single product scraping)')
-    parser.add_argument('--mode', type=str, default='search', choices=['search', 'product'])
+    parser.add_argument('--mode', type=str, default='search', choices=['search', 'product', 'batch', 'alerts', 'history', 'query'],
+                        help='batch: NDJSON product checks; alerts: NDJSON price alerts; history: local price history '
+                             'for --url; query: answer --keyword from the local listing index')
+    parser.add_argument('--serve', action='store_true',
+                        help='Run as a long-lived worker speaking NDJSON over stdin/stdout')
+    parser.add_argument('--workers', type=int, default=SERVE_WORKERS,
+                        help='Concurrent jobs in --serve mode')
+    parser.add_argument('--timeout', type=float, default=MULTI_STORE_TIMEOUT,
+                        help='Per-search deadline in seconds for multi-store runs')
+    parser.add_argument('--engine', type=str, default='thread', choices=['thread', 'async'],
+                        help='Concurrency engine for multi-store runs and --serve')
+    parser.add_argument('--input', type=str, default='-',
+                        help="NDJSON product jobs for --mode batch, alerts for --mode alerts ('-' = stdin)")
+    parser.add_argument('--per-store', type=int, default=BATCH_PER_STORE,
+                        help='Product checks in flight per store in --mode batch and --mode alerts')
+    parser.add_argument('--days', type=float, default=30,
+                        help='Window for --mode history')
+    parser.add_argument('--catalog', action='store_true',
+                        help='Tag search results with canonical productIds from the product catalog')
+    parser.add_argument('--pages', type=int, default=None,
+                        help='Search up to this many results pages per store (stops early on off-topic pages)')
+    parser.add_argument('--no-refresh', action='store_true',
+                        help="--mode query: don't refresh a stale answer live afterwards")
+    parser.add_argument('--stream', action='store_true',
+                        help='Write search results as NDJSON events as soon as each product is parsed')
+    parser.add_argument('--metrics', action='store_true',
+                        help='Report per-store stage timings and byte counts alongside the results')
+    parser.add_argument('--profile', type=str, nargs='?', const=data_path('profiles'), default=None,
+                        help='Write cProfile and tracemalloc dumps of this run to DIR (default .data/profiles)')
+    parser.add_argument('--metrics-port', type=int, default=int(os.environ.get('BHAO_SCRAPER_METRICS_PORT') or 0),
+                        help='--serve: expose Prometheus metrics on 127.0.0.1:PORT/metrics')
+    parser.add_argument('--wire', type=str, default='json', choices=WIRE_FORMATS,
+                        help="Search results as objects ('json') or as a field list plus one array per product ('rows')")
+    parser.add_argument('--parse-workers', type=str, default=os.environ.get(parse_pool.PARSE_WORKERS_ENV, ''),
+                        help="Parse search pages in N worker processes ('auto' = cores - 1; default: in-process)")
+    parser.add_argument('--parse-pending', type=int, default=None,
+                        help='Search pages queued or parsing in the pool at once (default: 2 per worker)')
+    parser.add_argument('--parse-overflow', type=str, default='inline', choices=parse_pool.OVERFLOW_POLICIES,
+                        help="When the parse pool is full: parse in-process ('inline') or wait for a worker")
     args = parser.parse_args()
 
-    scraper_class = SCRAPERS[args.store]
-    scraper = scraper_class()
+    if args.profile:
+        from utils.profiling import profiled
+        with profiled(args.profile, label='serve' if args.serve else args.mode):
+            run_cli(parser, args)
+    else:
+        run_cli(parser, args)
+
+
+def run_cli(parser, args):
+    workers = parse_pool.worker_count(args.parse_workers)
+    if workers:
+        parse_pool.configure(workers, max_pending=args.parse_pending, overflow=args.parse_overflow)
+
+    if args.serve:
+        serve(args.workers, engine=args.engine, metrics_port=args.metrics_port)
+        return
+
+    if args.mode == 'batch':
+        if args.input == '-':
+            jobs = read_batch_jobs(sys.stdin)
+        else:
+            with open(args.input, encoding='utf-8') as f:
+                jobs = read_batch_jobs(f)
+        emit = ndjson_emitter()
+        summary = run_batch(jobs, emit, per_store=max(1, args.per_store), engine=args.engine)
+        if args.metrics:
+            emit({'metrics': metrics.registry().snapshot()})
+        print(f"Batch: {summary['jobs']} jobs, {summary['fetches']} fetches, {summary['ok']} ok, "
+              f"{summary['errors']} errors in {summary['elapsed']}s", file=sys.stderr)
+        return
+
+    if args.mode == 'alerts':
+        if args.input == '-':
+            alerts = read_alert_jobs(sys.stdin)
+        else:
+            with open(args.input, encoding='utf-8') as f:
+                alerts = read_alert_jobs(f)
+        summary = run_alerts(alerts, ndjson_emitter(), per_store=max(1, args.per_store), engine=args.engine)
+        print(f"Alerts: {summary['alerts']} alerts on {summary['urls']} urls, {summary['due']} due, "
+              f"{summary['checked']} checked, {summary['triggered']} triggered, {summary['errors']} errors "
+              f"in {summary['elapsed']}s", file=sys.stderr)
+        return
+
+    if args.mode == 'history':
+        if not args.url:
+            parser.error('--mode history needs --url')
+        print(json.dumps(shared_history().summary(args.url, args.days), ensure_ascii=False))
+        return
+
+    if args.mode == 'query':
+        if not args.keyword:
+            parser.error('--mode query needs --keyword')
+        try:
+            stores = resolve_stores(args.store or 'all')
+        except ValueError as e:
+            parser.error(str(e))
+        answer = query_index(args.keyword, stores)
+        if args.catalog:
+            link_catalog(Catalog(), answer)
+        print(json.dumps(answer, ensure_ascii=False))
+        if args.no_refresh or not needs_refresh(answer):
+            return
+        # The answer is out; let the reader see EOF while we refresh for next time
+        sys.stdout.flush()
+        sys.stdout.close()
+        scrapers = {store: SCRAPERS[store]() for store in stores}
+        result = search_stores(scrapers, args.keyword, timeout=args.timeout, pages=args.pages)
+        print(f"Refreshed {args.keyword!r}: {len(result['results'])} listings indexed", file=sys.stderr)
+        return
+
+    if not args.store:
+        parser.error('--store is required unless --serve or --mode batch/history/query is used')
+    try:
+        stores = resolve_stores(args.store)
+    except ValueError as e:
+        parser.error(str(e))
+
+    multi_store = len(stores) > 1 or args.store == 'all'
+    if multi_store and args.mode == 'product':
+        parser.error('--mode product takes a single --store')
+
+    if args.stream:
+        if args.mode != 'search':
+            parser.error('--stream only applies to --mode search')
+        emit = ndjson_emitter()
+        started = time.monotonic()
+        scrapers = {store: SCRAPERS[store]() for store in stores}
+        catalog = Catalog() if args.catalog else None
+        link = (lambda listings: link_catalog(catalog, listings)) if catalog is not None else None
+        if args.engine == 'async':
+            import asyncio
+            coro = astream_stores(scrapers, args.keyword or '', emit, timeout=args.timeout, link=link,
+                                  pages=args.pages)
+            summary = asyncio.run(_run_async(coro, scrapers.values()))
+        else:
+            summary = stream_stores(scrapers, args.keyword or '', emit, timeout=args.timeout, link=link,
+                                    pages=args.pages)
+        done = {'event': 'done', 'count': summary['count'], 'elapsed': round(time.monotonic() - started, 3)}
+        if args.metrics:
+            done['metrics'] = metrics.registry().snapshot()
+        emit(done)
+        return
 
     try:
-        if args.mode == 'product' and args.url:
-            result = scraper.scrape_product_page(args.url)
-            print(json.dumps(result, ensure_ascii=False))
-        elif args.keyword:
-            results = scraper.search(args.keyword)
-            print(json.dumps(results, ensure_ascii=False))
-        else:
-            print(json.dumps([]))
+        if multi_store:
+            scrapers = {store: SCRAPERS[store]() for store in stores}
+            if args.engine == 'async':
+                import asyncio
+                coro = asearch_stores(scrapers, args.keyword or '', timeout=args.timeout, pages=args.pages)
+                result = asyncio.run(_run_async(coro, scrapers.values()))
+            else:
+                result = search_stores(scrapers, args.keyword or '', timeout=args.timeout, pages=args.pages)
+        else:
+            result = run_job(SCRAPERS[stores[0]](), args.mode, keyword=args.keyword, url=args.url,
+                             pages=args.pages)
+        if args.catalog and args.mode == 'search':
+            result = link_catalog(Catalog(), result)
+        body = encode(wire_result(result, args.wire), compact=args.wire == 'rows')
+        if args.metrics:
+            # One process per CLI run, so the process-wide view is this run's
+            body = f'{{"result": {body}, "metrics": {encode(metrics.registry().snapshot())}}}'
+        print(body)
     except Exception as e:
         print(f"Scraper error: {e}", file=sys.stderr)
+        if args.metrics:
+            print(f"Metrics: {encode(metrics.registry().snapshot())}", file=sys.stderr)
         sys.exit(1)
 
 
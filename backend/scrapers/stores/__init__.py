@@ -0,0 +1,73 @@
+"""
+Registry of store scrapers, by store key.
+
+SCRAPERS maps each key ('daraz', 'mega', ...) to its scraper class, like a
+dict, but a store's module (and, through it, the HTTP and HTML libraries)
+is only imported the first time its class is looked up. A single-store
+search imports one scraper; modes that never scrape (history, query,
+prewarmed, stats) import none. Key order is the order "all" searches and
+merges stores in.
+
+A store's display name is known without importing it (store_name()), for
+code that only needs to label or filter results, and so is the store a
+product URL belongs to (store_for_url()).
+"""
+
+import importlib
+import threading
+from collections.abc import Mapping
+from urllib.parse import urlsplit
+
+# key -> ('module:Class', store_name, domain). store_name must match the
+# class's store_name; BaseScraper derives its metrics, rate-limit and health
+# keys from it. domain is the class's base_url host without "www.".
+STORES = {
+    'daraz': ('stores.daraz_scraper:DarazScraper', 'Daraz', 'daraz.pk'),
+    'telemart': ('stores.telemart_scraper:TelemartScraper', 'Telemart', 'telemart.pk'),
+    'shophive': ('stores.shophive_scraper:ShophiveScraper', 'Shophive', 'shophive.com'),
+    'mega': ('stores.mega_scraper:MegaScraper', 'Mega', 'mega.pk'),
+    'priceoye': ('stores.priceoye_scraper:PriceOyeScraper', 'PriceOye', 'priceoye.pk'),
+}
+
+
+class ScraperRegistry(Mapping):
+    """Read-only {key: scraper class} that imports each store on first lookup."""
+
+    def __init__(self, stores: dict):
+        self._stores = stores
+        self._classes = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key: str):
+        cls = self._classes.get(key)
+        if cls is None:
+            path = self._stores[key][0]
+            module, name = path.split(':')
+            with self._lock:
+                cls = self._classes[key] = getattr(importlib.import_module(module), name)
+        return cls
+
+    def __iter__(self):
+        return iter(self._stores)
+
+    def __len__(self) -> int:
+        return len(self._stores)
+
+    def store_name(self, key: str) -> str:
+        """The store's display name ('PriceOye'), without importing its scraper."""
+        return self._stores[key][1]
+
+    def store_for_url(self, url: str):
+        """Key of the store a product URL belongs to (its domain or a subdomain), or None."""
+        host = (urlsplit(url or '').hostname or '').lower()
+        for key, (_, _, domain) in self._stores.items():
+            if host == domain or host.endswith('.' + domain):
+                return key
+        return None
+
+    def loaded(self) -> list:
+        """Keys whose scraper modules have been imported so far."""
+        return [key for key in self._stores if key in self._classes]
+
+
+SCRAPERS = ScraperRegistry(STORES)
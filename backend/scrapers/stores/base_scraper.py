@@ -1,17 +1,40 @@
 """
 Abstract base class for all store scrapers.
-Each store scraper implements parse_search_results() and scrape_product_page().
+Each store scraper implements parse_search_results() and parse_product_page().
+
+fetch()/search()/scrape_product_page() are the blocking path (requests);
+afetch()/asearch()/ascrape_product_page() the asyncio one (aiohttp). Both
+share the parsers, the response cache, the store's circuit breaker and
+rate limiter, and record every listing they see in the price history and
+listing index.
 """
 
+import os
+import sys
+import threading
 import time
 import random
 from abc import ABC, abstractmethod
-from urllib.parse import quote
-
-import requests
-from bs4 import BeautifulSoup
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterator
+from urllib.parse import quote, urlsplit
 
+from utils import metrics
+from utils.extractor import parse_seconds, text
+from utils.http_cache import shared_cache
+from utils.listing_index import shared_index
+from utils.pagination import PageCrawl
+from utils.parse_pool import shared_parse_pool
+from utils.price_history import shared_history
+from utils.price_parser import parse_price
+from utils.query_cache import shared_query_cache
 from utils.rate_limiter import RateLimiter
+from utils.store_health import store_health
+
+if TYPE_CHECKING:
+    import asyncio
+    import requests
 
 
 # Rotate User-Agents to reduce ban risk
@@ -27,15 +50,127 @@ USER_AGENTS = [
 ]
 
 
+MIN_ATTEMPT_SECONDS = 2.0  # don't start a retry with less fetch budget left than this
+# Load tests (benchmarks/load_test.py): send every request to this origin instead of the
+# store, as /<store key><path>, and scale every store's rate_limit_seconds (0 = no limit)
+STORE_ORIGIN_ENV = 'BHAO_SCRAPER_STORE_ORIGIN'
+RATE_LIMIT_SCALE_ENV = 'BHAO_SCRAPER_RATE_LIMIT_SCALE'
+SCAN_CHUNK_BYTES = 16384  # product pages are read and scanned this much at a time
+
+
+def _answered(status: int) -> bool:
+    """Did the store itself answer? 429 and 5xx count against its health."""
+    return status != 429 and status < 500
+
+
+def _retrieve(task):
+    """Done callback for a dropped task: fetch its exception so asyncio doesn't log it as never retrieved."""
+    if not task.cancelled():
+        task.exception()
+
+
+def _connect_trace():
+    """aiohttp trace recording new connections as the connect stage."""
+    import aiohttp
+
+    async def on_start(session, context, params):
+        context.connect_started = time.perf_counter()
+
+    async def on_end(session, context, params):
+        metrics.observe('connect', time.perf_counter() - context.connect_started, context.trace_request_ctx or '')
+
+    trace = aiohttp.TraceConfig()
+    trace.on_connection_create_start.append(on_start)
+    trace.on_connection_create_end.append(on_end)
+    return trace
+
+
 class BaseScraper(ABC):
     store_name: str = ''
     base_url: str = ''
     search_url_template: str = ''
-    rate_limit_seconds: float = 2.0
+    search_page_url_template: str = ''  # pages 2+ ({keyword}, {page}); empty = single-page search
+    max_search_pages: int = 1  # depth when the caller doesn't ask for one
+    max_search_results: int = 120  # stop paging once this many listings are in
+    search_page_concurrency: int = 2  # pages in flight at once
+    rate_limit_seconds: float = 2.0  # steady-state gap between requests
+    rate_limit_burst: int = 1  # requests allowed back-to-back after idling
+    request_timeout: float = 15.0  # ceiling; the store's recent p95 sets a tighter one (utils/store_health.py)
+    fetch_budget_seconds: float = 20.0  # one fetch, retries included — under run_search's 25s deadline
+    hedge_requests: bool = True  # duplicate a request slower than the store's p95
+    max_connections_per_host: int = 4  # async path: in-flight requests per host
+    cache_ttl_seconds: float = 300.0  # serve cached pages this fresh without a request; None disables
+    query_cache_ttl_seconds: float = 300.0  # answer searches from results this fresh (utils/query_cache.py); None disables
+    record_price_history: bool = True
+    index_listings: bool = True
+    # Product pages: 'price' and 'out_of_stock' fields; scope only where a recorded page shows
+    # both inside the product block (a stock marker after the scope would be missed)
+    PRODUCT_SPEC = None
+    scan_product_pages: bool = True  # stop reading a product page once its fields are found
 
     def __init__(self):
-        self.session = requests.Session()
-        self.rate_limiter = RateLimiter(self.rate_limit_seconds)
+        self.store_key = self.store_name.lower()  # metrics label
+        self._session = None
+        self._session_lock = threading.Lock()
+        # Shared across processes — every search hitting this store draws
+        # from the same bucket
+        self.rate_limiter = RateLimiter(
+            self.rate_limit_seconds * float(os.environ.get(RATE_LIMIT_SCALE_ENV) or 1),
+            burst=self.rate_limit_burst,
+            key=self.store_name.lower(),
+        )
+        self.response_cache = shared_cache() if self.cache_ttl_seconds is not None else None
+        self.query_cache = shared_query_cache() if self.query_cache_ttl_seconds is not None else None
+        self.price_history = shared_history() if self.record_price_history else None
+        self.listing_index = shared_index() if self.index_listings else None
+        self.health = store_health(self.store_key)
+        self._hedge_pool = None
+        self._hedge_lock = threading.Lock()
+        self._async_session = None
+        self._async_loop = None
+        self._host_semaphores = {}
+        self.store_origin = (os.environ.get(STORE_ORIGIN_ENV) or '').rstrip('/')
+
+    @property
+    def session(self) -> 'requests.Session':
+        """requests session for the blocking path, created on first use."""
+        if self._session is None:
+            import requests
+
+            with self._session_lock:
+                if self._session is None:
+                    self._session = requests.Session()
+        return self._session
+
+    @property
+    def hedge_pool(self) -> ThreadPoolExecutor:
+        """Threads for hedged requests (see _request), created on first use."""
+        if self._hedge_pool is None:
+            with self._hedge_lock:
+                if self._hedge_pool is None:
+                    self._hedge_pool = ThreadPoolExecutor(max_workers=self.max_connections_per_host * 2)
+        return self._hedge_pool
+
+    def close(self):
+        """Stop the hedge threads and close the requests session."""
+        with self._hedge_lock:
+            pool, self._hedge_pool = self._hedge_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)  # a losing hedge still finishes, nobody waits on it
+        with self._session_lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+    def _cache_lookup(self, url: str):
+        """(entry, fresh) from the response cache; (None, False) when caching is off."""
+        if self.response_cache is None:
+            return None, False
+        with metrics.timer('cache_lookup', self.store_key):
+            cached, fresh = self.response_cache.lookup(url, self.cache_ttl_seconds)
+        if fresh:
+            metrics.add('cache_fresh', 1, self.store_key)
+        return cached, fresh
 
     def _get_headers(self) -> dict:
         return {
@@ -46,39 +181,576 @@ class BaseScraper(ABC):
             'Connection': 'keep-alive',
         }
 
-    def fetch(self, url: str, retries: int = 2) -> str:
-        """HTTP GET with rate limiting, retries, and User-Agent rotation."""
+    def _request(self, url: str, headers: dict, timeout: float = None, scanner=None) -> 'requests.Response':
+        """
+        One GET through the store's circuit breaker, with the body read in
+        full (or, with scanner, until the scan is done — see _timed_get).
+        The timeout adapts to the store's recent p95 (capped by
+        `timeout`), and a request slower than the p95 is hedged with a
+        second one when the rate limiter has a slot free. Raises
+        StoreUnavailable while the breaker is open, and requests errors for
+        transport failures (not HTTP status).
+        """
+        timeout, hedge_after = self._request_limits(timeout or self.request_timeout)
+        if hedge_after is None or hedge_after >= timeout:
+            return self._timed_get(url, headers, timeout, scanner)
+
+        pool = self.hedge_pool
+        first = pool.submit(metrics.bind(self._timed_get), url, headers, timeout, scanner)
+        done, _ = futures.wait([first], timeout=hedge_after)
+        if done or not self.rate_limiter.try_acquire():
+            return first.result()
+        metrics.add('hedges', 1, self.store_key)
+        second = pool.submit(metrics.bind(self._timed_get), url, headers, timeout, scanner)
+        pending = {first, second}
+        while pending:
+            done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and _answered(future.result().status_code):
+                    if future is second:
+                        metrics.add('hedge_wins', 1, self.store_key)
+                    return future.result()
+        # Neither answered cleanly: report the first request's outcome
+        return first.result()
+
+    def _request_limits(self, timeout: float) -> tuple:
+        """Breaker check, then (timeout, hedge delay or None) from the store's recent latency."""
+        self.health.check()
+        timeout = min(timeout, self.health.timeout(self.request_timeout))
+        hedge_after = self.health.hedge_delay() if self.hedge_requests else None
+        return timeout, hedge_after
+
+    def _route(self, url: str) -> str:
+        """Where a request for url actually goes: url itself, or the stand-in store under store_origin."""
+        if not self.store_origin:
+            return url
+        parts = urlsplit(url)
+        return f"{self.store_origin}/{self.store_key}{parts.path or '/'}" + (f'?{parts.query}' if parts.query else '')
+
+    def _timed_get(self, url: str, headers: dict, timeout: float, scanner=None) -> 'requests.Response':
+        """
+        One GET, timed as ttfb (connect included) and download, with its
+        outcome fed to the breaker. With scanner (a callable returning a
+        fresh utils.extractor.FieldScan), a 200 body is fed to the scan as
+        it arrives and the connection is dropped once the scan is done; the
+        scan is left on response.scan.
+        """
+        import requests
+
+        metrics.add('requests', 1, self.store_key)
+        started = time.perf_counter()
+        scan = None
+        try:
+            response = self.session.get(self._route(url), headers=headers, timeout=timeout, stream=True)
+            headers_at = time.perf_counter()
+            try:
+                if scanner is not None and response.status_code == 200:
+                    scan = response.scan = scanner(response.encoding)
+                    body = scan.read(response.iter_content(SCAN_CHUNK_BYTES))
+                else:
+                    body = response.content
+            finally:
+                response.close()
+        except requests.RequestException:
+            self.health.failure()
+            raise
+        self._observe_download(response.status_code, started, headers_at, len(body), scan)
+        return response
+
+    def _observe_download(self, status: int, started: float, headers_at: float, size: int, scan,
+                          finished: float = None):
+        """Record a finished request's timings and bytes, and its outcome for the breaker."""
+        finished = finished or time.perf_counter()
+        parsing = scan.parse_seconds if scan is not None else 0.0
+        if _answered(status):
+            self.health.success(finished - started - parsing)
+        else:
+            self.health.failure()
+        metrics.observe('ttfb', headers_at - started, self.store_key)
+        metrics.observe('download', finished - headers_at - parsing, self.store_key)
+        metrics.add('bytes', size, self.store_key)
+        if scan is not None:
+            metrics.observe('parse', parsing, self.store_key)
+            if not scan.finished:
+                metrics.add('early_closes', 1, self.store_key)
+
+    def _text(self, response: 'requests.Response') -> str:
+        with metrics.timer('decode', self.store_key):
+            return response.text
+
+    def _retry_backoff(self, attempt: int, retries: int, deadline: float):
+        """Seconds to sleep before retrying, or None when out of retries or out of time budget."""
+        backoff = 1 + random.random()
+        if attempt >= retries or deadline - time.monotonic() - backoff < MIN_ATTEMPT_SECONDS:
+            return None
+        metrics.add('retries', 1, self.store_key)
+        return backoff
+
+    def fetch(self, url: str, retries: int = 2, headers: dict = None) -> str:
+        """
+        HTTP GET with response caching, rate limiting, retries, and User-Agent
+        rotation. Retries stop once fetch_budget_seconds is spent.
+        """
+        return self._fetch(url, retries, headers)[0]
+
+    def _fetch(self, url: str, retries: int = 2, headers: dict = None, scanner=None) -> tuple:
+        """fetch(), optionally scanning the body as it arrives: (body, scan or None)."""
+        import requests
+
+        cached, fresh = self._cache_lookup(url)
+        if fresh:
+            return cached.body, None
+        conditional = cached.conditional_headers() if cached is not None else {}
+
         self.rate_limiter.wait()
+        deadline = time.monotonic() + self.fetch_budget_seconds
 
         for attempt in range(retries + 1):
             try:
-                response = self.session.get(
-                    url,
-                    headers=self._get_headers(),
-                    timeout=15,
-                )
+                response = self._request(url, {**(headers or self._get_headers()), **conditional},
+                                         timeout=deadline - time.monotonic(), scanner=scanner)
+                if response.status_code == 304 and cached is not None:
+                    metrics.add('cache_revalidated', 1, self.store_key)
+                    self.response_cache.revalidated(url)
+                    return cached.body, None
                 response.raise_for_status()
-                return response.text
+                scan = getattr(response, 'scan', None)
+                if scan is None:
+                    body = self._text(response)
+                else:
+                    with metrics.timer('decode', self.store_key):
+                        body = scan.body.decode(response.encoding or 'utf-8', 'replace')
+                if self.response_cache is not None:
+                    # A scanned body may stop after the product block; parsing
+                    # that prefix again (fresh hit, 304) gives the same fields
+                    self.response_cache.store(url, body, response.headers, was_cached=cached is not None)
+                return body, scan
             except requests.RequestException as e:
-                if attempt < retries:
-                    time.sleep(1 + random.random())
+                metrics.add('request_errors', 1, self.store_key)
+                backoff = self._retry_backoff(attempt, retries, deadline)
+                if backoff is not None:
+                    time.sleep(backoff)
                     continue
                 raise e
 
-        return ''
+        return '', None
 
-    def search(self, keyword: str) -> list:
-        """Search store for keyword, return list of product dicts."""
-        url = self.search_url_template.format(keyword=quote(keyword))
-        html = self.fetch(url)
-        return self.parse_search_results(html)
+    def record_prices(self, listings: list) -> list:
+        """Append the listings' prices to the price history and the listing index; returns listings."""
+        if self.price_history is not None:
+            self.price_history.record(listings)
+        if self.listing_index is not None:
+            self.listing_index.add(listings)
+        return listings
 
-    @abstractmethod
-    def parse_search_results(self, html: str) -> list:
-        """Extract products from search results HTML. Override per store."""
-        raise NotImplementedError
+    def _timed_listings(self, html: str) -> Iterator:
+        """
+        parse_search_results(html), recording libxml2 time as the parse
+        stage and the rest of the parser's own time as extract. Time the
+        caller spends between listings isn't counted.
+        """
+        parse_seconds()
+        started = time.perf_counter()
+        listings = iter(self.parse_search_results(html))
+        spent = time.perf_counter() - started
+        count = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    listing = next(listings)
+                except StopIteration:
+                    break
+                finally:
+                    spent += time.perf_counter() - started
+                count += 1
+                yield listing
+        finally:
+            parsing = parse_seconds()
+            metrics.observe('parse', parsing, self.store_key)
+            metrics.observe('extract', max(0.0, spent - parsing), self.store_key)
+            metrics.add('listings', count, self.store_key)
+
+    def parse_listings(self, body: str, parser: str = 'parse_search_results') -> list:
+        """Listings from a search body by the named parser method, timed, in this process."""
+        if parser == 'parse_search_results':
+            return list(self._timed_listings(body))
+        return getattr(self, parser)(body)
+
+    def _parsed_listings(self, body: str, parser: str = 'parse_search_results') -> list:
+        """parse_listings(), in a parse worker when a pool is configured (utils/parse_pool.py)."""
+        pool = shared_parse_pool()
+        listings = pool.parse(self.store_key, parser, body) if pool is not None else None
+        return listings if listings is not None else self.parse_listings(body, parser)
+
+    def _search_results(self, html: str) -> list:
+        return self.record_prices(self._parsed_listings(html))
+
+    def _product_result(self, url: str, html: str, scan=None) -> dict:
+        """The product's fields from a finished scan (its parse time is already recorded), or else from html."""
+        parse_seconds()
+        started = time.perf_counter()
+        product = self.product_from_page(scan) if scan is not None else self.parse_product_page(html)
+        parsing = parse_seconds()
+        if scan is None:
+            metrics.observe('parse', parsing, self.store_key)
+        metrics.observe('extract', max(0.0, time.perf_counter() - started - parsing), self.store_key)
+        self.record_prices([{**product, 'url': url, 'store': self.store_name}])
+        return product
+
+    def _product_scanner(self):
+        """FieldScan factory for product pages, or None to read them whole."""
+        spec = self.PRODUCT_SPEC
+        if not self.scan_product_pages or spec is None:
+            return None
+        return spec.scan
+
+    def search_url(self, keyword: str, page: int = 1) -> str:
+        if page == 1:
+            return self.search_url_template.format(keyword=quote(keyword))
+        return self.search_page_url_template.format(keyword=quote(keyword), page=page)
+
+    def _page_count(self, pages: int = None) -> int:
+        if not self.search_page_url_template:
+            return 1
+        return max(1, self.max_search_pages if pages is None else pages)
+
+    def search_page(self, keyword: str, page: int = 1) -> list:
+        """Fetch, parse and record one results page."""
+        return self._search_results(self.fetch(self.search_url(keyword, page)))
+
+    def _more_pages(self, keyword: str, crawl: PageCrawl, pages: int) -> Iterator[list]:
+        """
+        Fetch pages 2..pages concurrently and feed them to crawl in page
+        order; yields the listings kept from each. Pages not yet started
+        when the crawl stops are cancelled.
+        """
+        if crawl.done or pages <= 1:
+            return
+        pool = ThreadPoolExecutor(max_workers=self.search_page_concurrency)
+        pending = [pool.submit(metrics.bind(self.search_page), keyword, page) for page in range(2, pages + 1)]
+        try:
+            for page, future in enumerate(pending, 2):
+                try:
+                    listings = future.result()
+                except Exception as e:
+                    print(f"{self.store_name} page {page} failed, stopping there: {e}", file=sys.stderr)
+                    break
+                yield crawl.add(listings)
+                if crawl.done:
+                    break
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _cached_search(self, keyword: str, pages: int):
+        """Listings for keyword from the query cache (an exact or broader query), or None."""
+        if self.query_cache is None:
+            return None
+        with metrics.timer('query_cache', self.store_key):
+            hit = self.query_cache.get(self.store_key, keyword, pages, self.query_cache_ttl_seconds)
+        if hit is None:
+            return None
+        listings, kind = hit
+        metrics.add(f'query_cache_{kind}', 1, self.store_key)
+        return listings
+
+    def _remember_search(self, keyword: str, pages: int, listings: list):
+        """A live search for keyword finished: cache it and mark the keyword refreshed in the index."""
+        if self.query_cache is not None:
+            self.query_cache.put(self.store_key, keyword, pages, listings)
+        if self.listing_index is not None:
+            self.listing_index.refreshed(keyword, self.store_name)
+
+    def _first_page_listings(self, keyword: str) -> Iterator:
+        """Page 1's listings as they are parsed, not yet recorded (iter_search)."""
+        return self._timed_listings(self.fetch(self.search_url(keyword)))
+
+    def search(self, keyword: str, pages: int = None) -> list:
+        """
+        Search store for keyword, return list of Listing records (up to
+        `pages` pages deep). Answered from the query cache when a fresh
+        search for the same or a broader query has the results.
+        """
+        pages = self._page_count(pages)
+        cached = self._cached_search(keyword, pages)
+        if cached is not None:
+            return cached
+        listings = self.search_page(keyword)
+        if pages > 1:
+            crawl = PageCrawl(keyword, self.max_search_results)
+            crawl.add(listings)
+            for _ in self._more_pages(keyword, crawl, pages):
+                pass
+            listings = crawl.listings
+        self._remember_search(keyword, pages, listings)
+        return listings
+
+    def iter_search(self, keyword: str, pages: int = None) -> Iterator:
+        """
+        search(), one Listing at a time: page 1 as it is parsed, later pages
+        as each one comes in. Prices are recorded once a page is done (or
+        the caller stops early). A query cache hit is yielded at once; only a
+        search the caller read to the end is cached.
+        """
+        pages = self._page_count(pages)
+        cached = self._cached_search(keyword, pages)
+        if cached is not None:
+            yield from cached
+            return
+        seen = []
+        try:
+            for listing in self._first_page_listings(keyword):
+                seen.append(listing)
+                yield listing
+        finally:
+            self.record_prices(seen)
+        if pages == 1:
+            self._remember_search(keyword, pages, seen)
+            return
+        crawl = PageCrawl(keyword, self.max_search_results)
+        crawl.add(seen)
+        for kept in self._more_pages(keyword, crawl, pages):
+            yield from kept
+        self._remember_search(keyword, pages, crawl.listings)
 
-    @abstractmethod
     def scrape_product_page(self, url: str) -> dict:
-        """Scrape a single product page for current price."""
+        """Scrape a single product page for current price, reading only as far as the product block."""
+        body, scan = self._fetch(url, scanner=self._product_scanner())
+        return self._product_result(url, body, scan)
+
+    # ── Async path ──────────────────────────────────────────────
+
+    def _get_async_session(self):
+        """aiohttp session bound to the running loop, created on first use."""
+        import asyncio
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        if self._async_session is None or self._async_loop is not loop or self._async_session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.max_connections_per_host)
+            self._async_session = aiohttp.ClientSession(connector=connector, trace_configs=[_connect_trace()])
+            self._async_loop = loop
+            self._host_semaphores = {}
+        return self._async_session
+
+    def _host_semaphore(self, url: str) -> 'asyncio.Semaphore':
+        import asyncio
+
+        host = urlsplit(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.max_connections_per_host)
+        return self._host_semaphores[host]
+
+    async def _off_loop(self, fn, *args):
+        """
+        fn(*args) in the loop's default executor. The breaker, the rate
+        limiter and the response cache are SQLite writes that can wait on
+        another process's lock, which must not stall every other request.
+        """
+        import asyncio
+
+        return await asyncio.get_running_loop().run_in_executor(None, metrics.bind(fn), *args)
+
+    async def _aget(self, session, url: str, headers: dict, timeout: float, scanner=None):
+        """
+        One aiohttp GET (body read and decoded), timed and fed to the
+        breaker; returns (response, body, scan). With scanner, a 200 body is
+        scanned on the loop as it arrives and the connection closed once the
+        scan is done (see _timed_get); scan is None otherwise.
+        """
+        import asyncio
+        import aiohttp
+
+        scan = None
+        async with self._host_semaphore(url):
+            metrics.add('requests', 1, self.store_key)
+            started = time.perf_counter()
+            try:
+                async with session.get(
+                    self._route(url),
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=timeout),
+                    trace_request_ctx=self.store_key,
+                ) as response:
+                    headers_at = time.perf_counter()
+                    if scanner is not None and response.status == 200:
+                        scan = scanner(response.charset)
+                        async for chunk in response.content.iter_chunked(SCAN_CHUNK_BYTES):
+                            if scan.feed(chunk):
+                                response.close()  # drop the connection instead of draining the rest
+                                break
+                        else:
+                            scan.close()
+                        raw = scan.body
+                        await self._off_loop(self._observe_download, response.status, started, headers_at,
+                                             len(raw), scan, time.perf_counter())
+                        with metrics.timer('decode', self.store_key):
+                            body = raw.decode(response.charset or 'utf-8', 'replace')
+                    else:
+                        raw = await response.read()
+                        await self._off_loop(self._observe_download, response.status, started, headers_at,
+                                             len(raw), None, time.perf_counter())
+                        with metrics.timer('decode', self.store_key):
+                            body = await response.text()  # decodes the body already read
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                await self._off_loop(self.health.failure)
+                raise
+        return response, body, scan
+
+    async def _arequest(self, session, url: str, headers: dict, timeout: float, scanner=None):
+        """Async _request(): breaker check, adaptive timeout and hedging around _aget()."""
+        import asyncio
+
+        timeout, hedge_after = await self._off_loop(self._request_limits, timeout)
+        if hedge_after is None or hedge_after >= timeout:
+            return await self._aget(session, url, headers, timeout, scanner)
+
+        first = asyncio.ensure_future(self._aget(session, url, headers, timeout, scanner))
+        done, _ = await asyncio.wait({first}, timeout=hedge_after)
+        if done or not await self._off_loop(self.rate_limiter.try_acquire):
+            return await first
+        metrics.add('hedges', 1, self.store_key)
+        second = asyncio.ensure_future(self._aget(session, url, headers, timeout, scanner))
+        try:
+            pending = {first, second}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and _answered(task.result()[0].status):
+                        if task is second:
+                            metrics.add('hedge_wins', 1, self.store_key)
+                        return task.result()
+            return first.result()
+        finally:
+            # The slower request is dropped, closing its connection; whatever
+            # it raised (or raises while being cancelled) is retrieved, not logged
+            for task in (first, second):
+                task.cancel()
+                task.add_done_callback(_retrieve)
+
+    async def afetch(self, url: str, retries: int = 2, headers: dict = None) -> str:
+        """Non-blocking HTTP GET with response caching, rate limiting, per-host caps and retries."""
+        return (await self._afetch(url, retries, headers))[0]
+
+    async def _afetch(self, url: str, retries: int = 2, headers: dict = None, scanner=None) -> tuple:
+        """afetch(), optionally scanning the body as it arrives: (body, scan or None)."""
+        import asyncio
+        import aiohttp
+
+        cached, fresh = await self._off_loop(self._cache_lookup, url)
+        if fresh:
+            return cached.body, None
+        conditional = cached.conditional_headers() if cached is not None else {}
+
+        session = self._get_async_session()
+        await self.rate_limiter.async_wait()
+        deadline = time.monotonic() + self.fetch_budget_seconds
+
+        for attempt in range(retries + 1):
+            try:
+                response, body, scan = await self._arequest(
+                    session, url, {**(headers or self._get_headers()), **conditional},
+                    timeout=deadline - time.monotonic(), scanner=scanner,
+                )
+                if response.status == 304 and cached is not None:
+                    metrics.add('cache_revalidated', 1, self.store_key)
+                    await self._off_loop(self.response_cache.revalidated, url)
+                    return cached.body, None
+                response.raise_for_status()
+                if self.response_cache is not None:
+                    await self._off_loop(self.response_cache.store, url, body, response.headers, cached is not None)
+                return body, scan
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                metrics.add('request_errors', 1, self.store_key)
+                backoff = self._retry_backoff(attempt, retries, deadline)
+                if backoff is not None:
+                    await asyncio.sleep(backoff)
+                    continue
+                raise
+
+        return '', None
+
+    async def asearch_page(self, keyword: str, page: int = 1) -> list:
+        """Async search_page(); parsing and recording run off the event loop."""
+        import asyncio
+
+        html = await self.afetch(self.search_url(keyword, page))
+        return await asyncio.get_running_loop().run_in_executor(None, metrics.bind(self._search_results), html)
+
+    async def asearch(self, keyword: str, pages: int = None) -> list:
+        """Async search(), query cache included."""
+        pages = self._page_count(pages)
+        cached = self._cached_search(keyword, pages)
+        if cached is not None:
+            return cached
+        listings = await self._asearch_pages(keyword, pages)
+        self._remember_search(keyword, pages, listings)
+        return listings
+
+    async def _asearch_pages(self, keyword: str, pages: int) -> list:
+        """Search live; later pages are tasks, cancelled once the crawl stops."""
+        import asyncio
+
+        first = await self.asearch_page(keyword)
+        if pages == 1:
+            return first
+        crawl = PageCrawl(keyword, self.max_search_results)
+        crawl.add(first)
+        if crawl.done:
+            return crawl.listings
+
+        semaphore = asyncio.Semaphore(self.search_page_concurrency)
+
+        async def fetch_page(page):
+            async with semaphore:
+                return await self.asearch_page(keyword, page)
+
+        tasks = [asyncio.ensure_future(fetch_page(page)) for page in range(2, pages + 1)]
+        try:
+            for page, task in enumerate(tasks, 2):
+                try:
+                    listings = await task
+                except Exception as e:
+                    print(f"{self.store_name} page {page} failed, stopping there: {e}", file=sys.stderr)
+                    break
+                crawl.add(listings)
+                if crawl.done:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return crawl.listings
+
+    async def ascrape_product_page(self, url: str) -> dict:
+        import asyncio
+
+        html, scan = await self._afetch(url, scanner=self._product_scanner())
+        return await asyncio.get_running_loop().run_in_executor(
+            None, metrics.bind(self._product_result), url, html, scan)
+
+    async def aclose(self):
+        if self._async_session is not None and not self._async_session.closed:
+            await self._async_session.close()
+        self._async_session = None
+        self.close()
+
+    @abstractmethod
+    def parse_search_results(self, html: str) -> Iterator:
+        """Extract Listings from search results HTML (a list or a generator). Override per store."""
         raise NotImplementedError
+
+    def parse_product_page(self, html: str) -> dict:
+        """Extract {'price', 'inStock'} from a product page's HTML."""
+        return self.product_from_page(self.PRODUCT_SPEC.parse(html))
+
+    def product_from_page(self, page) -> dict:
+        """
+        {'price', 'inStock'} from PRODUCT_SPEC's fields — page is a parsed
+        Page or a finished FieldScan. Override for stores that need more.
+        """
+        price_el = page.one('price')
+        return {
+            'price': parse_price(text(price_el)) if price_el is not None else 0,
+            'inStock': page.one('out_of_stock') is None,
+        }
@@ -2,9 +2,11 @@
 Mega.pk scraper — Pakistani price comparison & electronics store.
 """
 
-import re
-from bs4 import BeautifulSoup
+from typing import Iterator
+
 from stores.base_scraper import BaseScraper
+from utils.extractor import ExtractionSpec, text
+from utils.listing import Listing
 from utils.price_parser import parse_price
 
 
@@ -12,63 +14,58 @@ class MegaScraper(BaseScraper):
     store_name = 'Mega'
     base_url = 'https://www.mega.pk'
     search_url_template = 'https://www.mega.pk/search/{keyword}'
+    # No search_page_url_template: mega.pk's search pager isn't mapped yet, so searches stay one page
     rate_limit_seconds = 2.0
 
-    def parse_search_results(self, html: str) -> list:
-        soup = BeautifulSoup(html, 'lxml')
-        products = []
-
-        for card in soup.select('.product-card, .product-item, .pro-box, .product'):
+    SEARCH_SPEC = ExtractionSpec(
+        cards='.product-card, .product-item, .pro-box, .product',
+        fields={
+            'name': '.product-title, .pro-title, h3, h4, .name',
+            'price': '.product-price, .pro-price, .price',
+            'link': 'a',
+            'img': 'img',
+        },
+    )
+    PRODUCT_SPEC = ExtractionSpec(
+        fields={
+            'price': '.product-price, .price, .pro-price',
+            'out_of_stock': '.out-of-stock, .sold-out, .unavailable',
+        },
+    )
+
+    def parse_search_results(self, html: str) -> Iterator[Listing]:
+        for card in self.SEARCH_SPEC.iter_cards(html):
             try:
-                name_el = card.select_one('.product-title, .pro-title, h3, h4, .name')
-                price_el = card.select_one('.product-price, .pro-price, .price')
-                link_el = card.select_one('a')
-                img_el = card.select_one('img')
+                name_el = card.one('name')
+                price_el = card.one('price')
+                link_el = card.one('link')
+                img_el = card.one('img')
 
-                if not name_el or not price_el:
+                if name_el is None or price_el is None:
                     continue
 
-                name = name_el.get_text(strip=True)
-                price = parse_price(price_el.get_text(strip=True))
+                name = text(name_el)
+                price = parse_price(text(price_el))
 
                 url = ''
-                if link_el and link_el.get('href'):
-                    href = link_el['href']
+                if link_el is not None and link_el.get('href'):
+                    href = link_el.get('href')
                     url = href if href.startswith('http') else self.base_url + href
 
                 image_url = ''
-                if img_el:
+                if img_el is not None:
                     image_url = img_el.get('src', '') or img_el.get('data-src', '')
 
-                products.append({
-                    'name': name,
-                    'price': price,
-                    'originalPrice': None,
-                    'url': url,
-                    'imageUrl': image_url,
-                    'rating': 0.0,
-                    'reviewsCount': 0,
-                    'store': self.store_name,
-                    'inStock': True,
-                })
+                yield Listing(
+                    name=name,
+                    price=price,
+                    original_price=None,
+                    url=url,
+                    image_url=image_url,
+                    rating=0.0,
+                    reviews_count=0,
+                    store=self.store_name,
+                    in_stock=True,
+                )
             except Exception:
                 continue
-
-        return products
-
-    def scrape_product_page(self, url: str) -> dict:
-        html = self.fetch(url)
-        soup = BeautifulSoup(html, 'lxml')
-
-        price = 0
-        in_stock = True
-
-        price_el = soup.select_one('.product-price, .price, .pro-price')
-        if price_el:
-            price = parse_price(price_el.get_text(strip=True))
-
-        oos_el = soup.select_one('.out-of-stock, .sold-out, .unavailable')
-        if oos_el:
-            in_stock = False
-
-        return {'price': price, 'inStock': in_stock}
@@ -3,8 +3,11 @@ PriceOye.pk scraper — Pakistani mobile & gadgets price comparison.
 """
 
 import re
-from bs4 import BeautifulSoup
+from typing import Iterator
+
 from stores.base_scraper import BaseScraper
+from utils.extractor import ExtractionSpec, text
+from utils.listing import Listing
 from utils.price_parser import parse_price
 
 
@@ -12,71 +15,67 @@ class PriceOyeScraper(BaseScraper):
     store_name = 'PriceOye'
     base_url = 'https://priceoye.pk'
     search_url_template = 'https://priceoye.pk/search?q={keyword}'
+    search_page_url_template = 'https://priceoye.pk/search?q={keyword}&page={page}'
     rate_limit_seconds = 2.0
 
-    def parse_search_results(self, html: str) -> list:
-        soup = BeautifulSoup(html, 'lxml')
-        products = []
-
-        for card in soup.select('.product-card, .productBox, .product-item, .p-item'):
+    SEARCH_SPEC = ExtractionSpec(
+        cards='.product-card, .productBox, .product-item, .p-item',
+        fields={
+            'name': '.product-title, .p-title, h3, h4, .name',
+            'price': '.product-price, .p-price, .price',
+            'link': 'a',
+            'img': 'img',
+            'rating': '.rating, .stars',
+        },
+    )
+    PRODUCT_SPEC = ExtractionSpec(
+        fields={
+            'price': '.product-price, .price, .p-price',
+            'out_of_stock': '.out-of-stock, .sold-out',
+        },
+    )
+
+    def parse_search_results(self, html: str) -> Iterator[Listing]:
+        for card in self.SEARCH_SPEC.iter_cards(html):
             try:
-                name_el = card.select_one('.product-title, .p-title, h3, h4, .name')
-                price_el = card.select_one('.product-price, .p-price, .price')
-                link_el = card.select_one('a')
-                img_el = card.select_one('img')
-                rating_el = card.select_one('.rating, .stars')
+                name_el = card.one('name')
+                price_el = card.one('price')
+                link_el = card.one('link')
+                img_el = card.one('img')
+                rating_el = card.one('rating')
 
-                if not name_el or not price_el:
+                if name_el is None or price_el is None:
                     continue
 
-                name = name_el.get_text(strip=True)
-                price = parse_price(price_el.get_text(strip=True))
+                name = text(name_el)
+                price = parse_price(text(price_el))
 
                 url = ''
-                if link_el and link_el.get('href'):
-                    href = link_el['href']
+                if link_el is not None and link_el.get('href'):
+                    href = link_el.get('href')
                     url = href if href.startswith('http') else self.base_url + href
 
                 image_url = ''
-                if img_el:
+                if img_el is not None:
                     image_url = img_el.get('src', '') or img_el.get('data-src', '')
 
                 rating = 0.0
-                if rating_el:
-                    rating_text = rating_el.get_text(strip=True)
+                if rating_el is not None:
+                    rating_text = text(rating_el)
                     nums = re.findall(r'[\d.]+', rating_text)
                     if nums:
                         rating = float(nums[0])
 
-                products.append({
-                    'name': name,
-                    'price': price,
-                    'originalPrice': None,
-                    'url': url,
-                    'imageUrl': image_url,
-                    'rating': rating,
-                    'reviewsCount': 0,
-                    'store': self.store_name,
-                    'inStock': True,
-                })
+                yield Listing(
+                    name=name,
+                    price=price,
+                    original_price=None,
+                    url=url,
+                    image_url=image_url,
+                    rating=rating,
+                    reviews_count=0,
+                    store=self.store_name,
+                    in_stock=True,
+                )
             except Exception:
                 continue
-
-        return products
-
-    def scrape_product_page(self, url: str) -> dict:
-        html = self.fetch(url)
-        soup = BeautifulSoup(html, 'lxml')
-
-        price = 0
-        in_stock = True
-
-        price_el = soup.select_one('.product-price, .price, .p-price')
-        if price_el:
-            price = parse_price(price_el.get_text(strip=True))
-
-        oos_el = soup.select_one('.out-of-stock, .sold-out')
-        if oos_el:
-            in_stock = False
-
-        return {'price': price, 'inStock': in_stock}
@@ -0,0 +1,232 @@
+"""
+Price-alert checks: one scrape per product URL, at a pace set by how close
+the price is to a target and how much it has been moving.
+
+Node hands every un-notified alert ({"id", "url", "targetPrice"}) to
+run_search.py --mode alerts on each tick. Instead of scraping once per
+alert:
+
+  - Alerts are collapsed by normalized URL (collapse()). Each URL keeps
+    its targets sorted (UrlAlerts), so one scraped price settles every
+    alert on it with a bisect: the alerts triggered are the ones whose
+    target is at or above the price.
+  - The store comes from the URL's domain (SCRAPERS.store_for_url()), so
+    alerts on all five stores are checked.
+  - Each URL gets a next-check time (AlertSchedule, SQLite in the scraper
+    data directory). Only URLs that are due, or new, are scraped on a
+    tick. The interval (check_interval()) is a fraction of the time the
+    price would take to reach the nearest target at its recent pace:
+    gap / daily move, where gap is how far the price is above the highest
+    untriggered target and the daily move comes from the price history
+    (daily_move()), never taken as less than PRIOR_DAILY_MOVE. A product
+    2% above a target is checked about every half hour, one 10% above
+    every 2-3 hours (sooner if its price has been jumping around), and one
+    40% above every target waits MAX_INTERVAL. A failed check is retried
+    after RETRY_INTERVAL.
+
+A scraped price of 0 means the page couldn't be read, not that the
+product is free: it triggers nothing and counts as a failed check.
+
+If the schedule store can't be opened, every URL is due on every tick (the
+old fixed-interval behaviour), with a message on stderr.
+"""
+
+import bisect
+import sqlite3
+import sys
+import threading
+import time
+
+from utils.http_cache import normalize_url
+from utils.paths import data_path
+from utils.price_history import DAY
+
+MIN_INTERVAL = 15 * 60  # seconds — never check a URL more often than this
+MAX_INTERVAL = 6 * 3600  # ... or less often
+RETRY_INTERVAL = 30 * 60  # after a failed check
+CHECK_FRACTION = 0.05  # check again after this share of the expected time to reach a target
+PRIOR_DAILY_MOVE = 0.05  # minimum pace (share of the price per day) assumed: sales move prices in jumps
+VOLATILITY_DAYS = 14  # price history window daily_move() looks at
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS alert_urls (
+    url TEXT PRIMARY KEY,
+    store TEXT,
+    next_check REAL NOT NULL,
+    checked_at REAL,
+    price INTEGER,
+    failures INTEGER NOT NULL DEFAULT 0
+);
+'''
+
+
+class UrlAlerts:
+    """Every alert on one product URL, targets kept sorted."""
+
+    __slots__ = ('url', 'store', 'targets', 'ids')
+
+    def __init__(self, url: str, store: str):
+        self.url = url
+        self.store = store
+        self.targets = []  # ascending
+        self.ids = []  # alert ids, parallel to targets
+
+    def add(self, alert_id, target: float):
+        i = bisect.bisect_right(self.targets, target)
+        self.targets.insert(i, target)
+        self.ids.insert(i, alert_id)
+
+    def triggered(self, price: float) -> list:
+        """Ids of the alerts whose target is at or above price."""
+        if price <= 0:
+            return []
+        return self.ids[bisect.bisect_left(self.targets, price):]
+
+    def nearest_target(self, price: float):
+        """The highest target still below price (the next one it would hit), or None."""
+        i = bisect.bisect_left(self.targets, price)
+        return self.targets[i - 1] if i else None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def collapse(alerts) -> tuple:
+    """
+    ({normalized url: UrlAlerts}, [alerts on URLs no scraper handles]) from
+    {'id', 'url', 'targetPrice'} mappings.
+    """
+    from stores import SCRAPERS
+
+    groups = {}
+    unknown = []
+    for alert in alerts:
+        store = SCRAPERS.store_for_url(alert['url'])
+        if store is None:
+            unknown.append(alert)
+            continue
+        key = normalize_url(alert['url'])
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = UrlAlerts(alert['url'], store)
+        group.add(alert.get('id'), float(alert['targetPrice']))
+    return groups, unknown
+
+
+def daily_move(history, url: str, days: float = VOLATILITY_DAYS, now: float = None) -> float:
+    """
+    How far the price has moved per day recently, as a share of the price:
+    the sum of its relative changes over the last `days` days, divided by
+    the days covered. 0.0 without at least two observations.
+    """
+    now = now if now is not None else time.time()
+    changes = history.change_points(url, days, now=now)
+    moved = sum(abs(c['price'] - c['previousPrice']) / c['previousPrice']
+                for c in changes if c['previousPrice'])
+    if not moved:
+        return 0.0
+    span_days = max((now - changes[0]['ts']) / DAY, 1.0)
+    return moved / span_days
+
+
+def check_interval(price: float, target, move: float) -> float:
+    """
+    Seconds until a URL priced `price` should be checked again, given its
+    nearest untriggered target (None: every alert on it has triggered) and
+    its daily_move().
+    """
+    if target is None or price <= 0:
+        return MAX_INTERVAL
+    gap = (price - target) / price
+    days_to_target = gap / max(move, PRIOR_DAILY_MOVE)
+    return min(MAX_INTERVAL, max(MIN_INTERVAL, days_to_target * DAY * CHECK_FRACTION))
+
+
+class AlertSchedule:
+    def __init__(self, path: str = None):
+        self.path = path
+        self.enabled = True
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path or data_path('alert_schedule.sqlite3'),
+                                   timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _disable(self, error: Exception):
+        # A broken schedule must never stop alerts — check everything instead
+        print(f"Alert schedule unavailable ({error}), checking every URL", file=sys.stderr)
+        self.enabled = False
+
+    def due(self, groups: dict, now: float = None) -> set:
+        """
+        The urls of groups ({normalized url: UrlAlerts}) due for a check:
+        never checked, past their next-check time, or with a target added
+        since that the last price already meets or is closer to. After a
+        failed check only the retry time counts.
+        """
+        if not self.enabled:
+            return set(groups)
+        now = now if now is not None else time.time()
+        urls = list(groups)
+        try:
+            conn = self._connection()
+            checks = {}
+            for i in range(0, len(urls), 500):  # stay under SQLite's variable limit
+                chunk = urls[i:i + 500]
+                for url, next_check, checked_at, price, failures in conn.execute(
+                    'SELECT url, next_check, checked_at, price, failures FROM alert_urls '
+                    f"WHERE url IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ):
+                    checks[url] = (next_check, checked_at, price, failures)
+        except sqlite3.Error as e:
+            self._disable(e)
+            return set(urls)
+
+        due = set()
+        for url, group in groups.items():
+            next_check, checked_at, price, failures = checks.get(url, (0, None, None, 0))
+            if price and checked_at is not None and not failures:
+                # The targets may have changed since: no later than the slowest pace allows for them
+                next_check = min(next_check, checked_at + check_interval(price, group.nearest_target(price), 0.0))
+                if group.triggered(price):
+                    next_check = 0
+            if next_check <= now:
+                due.add(url)
+        return due
+
+    def checked(self, url: str, store: str, price, next_check: float, now: float = None):
+        """Record a check of url: its price (None when it failed) and when to check next."""
+        if not self.enabled:
+            return
+        now = now if now is not None else time.time()
+        try:
+            self._connection().execute(
+                'INSERT INTO alert_urls (url, store, next_check, checked_at, price, failures) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(url) DO UPDATE SET store = excluded.store, next_check = excluded.next_check, '
+                'checked_at = excluded.checked_at, price = COALESCE(excluded.price, price), '
+                'failures = CASE WHEN excluded.price IS NULL THEN failures + 1 ELSE 0 END',
+                (url, store, next_check, now, price, 0 if price is not None else 1),
+            )
+        except sqlite3.Error as e:
+            self._disable(e)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_schedule() -> AlertSchedule:
+    """The process-wide schedule --mode alerts reads and updates."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = AlertSchedule()
+        return _shared
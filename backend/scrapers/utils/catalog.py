@@ -0,0 +1,284 @@
+"""
+Persistent canonical product catalog.
+
+group_products() starts from nothing on every call. The catalog remembers
+every product it has seen, so the same phone gets the same product id on
+every search, in every process.
+
+The catalog is a SQLite file in the scraper data directory with five tables:
+  products          stable id, representative name and normalized name
+  product_grams     trigram -> product postings (the precomputed match index)
+  gram_stats        trigram -> how many products have it (kept by a trigger)
+  product_names     normalized name -> product, for every name ever matched
+  product_listings  listing url -> product
+
+Matching a listing takes the first of these that applies:
+  1. The listing url is already known.
+  2. The normalized name has been seen before.
+  3. Fuzzy matching: candidates from product_grams, ranked and confirmed
+     exactly as in group_products().
+  4. Otherwise a new product is appended.
+Steps 1 and 2 are single index lookups, and each fuzzy match is saved under
+product_names so it becomes a lookup next time.
+
+match() does all lookups and scoring on a read snapshot, then takes the
+write lock only to insert what it decided. Candidate lookup skips a name's
+most common trigrams: as many as a candidate could miss and still reach
+MIN_TRIGRAM_OVERLAP (so no candidate is lost), and beyond that any trigram
+in more than MAX_GRAM_PRODUCTS products.
+"""
+
+import math
+import sqlite3
+import threading
+import time
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+from utils.paths import data_path
+from utils.product_matcher import (MIN_TRIGRAM_OVERLAP, add_to_group, new_group, prepare_listings, rank_candidates,
+                                   trigrams)
+
+MAX_GRAM_PRODUCTS = 2000  # trigrams in more products than this don't propose candidates
+
+# Candidates' trigrams, to count the ones they share with a name (read-only sets)
+_name_grams = lru_cache(maxsize=65536)(trigrams)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    norm_name TEXT NOT NULL,
+    gram_count INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS product_grams (
+    gram TEXT NOT NULL,
+    product_id INTEGER NOT NULL,
+    PRIMARY KEY (gram, product_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS product_names (
+    norm_name TEXT PRIMARY KEY,
+    product_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS product_listings (
+    url TEXT PRIMARY KEY,
+    product_id INTEGER NOT NULL,
+    store TEXT,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS gram_stats (
+    gram TEXT PRIMARY KEY,
+    products INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS product_grams_ai AFTER INSERT ON product_grams BEGIN
+    INSERT INTO gram_stats (gram, products) VALUES (new.gram, 1)
+    ON CONFLICT (gram) DO UPDATE SET products = products + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS product_grams_ad AFTER DELETE ON product_grams BEGIN
+    UPDATE gram_stats SET products = products - 1 WHERE gram = old.gram;
+END;
+'''
+
+
+class Catalog:
+    def __init__(self, path: str = None, threshold: float = 0.75):
+        self.path = path
+        self.threshold = threshold
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path or data_path('catalog.sqlite3'),
+                                   timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            self._count_grams(conn)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _count_grams(conn):
+        # A catalog written before gram_stats existed: count its postings once
+        if conn.execute('SELECT EXISTS (SELECT 1 FROM gram_stats)').fetchone()[0]:
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if not conn.execute('SELECT EXISTS (SELECT 1 FROM gram_stats)').fetchone()[0]:
+                conn.execute('INSERT INTO gram_stats (gram, products) '
+                             'SELECT gram, COUNT(*) FROM product_grams GROUP BY gram')
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _candidates(self, conn, name: str, grams: set, after: int = 0) -> list:
+        """
+        (product id, shared trigrams, name length, gram count, normalized name)
+        for every product with id > after that could reach the threshold.
+        """
+        frequency = dict(conn.execute(
+            f"SELECT gram, products FROM gram_stats WHERE gram IN ({','.join('?' * len(grams))})", list(grams),
+        ).fetchall())
+        probe = sorted((g for g in grams if frequency.get(g)), key=lambda g: (frequency[g], g))
+        # A candidate sharing s trigrams has Dice <= 2s / (len(grams) + s), so
+        # reaching MIN_TRIGRAM_OVERLAP takes at least `needed` of them: it
+        # still shares one after the needed - 1 most common are dropped
+        needed = math.ceil(MIN_TRIGRAM_OVERLAP * len(grams) / (2 - MIN_TRIGRAM_OVERLAP) - 1e-9)
+        probe = probe[:len(probe) - max(0, needed - 1)]
+        probe = [g for g in probe if frequency[g] <= MAX_GRAM_PRODUCTS] or probe[:1]
+        if not probe:
+            return []
+
+        # Same length and gram-count bounds as rank_candidates(), loosened by one
+        length, ratio = len(name), self.threshold / (2 - self.threshold)
+        overlap = MIN_TRIGRAM_OVERLAP / (2 - MIN_TRIGRAM_OVERLAP)
+        rows = conn.execute(
+            'SELECT DISTINCT p.id, p.norm_name, p.gram_count '
+            'FROM product_grams g JOIN products p ON p.id = g.product_id '
+            f"WHERE g.gram IN ({','.join('?' * len(probe))}) AND g.product_id > ? "
+            'AND length(p.norm_name) BETWEEN ? AND ? AND p.gram_count BETWEEN ? AND ?',
+            [*probe, after, int(length * ratio) - 1, int(length / ratio) + 1,
+             int(len(grams) * overlap) - 1, int(len(grams) / overlap) + 1],
+        ).fetchall()
+        return [(product_id, len(grams & _name_grams(norm_name)), len(norm_name), gram_count, norm_name)
+                for product_id, norm_name, gram_count in rows]
+
+    def _best_match(self, name: str, grams: set, candidates: list):
+        """Key of the best candidate (see _candidates()) confirmed by SequenceMatcher, or None."""
+        names = {key: norm_name for key, _, _, _, norm_name in candidates}
+        matcher = SequenceMatcher(None)
+        matcher.set_seq1(name)
+        for key in rank_candidates(name, len(grams), (c[:4] for c in candidates), self.threshold):
+            matcher.set_seq2(names[key])
+            if matcher.ratio() >= self.threshold:
+                return key
+        return None
+
+    def _add_product(self, conn, listing: dict, name: str, grams: set, now: float) -> int:
+        cursor = conn.execute(
+            'INSERT INTO products (name, norm_name, gram_count, created_at) VALUES (?, ?, ?, ?)',
+            (listing.get('name', ''), name, len(grams), now),
+        )
+        product_id = cursor.lastrowid
+        conn.executemany('INSERT INTO product_grams (gram, product_id) VALUES (?, ?)',
+                         [(gram, product_id) for gram in grams])
+        return product_id
+
+    def _resolve(self, conn, prepared: list):
+        """
+        Read phase of match(): (product key per listing id, new products,
+        last product id seen). Products not in the catalog get keys past
+        the last id, in the order they'll be inserted; new_products maps
+        each such key to (listing, normalized name, trigrams).
+        """
+        last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM products').fetchone()[0]
+        keys, new_products = {}, {}
+        batch_urls, batch_names = {}, {}
+        for name, listing in prepared:
+            url = listing.get('url') or None
+            key = batch_urls.get(url) if url else None
+            if key is None and url:
+                row = conn.execute('SELECT product_id FROM product_listings WHERE url = ?', (url,)).fetchone()
+                key = row[0] if row else None
+            if key is None:
+                row = conn.execute('SELECT product_id FROM product_names WHERE norm_name = ?', (name,)).fetchone()
+                key = row[0] if row else batch_names.get(name)
+            if key is None:
+                grams = trigrams(name)
+                candidates = self._candidates(conn, name, grams) if grams else []
+                candidates += [(new_key, len(grams & new_grams), len(new_name), len(new_grams), new_name)
+                               for new_key, (_, new_name, new_grams) in new_products.items()]
+                key = self._best_match(name, grams, candidates) if grams else None
+                if key is None:
+                    key = last_id + len(new_products) + 1
+                    new_products[key] = (listing, name, grams)
+            batch_names.setdefault(name, key)
+            if url:
+                batch_urls[url] = key
+            keys[id(listing)] = key
+        return keys, new_products, last_id
+
+    def match(self, listings: list) -> list:
+        """
+        Canonical product id for each listing (same order as `listings`).
+        Unknown products are added to the catalog.
+        """
+        conn = self._connection()
+        prepared = prepare_listings(listings)
+        conn.execute('BEGIN')  # one read snapshot for every lookup
+        try:
+            keys, new_products, last_id = self._resolve(conn, prepared)
+        finally:
+            conn.execute('COMMIT')
+
+        # BEGIN IMMEDIATE takes the write lock, so two processes can't both
+        # add the same new product; it is only held for the inserts.
+        conn.execute('BEGIN IMMEDIATE')
+        now = time.time()
+        try:
+            changed = conn.execute('SELECT COALESCE(MAX(id), 0) FROM products').fetchone()[0] != last_id
+            product_ids = {}
+            for key, (listing, name, grams) in new_products.items():
+                product_id = None
+                if changed:
+                    # Another process added products since the read: match
+                    # against those (and this batch's own inserts) first
+                    row = conn.execute('SELECT product_id FROM product_names WHERE norm_name = ?',
+                                       (name,)).fetchone()
+                    product_id = row[0] if row else (
+                        self._best_match(name, grams, self._candidates(conn, name, grams, after=last_id))
+                        if grams else None)
+                if product_id is None:
+                    product_id = self._add_product(conn, listing, name, grams, now)
+                product_ids[key] = product_id
+
+            for name, listing in prepared:
+                key = keys[id(listing)]
+                product_id = keys[id(listing)] = product_ids.get(key, key)
+                conn.execute('INSERT OR IGNORE INTO product_names (norm_name, product_id) VALUES (?, ?)',
+                             (name, product_id))
+                url = listing.get('url') or None
+                if url:
+                    conn.execute('INSERT OR REPLACE INTO product_listings (url, product_id, store, last_seen) '
+                                 'VALUES (?, ?, ?, ?)', (url, product_id, listing.get('store'), now))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return [keys[id(listing)] for listing in listings]
+
+    def group_products(self, listings: list) -> list:
+        """
+        group_products() against the catalog: one group per canonical product,
+        each with a 'product_id', in group_products()' deterministic order.
+        """
+        product_ids = {id(listing): product_id
+                       for listing, product_id in zip(listings, self.match(listings))}
+        groups = {}
+        for _, listing in prepare_listings(listings):
+            product_id = product_ids[id(listing)]
+            if product_id not in groups:
+                groups[product_id] = dict(new_group(listing), product_id=product_id)
+            add_to_group(groups[product_id], listing)
+        return list(groups.values())
+
+    def product(self, product_id: int):
+        """Catalog entry with every listing url seen for it, or None."""
+        conn = self._connection()
+        row = conn.execute('SELECT id, name, created_at FROM products WHERE id = ?',
+                           (product_id,)).fetchone()
+        if row is None:
+            return None
+        listings = conn.execute(
+            'SELECT url, store, last_seen FROM product_listings WHERE product_id = ? ORDER BY store, url',
+            (product_id,),
+        ).fetchall()
+        return {
+            'id': row[0],
+            'name': row[1],
+            'created_at': row[2],
+            'listings': [{'url': url, 'store': store, 'last_seen': last_seen}
+                         for url, store, last_seen in listings],
+        }
@@ -0,0 +1,652 @@
+"""
+Declarative HTML extraction on lxml — the fast path behind parse_search_results().
+
+A store describes its pages as an ExtractionSpec: an optional card selector
+plus one CSS selector group per field, with the same comma-joined fallbacks
+the BeautifulSoup code used. Each group is compiled once into XPath and run
+by libxml2 directly on the lxml tree.
+
+Fallback pruning: before walking the cards, every alternative in a group is
+checked against the raw page text for the literals it needs (class names,
+ids, attribute values, tag names). Alternatives that can't match anywhere on
+the page are dropped, and the store's spec remembers the narrowed XPath for
+that combination, so each card only runs the selectors that actually occur.
+
+Streaming: ExtractionSpec.iter_cards() parses the page incrementally with
+lxml's pull parser and yields each card as soon as its closing tag is
+seen. Once the caller moves on, the card's subtree is cleared, so memory
+holds roughly one card at a time rather than the whole result list. This
+works for card selectors without combinators (all of ours). Others fall
+back to a full parse. The body is still fetched whole, so field selectors
+are narrowed against the page text as in parse().
+
+Early exit: ExtractionSpec.scan() matches a spec's fields against a page
+that is still arriving, for product checks that need one price and one
+stock marker. Each field resolves to its first match in document order as
+soon as that element closes. The scan is done once every field has
+resolved, or once the spec's scope element (the product block) has closed
+with at least one field found; fields still missing then count as absent.
+The caller stops reading the response there. Each chunk is checked once
+for the selector literals it adds, and each field's XPath, narrowed to the
+alternatives seen so far, runs only over the part of the tree the chunk
+added (from the previous last node onwards), so the work grows with the
+page rather than with its square. A match counts once the parser has moved
+past it. Selectors with combinators, and pages past
+FieldScan.MAX_MATCH_BYTES, are looked up once in the finished tree instead,
+as parse() does.
+
+lxml and cssselect are imported on first use, and a spec compiles its
+selectors the first time it parses a page, so importing a store module
+costs next to nothing (a Daraz API search never loads either library).
+
+Time spent inside libxml2 (tree building and pull-parser feeds) adds up
+per thread; parse_seconds() hands it to the caller, which reports it as
+the parse stage and the rest of its time as extract (utils/metrics.py).
+
+Matching keeps BeautifulSoup semantics: select() returns matches in document
+order, select_one() the first match in document order across all
+alternatives, and text() mirrors get_text(strip=True). Two deliberate
+differences: descendant combinators inside a card selector ('.a .b') need
+'.a' inside the card too, and a class name written with character
+references in the markup defeats the literal check.
+"""
+
+import codecs
+import threading
+import time
+
+# Set by _load() on first use
+etree = None  # lxml.etree
+_css = None  # cssselect.parser
+_translator = None
+_html_parser = None
+
+# Strings BeautifulSoup's get_text() leaves out
+_NON_TEXT_TAGS = frozenset(('script', 'style', 'template', 'rt', 'rp'))
+
+_parse_clock = threading.local()
+
+
+def _load():
+    """Import lxml and cssselect (once; racing threads just import them twice)."""
+    global etree, _css, _translator, _html_parser
+    if etree is not None:
+        return
+    from lxml import etree as lxml_etree
+    from cssselect import HTMLTranslator, parser
+
+    _css = parser
+    _translator = HTMLTranslator()
+    _html_parser = lxml_etree.HTMLParser(encoding='utf-8')
+    etree = lxml_etree  # last: other threads only look at this one
+
+
+def _count_parse(seconds: float):
+    _parse_clock.seconds = getattr(_parse_clock, 'seconds', 0.0) + seconds
+
+
+def parse_seconds() -> float:
+    """libxml2 time spent on this thread since the last call (resets the count)."""
+    seconds = getattr(_parse_clock, 'seconds', 0.0)
+    _parse_clock.seconds = 0.0
+    return seconds
+
+
+def parse_html(html):
+    """Parse markup (str or bytes) into an lxml root, or None for an empty page."""
+    if not html:
+        return None
+    if isinstance(html, str):
+        # lxml refuses str input that carries an XML encoding declaration
+        html = html.encode('utf-8')
+    _load()
+    return etree.fromstring(html, _html_parser)
+
+
+class _TagAlignedFeeder:
+    """
+    Feeds a pull parser without cutting a tag in two: a chunk's trailing
+    unfinished '<...' waits for the next chunk. libxml2 (2.12) treats the
+    rest of the page as text when a </script> or </style> end tag
+    straddles two feeds.
+    """
+    __slots__ = ('parser', '_rest')
+
+    def __init__(self, parser):
+        self.parser = parser
+        self._rest = b''
+
+    def feed(self, data: bytes):
+        if self._rest:
+            data = self._rest + data
+        cut = data.rfind(b'<')
+        if cut == -1 or data.find(b'>', cut) != -1:
+            cut = len(data)
+        self._rest = data[cut:]
+        if cut:
+            self.parser.feed(data[:cut])
+
+    def close(self):
+        """Feed what's left and close the parser; returns the root."""
+        if self._rest:
+            self.parser.feed(self._rest)
+            self._rest = b''
+        return self.parser.close()
+
+
+def text(el) -> str:
+    """Equivalent of BeautifulSoup's el.get_text(strip=True)."""
+    parts = []
+
+    def walk(node, root=False):
+        if root or (isinstance(node.tag, str) and node.tag not in _NON_TEXT_TAGS):
+            if isinstance(node.tag, str) and node.text:
+                parts.append(node.text.strip())
+            for child in node:
+                walk(child)
+        if not root and node.tail:
+            parts.append(node.tail.strip())
+
+    walk(el, root=True)
+    return ''.join(p for p in parts if p)
+
+
+def _has_combinator(tree) -> bool:
+    while tree is not None:
+        if isinstance(tree, _css.CombinedSelector):
+            return True
+        tree = getattr(tree, 'selector', None)
+    return False
+
+
+def _key_class(tree):
+    """One class name the selector's subject must carry, or None."""
+    while tree is not None:
+        if isinstance(tree, _css.Class):
+            return tree.class_name
+        tree = getattr(tree, 'selector', None)
+    return None
+
+
+def _required_literals(tree, out: set):
+    """Collect lowercase literals a selector needs to find in the page text."""
+    if isinstance(tree, _css.CombinedSelector):
+        _required_literals(tree.selector, out)
+        _required_literals(tree.subselector, out)
+    elif isinstance(tree, _css.Class):
+        out.add(tree.class_name.lower())
+        _required_literals(tree.selector, out)
+    elif isinstance(tree, _css.Hash):
+        out.add(tree.id.lower())
+        _required_literals(tree.selector, out)
+    elif isinstance(tree, _css.Attrib):
+        out.add(tree.attrib.lower())
+        value = getattr(tree.value, 'value', tree.value)
+        if tree.operator != 'exists' and value:
+            out.add(str(value).lower())
+        _required_literals(tree.selector, out)
+    elif isinstance(tree, (_css.Pseudo, _css.Function)):
+        _required_literals(tree.selector, out)
+    elif isinstance(tree, _css.Negation):
+        # Only the element :not() qualifies is required, not its argument
+        _required_literals(tree.selector, out)
+    elif isinstance(tree, _css.Element):
+        if tree.element:
+            out.add('<' + tree.element.lower())
+
+
+class Selector:
+    """One CSS selector group (e.g. '.price, .current-price') compiled to XPath."""
+
+    def __init__(self, css: str, prefix: str = 'descendant::'):
+        _load()
+        self.css = css
+        self.prefix = prefix
+        parsed = _css.parse(css)
+        self.alternatives = []
+        for sel in parsed:
+            literals = set()
+            _required_literals(sel.parsed_tree, literals)
+            self.alternatives.append((
+                _translator.selector_to_xpath(sel, prefix=prefix),
+                frozenset(literals),
+            ))
+        self._compiled = {}
+        self._finders = {}
+        # Testing one element against the selector (streaming) needs
+        # selectors without combinators
+        self.can_match = not any(_has_combinator(sel.parsed_tree) for sel in parsed)
+        self._self_test = None
+        self._key_classes = None
+        if self.can_match:
+            tests = ' or '.join(_translator.selector_to_xpath(sel, prefix='self::') for sel in parsed)
+            self._self_test = etree.XPath(f'boolean({tests})')
+            self._onward = [
+                (_translator.selector_to_xpath(sel, prefix='descendant-or-self::'),
+                 _translator.selector_to_xpath(sel, prefix='following::'))
+                for sel in parsed
+            ]
+            key_classes = [_key_class(sel.parsed_tree) for sel in parsed]
+            if None not in key_classes:
+                self._key_classes = frozenset(key_classes)
+
+    def matches(self, el) -> bool:
+        """Does el itself match? Only valid when can_match."""
+        if not isinstance(el.tag, str):
+            return False
+        if self._key_classes is not None:
+            # Most elements fail on class alone — skip the XPath call for them
+            classes = el.get('class')
+            if not classes or self._key_classes.isdisjoint(classes.split()):
+                return False
+        return self._self_test(el)
+
+    def finder(self, keep: tuple):
+        """
+        XPath for the first element, in document order, matching the given
+        alternatives at or after a bookmark element: the bookmark, its
+        descendants, then everything following it. Only valid when can_match;
+        memoized; None when no alternative survives.
+        """
+        if keep not in self._finders:
+            self._finders[keep] = None
+            if keep:
+                union = ' | '.join(path for i in keep for path in self._onward[i])
+                self._finders[keep] = etree.XPath(f'({union})[1]')
+        return self._finders[keep]
+
+    def _xpaths(self, keep: tuple):
+        """(first, all) XPath pair for the given surviving alternatives, memoized."""
+        if keep not in self._compiled:
+            if not keep:
+                self._compiled[keep] = (None, None)
+            else:
+                union = ' | '.join(self.alternatives[i][0] for i in keep)
+                self._compiled[keep] = (etree.XPath(f'({union})[1]'), etree.XPath(union))
+        return self._compiled[keep]
+
+    def narrow(self, page_text) -> tuple:
+        """
+        Indices of alternatives whose literals all occur in the (lowercased)
+        page: its text, or the set of literals found in it (FieldScan).
+        """
+        return tuple(
+            i for i, (_, literals) in enumerate(self.alternatives)
+            if all(lit in page_text for lit in literals)
+        )
+
+    def bind(self, page_text: str = None) -> 'BoundSelector':
+        keep = self.narrow(page_text) if page_text is not None else tuple(range(len(self.alternatives)))
+        return BoundSelector(*self._xpaths(keep))
+
+
+class BoundSelector:
+    """A Selector narrowed to the alternatives present on one page."""
+    __slots__ = ('_first', '_all')
+
+    def __init__(self, first, all_):
+        self._first = first
+        self._all = all_
+
+    def one(self, el):
+        if self._first is None:
+            return None
+        found = self._first(el)
+        return found[0] if found else None
+
+    def all(self, el) -> list:
+        if self._all is None:
+            return []
+        return self._all(el)
+
+
+class Page:
+    """A parsed page with a spec's selectors bound to it."""
+
+    def __init__(self, root, fields: dict, cards):
+        self.root = root
+        self._fields = fields
+        self._cards = cards
+
+    def cards(self) -> list:
+        if self.root is None or self._cards is None:
+            return []
+        return [Card(el, self._fields) for el in self._cards.all(self.root)]
+
+    def one(self, field: str):
+        return self._fields[field].one(self.root) if self.root is not None else None
+
+
+class Card:
+    __slots__ = ('el', '_fields')
+
+    def __init__(self, el, fields: dict):
+        self.el = el
+        self._fields = fields
+
+    def one(self, field: str):
+        return self._fields[field].one(self.el)
+
+    def all(self, field: str) -> list:
+        return self._fields[field].all(self.el)
+
+
+def _follows(el, other) -> bool:
+    """Does el start after other has ended (not inside it, not before it)?"""
+    path = [el, *el.iterancestors()]
+    other_path = [other, *other.iterancestors()]
+    # Walk down from the root to where the two paths part
+    path.reverse()
+    other_path.reverse()
+    depth = 0
+    while depth < min(len(path), len(other_path)) and path[depth] is other_path[depth]:
+        depth += 1
+    if depth == len(other_path) or depth == len(path):
+        return False  # el is inside other, or encloses it
+    parent = path[depth - 1]
+    return parent.index(path[depth]) > parent.index(other_path[depth])
+
+
+class FieldScan:
+    """
+    One page's fields, matched while the page arrives (ExtractionSpec.scan()).
+    feed() chunks of the body until it returns True, then read fields with
+    one() as on a Page. body holds the bytes fed so far.
+    """
+
+    # Past this many bytes, stop searching after each chunk: read the rest
+    # and look the fields up once in the finished tree, as parse() does
+    MAX_MATCH_BYTES = 2 * 1024 * 1024
+
+    def __init__(self, fields: dict, scope, encoding: str = None):
+        self._fields = fields
+        # Selectors still waiting for their first match: the fields, and the scope under None
+        self._pending = dict(fields)
+        if scope is not None:
+            self._pending[None] = scope
+        self._seen = set()  # selector literals found in the body so far
+        literals = set().union(*(literals for sel in self._pending.values() for _, literals in sel.alternatives))
+        # ASCII literals are looked for in the raw bytes, ASCII-lowercased: an
+        # element can only match if the selector's own spelling is in the page.
+        # Others need the decoded text
+        self._decode = not all(literal.isascii() for literal in literals)
+        self._decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self._unseen = {literal if self._decode else literal.encode(): literal for literal in literals}
+        # A literal can't be in a chunk that lacks one of the shorter literals inside it
+        # ('price' before 'product-price'): check those first and skip the rest
+        self._inside = {key: [other for other in self._unseen if other != key and other in key]
+                        for key in sorted(self._unseen, key=len)}
+        # A literal (or '<script') can straddle two chunks: keep this much of the previous one's text
+        self._overlap = max(len('<script'), *map(len, self._unseen)) - 1
+        self._tail = '' if self._decode else b''
+        self._lt, self._gt, self._script = ('<', '>', '<script') if self._decode else (b'<', b'>', b'<script')
+        self._in_script = False  # the text so far ends inside an inline script
+        # Without combinators a selector can be searched for in just the part
+        # of the tree a chunk added; other selectors wait for the whole body
+        self._matching = all(sel.can_match for sel in self._pending.values())
+        self._finders = {}  # pending name -> XPath for the alternatives seen so far
+        self._narrow()
+        # Only the root's start event is needed; searches run XPath on the partial tree
+        self._parser = etree.HTMLPullParser(events=('start',), tag='html', encoding=encoding or 'utf-8')
+        self._feeder = _TagAlignedFeeder(self._parser)
+        self._root = None
+        self._bookmark = None  # the last node in the tree as of the previous search
+        self._candidates = {}  # pending name -> its first match, until that element closes
+        self._found = {}
+        self._scope_el = None
+        self._chunks = []
+        self._size = 0
+        self.done = False
+        self.finished = False  # the whole body was read (close() was called)
+        self.parse_seconds = 0.0  # libxml2 time spent on feed() and close()
+
+    @property
+    def body(self) -> bytes:
+        return b''.join(self._chunks)
+
+    def feed(self, data: bytes) -> bool:
+        """Parse the next chunk; True once every field is resolved (stop reading)."""
+        if self.done:
+            return True
+        self._chunks.append(data)
+        self._size += len(data)
+        if self._see(data):
+            self._narrow()
+        started = time.perf_counter()
+        self._feeder.feed(data)
+        self.parse_seconds += time.perf_counter() - started
+        if self._matching and self._size > self.MAX_MATCH_BYTES:
+            self._matching = False
+        self._search()
+        return self.done
+
+    def close(self):
+        """The body ended: fields not found by now are absent."""
+        if self.done:
+            return
+        started = time.perf_counter()
+        root = self._feeder.close()
+        self.parse_seconds += time.perf_counter() - started
+        if self._matching:
+            self._search(ended=True)
+        elif root is not None:
+            # Look the pending selectors up once in the finished tree
+            for name, sel in list(self._pending.items()):
+                found = sel.bind(self._seen).one(root)
+                if found is not None:
+                    self._resolve(name, found)
+            self._settle()
+        self.done = self.finished = True
+
+    def read(self, chunks) -> bytes:
+        """Feed an iterable of byte chunks until done; returns the bytes consumed."""
+        for chunk in chunks:
+            if chunk and self.feed(chunk):
+                break
+        else:
+            self.close()
+        return self.body
+
+    def _see(self, data: bytes) -> bool:
+        """Record the selector literals in a new chunk; True when there were new ones."""
+        if not self._unseen:
+            return False
+        text = self._tail + (self._decoder.decode(data).lower() if self._decode else data.lower())
+        if self._in_script and self._lt not in text:
+            # Still inside a large inline script: a literal here isn't in any tag,
+            # so it can't make an element match
+            self._tail = text[-self._overlap:]
+            return False
+        lt = text.rfind(self._lt)
+        if lt != -1:
+            # Conservative: only a '<script ...>' with no '<' after it counts
+            self._in_script = text.startswith(self._script, lt) and text.find(self._gt, lt) != -1
+        new = []
+        absent = set()
+        for key, inside in self._inside.items():
+            if key not in self._unseen:
+                continue
+            if absent.intersection(inside) or key not in text:
+                absent.add(key)
+            else:
+                new.append(key)
+        self._tail = text[-self._overlap:]
+        for key in new:
+            self._seen.add(self._unseen.pop(key))
+        return bool(new)
+
+    def _narrow(self):
+        if self._matching:
+            self._finders = {name: sel.finder(sel.narrow(self._seen)) for name, sel in self._pending.items()}
+
+    def _search(self, ended: bool = False):
+        """
+        Search what the last chunk added to the tree, then resolve the matches
+        that have closed. An element can only match once its start tag has
+        arrived, and its literals with it, so nothing before the bookmark can
+        match a selector that didn't match there before.
+        """
+        if self._root is None:
+            for _, el in self._parser.read_events():
+                self._root = el
+            if self._root is None:
+                return
+        if not self._matching:
+            return
+        start = self._bookmark if self._bookmark is not None else self._root
+        for name, find in self._finders.items():
+            if find is not None and name not in self._candidates:
+                found = find(start)
+                if found:
+                    self._candidates[name] = found[0]
+        last = self._root
+        while True:
+            try:
+                last = last[-1]  # len() would count every child
+            except IndexError:
+                break
+        self._bookmark = last
+        if not self._candidates:
+            return
+        # The parser is still inside the last node and its ancestors; anything
+        # else is complete, text included
+        still_open = set() if ended else {last, *last.iterancestors()}
+        closed = [(name, el) for name, el in self._candidates.items() if el not in still_open]
+        for name, el in closed:
+            del self._candidates[name]
+            self._resolve(name, el)
+        if closed:
+            self._settle()
+
+    def _resolve(self, name, el):
+        del self._pending[name]
+        self._finders.pop(name, None)
+        if name is None:
+            self._scope_el = el
+        else:
+            self._found[name] = el
+
+    def _settle(self):
+        if len(self._found) == len(self._fields):
+            self.done = True
+        if self._scope_el is None or not self._found:
+            return
+        # The product block has closed: a match after it belongs to the rest
+        # of the page (related products, footer), not to this product
+        inside = {name: el for name, el in self._found.items() if not _follows(el, self._scope_el)}
+        if inside:
+            self._found = inside
+            self.done = True
+
+    def one(self, field: str):
+        return self._found.get(field)
+
+
+class ExtractionSpec:
+    """
+    Per-store extraction spec, compiled once on its first page.
+
+        SEARCH_SPEC = ExtractionSpec(
+            cards='.product-card, .product-item',
+            fields={'name': '.product-title, h3', 'price': '.price', 'link': 'a'},
+        )
+        page = SEARCH_SPEC.parse(html)
+        for card in page.cards():
+            name_el = card.one('name')
+
+    scope, for scan(): the element the fields sit in (a product page's
+    product block). Matches after it has closed aren't waited for.
+    """
+
+    def __init__(self, fields: dict, cards: str = None, scope: str = None):
+        self._source = (fields, cards, scope)
+        self._lock = threading.Lock()
+        self.cards = None
+        self.fields = None
+        self.scope = None
+
+    def _compile(self):
+        if self.fields is not None:
+            return
+        with self._lock:
+            if self.fields is None:
+                fields, cards, scope = self._source
+                self.cards = Selector(cards, prefix='descendant-or-self::') if cards else None
+                self.scope = Selector(scope) if scope else None
+                self.fields = {name: Selector(css) for name, css in fields.items()}
+
+    def iter_cards(self, html, chunk_size: int = 16384):
+        """
+        Yield the page's cards while it is still being parsed, in document
+        order (a card nested in another card comes right after its outer
+        card). Each card is cleared once the caller asks for the next one,
+        so don't keep Card objects around.
+        """
+        self._compile()
+        if not html or self.cards is None:
+            return
+        if not self.cards.can_match:
+            yield from self.parse(html).cards()
+            return
+        if isinstance(html, bytes):
+            html = html.decode('utf-8', 'replace')
+        page_text = html.lower()
+        fields = {name: sel.bind(page_text) for name, sel in self.fields.items()}
+        del page_text
+        html = html.encode('utf-8')
+
+        parser = etree.HTMLPullParser(events=('end',), encoding='utf-8')
+        feeder = _TagAlignedFeeder(parser)
+        for start in range(0, len(html), chunk_size):
+            started = time.perf_counter()
+            feeder.feed(html[start:start + chunk_size])
+            _count_parse(time.perf_counter() - started)
+            yield from self._finished_cards(parser.read_events(), fields)
+        started = time.perf_counter()
+        feeder.close()
+        _count_parse(time.perf_counter() - started)
+        yield from self._finished_cards(parser.read_events(), fields)
+
+    def _finished_cards(self, events, fields):
+        matches = self.cards.matches
+        for _, el in events:
+            if not matches(el):
+                continue
+            # Inner cards wait for their outermost card, then follow it in document order
+            if any(matches(ancestor) for ancestor in el.iterancestors()):
+                continue
+            yield Card(el, fields)
+            for inner in el.iterdescendants():
+                if matches(inner):
+                    yield Card(inner, fields)
+            el.clear(keep_tail=True)
+
+    def scan(self, encoding: str = None) -> FieldScan:
+        """A FieldScan to feed a page's bytes into as they arrive."""
+        self._compile()
+        return FieldScan(self.fields, self.scope, encoding)
+
+    def parse(self, html) -> Page:
+        self._compile()
+        started = time.perf_counter()
+        root = parse_html(html)
+        _count_parse(time.perf_counter() - started)
+        if root is None:
+            return Page(None, {}, None)
+        if isinstance(html, bytes):
+            html = html.decode('utf-8', 'replace')
+        page_text = html.lower()
+        fields = {name: sel.bind(page_text) for name, sel in self.fields.items()}
+        cards = self.cards.bind(page_text) if self.cards else None
+        return Page(root, fields, cards)
+
+
+_adhoc = {}
+
+
+def select(el, css: str) -> list:
+    """Ad-hoc el.select(css) for selectors that aren't part of a spec."""
+    sel = _adhoc.get(css)
+    if sel is None:
+        sel = _adhoc[css] = Selector(css).bind()
+    return sel.all(el)
@@ -0,0 +1,241 @@
+"""
+On-disk HTTP response cache under BaseScraper.fetch()/afetch().
+
+Responses are stored zlib-compressed in a SQLite file in the scraper data
+directory, keyed by normalized URL, and shared by every scraper process.
+
+For each request:
+  - fresh entry (younger than the store's TTL): served from disk, no request
+  - stale entry with an ETag/Last-Modified: conditional GET; a 304 refreshes
+    the entry and serves the cached body
+  - no entry, or the page changed: normal GET, and the body is stored
+
+Total compressed size is bounded; least recently used entries are evicted
+first. Triggers keep a running total of it, so storing a response doesn't
+sum the whole table. Counters for hits, misses, revalidations, etc. are kept per process
+and exposed through stats().
+"""
+
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from utils.paths import data_path
+
+MAX_CACHE_BYTES = 64 * 1024 * 1024  # compressed bodies
+EVICT_TO = 0.9  # evict down to this share of max_bytes, so the next stores don't evict again
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+_COUNTERS = ('hits', 'misses', 'stale', 'revalidated', 'changed', 'stored', 'evictions')
+
+# cache_size holds the running total of responses.size, kept by the triggers,
+# so a store() doesn't sum the whole table to know whether to evict. It is
+# seeded once from the rows already there (caches created before it existed)
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL);
+CREATE TRIGGER IF NOT EXISTS responses_ai AFTER INSERT ON responses BEGIN
+    UPDATE cache_size SET total = total + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS responses_ad AFTER DELETE ON responses BEGIN
+    UPDATE cache_size SET total = total - old.size;
+END;
+CREATE TRIGGER IF NOT EXISTS responses_au AFTER UPDATE OF size ON responses BEGIN
+    UPDATE cache_size SET total = total - old.size + new.size;
+END;
+INSERT OR IGNORE INTO cache_size (id, total) SELECT 0, COALESCE(SUM(size), 0) FROM responses;
+'''
+
+# An upsert, not INSERT OR REPLACE: the rows REPLACE deletes don't fire the delete trigger
+_STORE = '''
+INSERT INTO responses (url, body, size, etag, last_modified, fetched_at, last_used)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (url) DO UPDATE SET
+    body = excluded.body, size = excluded.size, etag = excluded.etag,
+    last_modified = excluded.last_modified, fetched_at = excluded.fetched_at, last_used = excluded.last_used
+'''
+
+
+def normalize_url(url: str) -> str:
+    """Cache key: lowercase scheme/host, no default port or fragment, sorted query."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parts.port}'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
+
+
+class CachedResponse:
+    __slots__ = ('body', 'etag', 'last_modified', 'fetched_at')
+
+    def __init__(self, body: str, etag: str, last_modified: str, fetched_at: float):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    def conditional_headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    def __init__(self, path: str = None, max_bytes: int = MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self._local = threading.local()
+        self._counters = dict.fromkeys(_COUNTERS, 0)
+        self._counters_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path or data_path('http_cache.sqlite3'),
+                                   timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, counter: str, n: int = 1):
+        with self._counters_lock:
+            self._counters[counter] += n
+
+    def _disable(self, error: Exception):
+        # A broken cache must never break scraping — fall back to plain fetches
+        print(f"Response cache unavailable ({error}), fetching without it", file=sys.stderr)
+        self.enabled = False
+
+    def lookup(self, url: str, ttl: float):
+        """
+        (entry, fresh) for a URL. entry is None on a miss; a stale entry is
+        returned so the caller can revalidate it.
+        """
+        if not self.enabled:
+            return None, False
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT body, etag, last_modified, fetched_at FROM responses WHERE url = ?',
+                (normalize_url(url),),
+            ).fetchone()
+            if row is None:
+                self._count('misses')
+                return None, False
+            now = time.time()
+            conn.execute('UPDATE responses SET last_used = ? WHERE url = ?', (now, normalize_url(url)))
+        except (sqlite3.Error, OSError) as e:
+            self._disable(e)
+            return None, False
+
+        entry = CachedResponse(zlib.decompress(row[0]).decode('utf-8'), row[1], row[2], row[3])
+        fresh = now - entry.fetched_at < ttl
+        self._count('hits' if fresh else 'stale')
+        return entry, fresh
+
+    def revalidated(self, url: str):
+        """The server answered 304: the cached body is current again."""
+        self._count('revalidated')
+        if not self.enabled:
+            return
+        try:
+            now = time.time()
+            self._connection().execute('UPDATE responses SET fetched_at = ?, last_used = ? WHERE url = ?',
+                                       (now, now, normalize_url(url)))
+        except (sqlite3.Error, OSError) as e:
+            self._disable(e)
+
+    def store(self, url: str, body: str, headers, was_cached: bool = False):
+        """Save a 200 response (unless the server said no-store)."""
+        if was_cached:
+            self._count('changed')
+        if not self.enabled or 'no-store' in (headers.get('Cache-Control') or '').lower():
+            return
+        blob = zlib.compress(body.encode('utf-8'))
+        if len(blob) > self.max_bytes:
+            return
+        try:
+            now = time.time()
+            conn = self._connection()
+            conn.execute(
+                _STORE,
+                (normalize_url(url), blob, len(blob), headers.get('ETag'), headers.get('Last-Modified'), now, now),
+            )
+            self._count('stored')
+            self._evict(conn)
+        except (sqlite3.Error, OSError) as e:
+            self._disable(e)
+
+    def _evict(self, conn):
+        """Once over max_bytes, drop least recently used entries until the cache is down to EVICT_TO of it."""
+        total = conn.execute('SELECT total FROM cache_size').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_TO
+        urls = []
+        # Walks the last_used index only as far as needed
+        cursor = conn.execute('SELECT url, size FROM responses ORDER BY last_used')
+        for url, size in cursor:
+            if total <= target:
+                break
+            urls.append((url,))
+            total -= size
+        cursor.close()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('DELETE FROM responses WHERE url = ?', urls)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self._count('evictions', len(urls))
+
+    def stats(self) -> dict:
+        """This process's counters plus the cache's current size on disk."""
+        with self._counters_lock:
+            stats = dict(self._counters)
+        lookups = stats['hits'] + stats['stale'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['revalidated']) / lookups, 3) if lookups else 0.0
+        stats['enabled'] = self.enabled
+        if self.enabled:
+            try:
+                conn = self._connection()
+                entries = conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+                size = conn.execute('SELECT total FROM cache_size').fetchone()[0]
+                stats.update(entries=entries, size_bytes=size, max_bytes=self.max_bytes)
+            except (sqlite3.Error, OSError) as e:
+                self._disable(e)
+        return stats
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache() -> ResponseCache:
+    """The process-wide cache every scraper uses, so counters add up in one place."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ResponseCache()
+        return _shared
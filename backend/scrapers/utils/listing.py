@@ -0,0 +1,250 @@
+"""
+Compact listing records shared by every store scraper.
+
+Listing is one search result. It has one __slots__ field per product
+attribute, so a result set doesn't carry a dict (and every key string) per
+product. It still reads like the old dicts (listing['price'],
+listing.get('originalPrice')), so grouping and the catalog work on either.
+
+ListingBatch is the columnar form of a result set: one array.array per
+numeric column (price, originalPrice, rating, reviewsCount, inStock), store
+names interned into a small table, and lists for the strings. Grouping and
+price summaries run straight on the columns. A value a column can't hold
+as is (a non-bool stock state, a float price) is kept aside for its row,
+so iterating a batch gives back listings equal to the ones put in.
+
+Output format is unchanged: json_default() turns records and batches back
+into the same camelCase JSON objects the Node backend already reads.
+to_rows() is the optional compact form (run_search.py --wire rows): the
+field names once, then one array of values per listing.
+"""
+
+import sys
+from array import array
+from operator import attrgetter
+
+from utils.product_matcher import assign_groups, normalize_name
+
+# JSON key -> slot
+_FIELDS = {
+    'name': 'name',
+    'price': 'price',
+    'originalPrice': 'original_price',
+    'url': 'url',
+    'imageUrl': 'image_url',
+    'rating': 'rating',
+    'reviewsCount': 'reviews_count',
+    'store': 'store',
+    'inStock': 'in_stock',
+    'category': 'category',
+    'productId': 'product_id',
+}
+# Keys that only appear in the JSON once they are set
+_OPTIONAL = frozenset(('category', 'productId'))
+
+NO_ORIGINAL_PRICE = -1  # originalPrice column value for "no original price"
+
+ROW_FIELDS = tuple(_FIELDS)  # value order of a to_rows() row
+_row = attrgetter(*_FIELDS.values())
+
+
+class Listing:
+    """One product from a store's search results."""
+    __slots__ = tuple(_FIELDS.values())
+
+    def __init__(self, name: str, price: int, url: str = '', image_url: str = '',
+                 original_price: int = None, rating: float = 0.0, reviews_count: int = 0,
+                 store: str = '', in_stock: bool = True, category: str = None, product_id: int = None):
+        self.name = name
+        self.price = price
+        self.original_price = original_price
+        self.url = url
+        self.image_url = image_url
+        self.rating = rating
+        self.reviews_count = reviews_count
+        # Every listing from a store shares one store string
+        self.store = sys.intern(store) if isinstance(store, str) else store
+        self.in_stock = in_stock
+        self.category = category
+        self.product_id = product_id
+
+    def to_dict(self) -> dict:
+        """The JSON object run_search.py has always printed for a product."""
+        out = {}
+        for key, slot in _FIELDS.items():
+            value = getattr(self, slot)
+            if value is None and key in _OPTIONAL:
+                continue
+            out[key] = value
+        return out
+
+    # Dict-style access, keyed by the JSON field names
+
+    def __contains__(self, key) -> bool:
+        slot = _FIELDS.get(key)
+        return slot is not None and not (key in _OPTIONAL and getattr(self, slot) is None)
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return getattr(self, _FIELDS[key])
+
+    def __setitem__(self, key, value):
+        if key not in _FIELDS:
+            raise KeyError(f"Listing has no field {key!r}")
+        setattr(self, _FIELDS[key], value)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __eq__(self, other):
+        if isinstance(other, Listing):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Listing({self.to_dict()!r})"
+
+
+class ListingBatch:
+    """Struct-of-arrays form of a list of Listings."""
+
+    def __init__(self, listings=()):
+        self.names = []
+        self.urls = []
+        self.image_urls = []
+        self.categories = []
+        self.product_ids = []
+        self.store_names = []  # interned store table; store_ids index into it
+        self.store_ids = array('B')
+        self.price = array('q')
+        self.original_price = array('q')  # NO_ORIGINAL_PRICE when missing
+        self.rating = array('d')
+        self.reviews_count = array('q')
+        self.in_stock = array('b')
+        self.exact = {}  # row -> {slot: value} for values the numeric columns only approximate
+        self._store_index = {}
+        for listing in listings:
+            self.append(listing)
+
+    def _put(self, column: array, slot: str, value, kind: type, approximate):
+        # The column gets the value if it holds it exactly, else approximate()'s
+        # stand-in (what grouping and price summaries use) and the value goes to exact
+        if type(value) is kind:
+            try:
+                column.append(value)
+                return
+            except OverflowError:
+                pass
+        try:
+            column.append(approximate(value))
+        except (TypeError, ValueError, OverflowError):
+            column.append(0)
+        self.exact.setdefault(len(column) - 1, {})[slot] = value
+
+    def append(self, listing):
+        """Add a Listing (or an old-style product dict)."""
+        get = listing.get
+        store = get('store') or ''
+        store_id = self._store_index.get(store)
+        if store_id is None:
+            store_id = self._store_index[store] = len(self.store_names)
+            self.store_names.append(sys.intern(store))
+        original_price = get('originalPrice')
+
+        self.names.append(get('name', ''))
+        self.urls.append(get('url', ''))
+        self.image_urls.append(get('imageUrl', ''))
+        self.categories.append(get('category'))
+        self.product_ids.append(get('productId'))
+        self.store_ids.append(store_id)
+        self._put(self.price, 'price', get('price', 0), int, lambda v: int(v or 0))
+        if original_price is None:
+            self.original_price.append(NO_ORIGINAL_PRICE)
+        else:
+            self._put(self.original_price, 'original_price',
+                      original_price, int if original_price != NO_ORIGINAL_PRICE else None, int)
+        self._put(self.rating, 'rating', get('rating', 0.0), float, lambda v: float(v or 0))
+        self._put(self.reviews_count, 'reviews_count', get('reviewsCount', 0), int, lambda v: int(v or 0))
+        self._put(self.in_stock, 'in_stock', get('inStock', True), bool, lambda v: 1 if v else 0)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, i: int) -> Listing:
+        original_price = self.original_price[i]
+        listing = Listing(
+            name=self.names[i],
+            price=self.price[i],
+            original_price=None if original_price == NO_ORIGINAL_PRICE else original_price,
+            url=self.urls[i],
+            image_url=self.image_urls[i],
+            rating=self.rating[i],
+            reviews_count=self.reviews_count[i],
+            store=self.store_names[self.store_ids[i]],
+            in_stock=bool(self.in_stock[i]),
+            category=self.categories[i],
+            product_id=self.product_ids[i],
+        )
+        for slot, value in self.exact.get(i, {}).items():
+            setattr(listing, slot, value)
+        return listing
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def store(self, i: int) -> str:
+        return self.store_names[self.store_ids[i]]
+
+    def to_dicts(self) -> list:
+        return [listing.to_dict() for listing in self]
+
+    def group(self, threshold: float = 0.75) -> array:
+        """
+        Group number for every row, the same grouping group_products()
+        gives for these listings. Groups are numbered in creation order.
+        """
+        names = [normalize_name(name or '') for name in self.names]
+        order = sorted(range(len(self)), key=lambda i: (
+            names[i], self.store_names[self.store_ids[i]], self.price[i], self.urls[i] or ''))
+        group_ids = array('l', bytes(array('l').itemsize * len(self)))
+        for row, group_id in zip(order, assign_groups([names[i] for i in order], threshold)):
+            group_ids[row] = group_id
+        return group_ids
+
+    def best_offers(self, group_ids: array) -> array:
+        """Row with the lowest price in each group (ties: the group's earliest row)."""
+        best = array('l', [-1]) * (max(group_ids) + 1 if group_ids else 0)
+        price = self.price
+        for row, group_id in enumerate(group_ids):
+            current = best[group_id]
+            if current < 0 or price[row] < price[current]:
+                best[group_id] = row
+        return best
+
+
+def to_rows(listings) -> dict:
+    """
+    {"fields": ROW_FIELDS, "rows": [[...], ...]} for a list of Listings (or
+    product dicts): each listing's values in ROW_FIELDS order, null where an
+    optional field is unset. Expanding a row back into an object, skipping
+    null category/productId, gives to_dict().
+    """
+    return {
+        'fields': ROW_FIELDS,
+        'rows': [_row(l) if isinstance(l, Listing) else tuple(l.get(key) for key in ROW_FIELDS)
+                 for l in listings],
+    }
+
+
+def json_default(obj):
+    """json.dumps(..., default=json_default) hook for Listing and ListingBatch."""
+    if isinstance(obj, Listing):
+        return obj.to_dict()
+    if isinstance(obj, ListingBatch):
+        return obj.to_dicts()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -0,0 +1,258 @@
+"""
+Local full-text index over every listing the scrapers have seen.
+
+BaseScraper adds each search result here, and product-page checks update
+the price of listings already indexed. `run_search.py --mode query` (and
+the worker's "query" job) answers a keyword from the index in
+milliseconds: results are ranked by BM25 and each one carries the time
+it was last seen. An answer is stale unless every store asked for was
+searched live for that query within STALE_AFTER; recent listings that
+other searches happened to index don't count. The caller then refreshes
+the keyword live in the background (stale-while-revalidate).
+
+Storage is SQLite in the scraper data directory:
+  listings      one row per product url (normalized): name, store, price, ...
+  listings_fts  FTS5 over listings.name (external content, kept in sync by
+                triggers)
+  refreshes     (query, store) -> when that store was last searched live
+                for the query (keyed by its match_expression())
+Rows not seen (or refreshed) for MAX_AGE_DAYS are pruned.
+"""
+
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from utils.http_cache import normalize_url
+from utils.paths import data_path
+
+DAY = 86400
+STALE_AFTER = 3600.0  # seconds — answers not refreshed live for this long are stale
+MAX_AGE_DAYS = 14
+PRUNE_EVERY = 200  # add() calls between prunes
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS listings (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    store TEXT,
+    price INTEGER,
+    original_price INTEGER,
+    image_url TEXT,
+    rating REAL,
+    reviews_count INTEGER,
+    in_stock INTEGER,
+    listing_url TEXT,
+    seen_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS listings_seen_at ON listings (seen_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5(
+    name, content='listings', content_rowid='id'
+);
+CREATE TABLE IF NOT EXISTS refreshes (
+    query TEXT NOT NULL,
+    store TEXT NOT NULL,
+    refreshed_at REAL NOT NULL,
+    PRIMARY KEY (query, store)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS listings_ai AFTER INSERT ON listings BEGIN
+    INSERT INTO listings_fts (rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS listings_ad AFTER DELETE ON listings BEGIN
+    INSERT INTO listings_fts (listings_fts, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS listings_au AFTER UPDATE OF name ON listings BEGIN
+    INSERT INTO listings_fts (listings_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    INSERT INTO listings_fts (rowid, name) VALUES (new.id, new.name);
+END;
+'''
+
+_UPSERT = '''
+INSERT INTO listings (url, name, store, price, original_price, image_url, rating, reviews_count,
+                      in_stock, listing_url, seen_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (url) DO UPDATE SET
+    name = excluded.name, store = excluded.store, price = excluded.price,
+    original_price = excluded.original_price, image_url = excluded.image_url,
+    rating = excluded.rating, reviews_count = excluded.reviews_count,
+    in_stock = excluded.in_stock, listing_url = excluded.listing_url, seen_at = excluded.seen_at
+'''
+
+
+def match_expression(keyword: str) -> str:
+    """
+    FTS5 query for a keyword: every word must match, the last one as a
+    prefix (so "iphone 15 pr" finds "iPhone 15 Pro").
+    """
+    tokens = _TOKEN.findall((keyword or '').lower())
+    if not tokens:
+        return ''
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class ListingIndex:
+    def __init__(self, path: str = None):
+        self.path = path
+        self.enabled = True
+        self._local = threading.local()
+        self._adds = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path or data_path('listing_index.sqlite3'),
+                                   timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _disable(self, error: Exception):
+        # A broken index must never break scraping
+        print(f"Listing index unavailable ({error}), not indexing", file=sys.stderr)
+        self.enabled = False
+
+    def add(self, listings, ts: float = None) -> int:
+        """
+        Index search listings (mappings or Listings with url and name).
+        Observations without a name (product-page checks) only refresh the
+        price and stock state of a listing already indexed. Returns rows
+        written.
+        """
+        if not self.enabled:
+            return 0
+        ts = ts if ts is not None else time.time()
+        upserts, updates = [], []
+        for listing in listings:
+            url = listing.get('url')
+            price = listing.get('price')
+            if not url or not isinstance(price, (int, float)) or price <= 0:
+                continue
+            in_stock = 1 if listing.get('inStock', True) else 0
+            name = listing.get('name')
+            if not name:
+                updates.append((int(price), in_stock, ts, normalize_url(url)))
+                continue
+            upserts.append((
+                normalize_url(url), name, listing.get('store'), int(price), listing.get('originalPrice'),
+                listing.get('imageUrl'), listing.get('rating'), listing.get('reviewsCount'), in_stock, url, ts,
+            ))
+        if not upserts and not updates:
+            return 0
+
+        try:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(_UPSERT, upserts)
+                conn.executemany('UPDATE listings SET price = ?, in_stock = ?, seen_at = ? WHERE url = ?', updates)
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            self._adds += 1
+            if self._adds % PRUNE_EVERY == 0:
+                self.prune(now=ts)
+        except sqlite3.Error as e:
+            self._disable(e)
+            return 0
+        return len(upserts) + len(updates)
+
+    def prune(self, max_age_days: float = MAX_AGE_DAYS, now: float = None) -> int:
+        """Drop listings not seen (and refresh records older than) max_age_days; returns listings dropped."""
+        cutoff = (now if now is not None else time.time()) - max_age_days * DAY
+        self._connection().execute('DELETE FROM refreshes WHERE refreshed_at < ?', (cutoff,))
+        return self._connection().execute('DELETE FROM listings WHERE seen_at < ?', (cutoff,)).rowcount
+
+    def refreshed(self, keyword: str, store: str, ts: float = None):
+        """Note that store was just searched live for keyword (its listings were add()ed)."""
+        expression = match_expression(keyword)
+        if not expression or not store or not self.enabled:
+            return
+        try:
+            self._connection().execute(
+                'INSERT INTO refreshes (query, store, refreshed_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (query, store) DO UPDATE SET refreshed_at = excluded.refreshed_at',
+                (expression, store, ts if ts is not None else time.time()),
+            )
+        except sqlite3.Error as e:
+            self._disable(e)
+
+    def _refreshed_at(self, expression: str, stores: list = None):
+        """
+        When the query was last refreshed live across stores: the oldest
+        store's time (None if any was never searched), or without stores the
+        latest of any.
+        """
+        rows = dict(self._connection().execute('SELECT store, refreshed_at FROM refreshes WHERE query = ?',
+                                               (expression,)).fetchall())
+        if not stores:
+            return max(rows.values()) if rows else None
+        if any(store not in rows for store in stores):
+            return None
+        return min(rows[store] for store in stores)
+
+    def query(self, keyword: str, stores: list = None, limit: int = 100, now: float = None) -> dict:
+        """
+        Best BM25 matches for keyword, optionally only from the given store
+        names. Returns {'results', 'count', 'age', 'refreshedAt', 'stale'}:
+        every result is a product dict plus 'seenAt', 'age' is the freshest
+        result's age in seconds (None without results), 'refreshedAt' when
+        the query was last searched live (see _refreshed_at(); None if never)
+        and 'stale' is true when that is unknown or older than STALE_AFTER.
+        """
+        now = now if now is not None else time.time()
+        answer = {'results': [], 'count': 0, 'age': None, 'refreshedAt': None, 'stale': True}
+        expression = match_expression(keyword)
+        if not expression or not self.enabled:
+            return answer
+
+        sql = ('SELECT l.name, l.price, l.original_price, l.listing_url, l.image_url, l.rating, '
+               'l.reviews_count, l.store, l.in_stock, l.seen_at '
+               'FROM listings_fts JOIN listings l ON l.id = listings_fts.rowid '
+               'WHERE listings_fts MATCH ?')
+        params = [expression]
+        if stores:
+            sql += f" AND l.store IN ({', '.join('?' * len(stores))})"
+            params.extend(stores)
+        sql += ' ORDER BY bm25(listings_fts), l.seen_at DESC LIMIT ?'
+        params.append(limit)
+        try:
+            rows = self._connection().execute(sql, params).fetchall()
+            refreshed_at = self._refreshed_at(expression, stores)
+        except sqlite3.Error as e:
+            self._disable(e)
+            return answer
+
+        answer['results'] = [{
+            'name': name, 'price': price, 'originalPrice': original_price, 'url': url,
+            'imageUrl': image_url or '', 'rating': rating or 0.0, 'reviewsCount': reviews_count or 0,
+            'store': store, 'inStock': bool(in_stock), 'seenAt': round(seen_at, 3),
+        } for name, price, original_price, url, image_url, rating, reviews_count, store, in_stock, seen_at in rows]
+        answer['count'] = len(rows)
+        if rows:
+            answer['age'] = round(now - max(row[-1] for row in rows), 1)
+        if refreshed_at is not None:
+            answer['refreshedAt'] = round(refreshed_at, 3)
+            answer['stale'] = now - refreshed_at > STALE_AFTER
+        return answer
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_index() -> ListingIndex:
+    """The process-wide index every scraper writes to."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ListingIndex()
+        return _shared
@@ -0,0 +1,207 @@
+"""
+Per-stage timings and byte counts for the scraper pipeline.
+
+Every stage of a request records here, labelled by store:
+
+  rate_limit_wait  RateLimiter.wait()/async_wait(), including the SQLite bucket
+  query_cache      query-cache lookup before a search (utils/query_cache.py)
+  cache_lookup     response-cache read before a fetch
+  connect          new TCP/TLS connection (async path only; on the blocking
+                   path it is part of ttfb)
+  ttfb             request sent until response headers arrive
+  download         reading the body
+  decode           bytes to str
+  parse            building the tree (libxml2) or decoding JSON
+  extract          walking cards/fields into Listings
+  parse_pool       handing a body to a parse worker process and getting the
+                   Listings back (its parse/extract stages are replayed here)
+  serialize        json.dumps of the output (no store label)
+
+plus counters: requests, bytes, retries, request_errors, cache_fresh,
+cache_revalidated, query_cache_exact, query_cache_subsumed, listings,
+early_closes (product pages dropped once their fields were found), and
+parse_pool_jobs / parse_pool_inline (utils/parse_pool.py).
+
+Two views of the same observations:
+  - the process-wide registry keeps totals and latency histograms for the
+    worker's Prometheus endpoint (prometheus_text());
+  - collect() opens a per-run recorder, so one CLI run or one worker job
+    can report only its own stages (the "metrics" block in the output).
+    Runs are tracked in a context variable: code that hands work to
+    another thread wraps the callable with bind() so the stages it records
+    still count towards the run. Work done in another process is recorded
+    on a tape() there and replay()ed here.
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram buckets (seconds) for the Prometheus view
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0)
+
+PROMETHEUS_PREFIX = 'bhao_scraper'
+
+
+class Recorder:
+    """Stage timings and counters by store. Thread-safe."""
+
+    def __init__(self, buckets: tuple = None):
+        self.buckets = buckets
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._stages = {}  # (store, stage) -> [count, seconds, max, bucket counts or None]
+        self._counters = {}  # (store, counter) -> value
+
+    def observe(self, stage: str, seconds: float, store: str = ''):
+        with self._lock:
+            entry = self._stages.get((store, stage))
+            if entry is None:
+                entry = self._stages[(store, stage)] = [0, 0.0, 0.0, [0] * len(self.buckets) if self.buckets else None]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            if entry[3] is not None:
+                for i, bound in enumerate(self.buckets):
+                    if seconds <= bound:
+                        entry[3][i] += 1
+                        break
+
+    def add(self, counter: str, n: float = 1, store: str = ''):
+        with self._lock:
+            self._counters[(store, counter)] = self._counters.get((store, counter), 0) + n
+
+    def snapshot(self) -> dict:
+        """
+        {'elapsed', 'stores': {store: {stage: {'count', 'seconds', 'max'},
+        counter: value}}, stage: {...}}. Stages recorded without a store
+        (serialize) sit at the top level.
+        """
+        with self._lock:
+            stages = {key: list(entry[:3]) for key, entry in self._stages.items()}
+            counters = dict(self._counters)
+        out = {'elapsed': round(time.monotonic() - self.started, 3), 'stores': {}}
+        for (store, stage), (count, seconds, longest) in sorted(stages.items()):
+            target = out['stores'].setdefault(store, {}) if store else out
+            target[stage] = {'count': count, 'seconds': round(seconds, 4), 'max': round(longest, 4)}
+        for (store, counter), value in sorted(counters.items()):
+            target = out['stores'].setdefault(store, {}) if store else out
+            target[counter] = value
+        return out
+
+    def prometheus_text(self) -> str:
+        """Prometheus text exposition of everything recorded so far."""
+        with self._lock:
+            stages = {key: (entry[0], entry[1], list(entry[3] or ())) for key, entry in self._stages.items()}
+            counters = dict(self._counters)
+
+        name = f'{PROMETHEUS_PREFIX}_stage_seconds'
+        lines = [f'# HELP {name} Time spent in each scraper pipeline stage.',
+                 f'# TYPE {name} histogram']
+        for (store, stage), (count, seconds, buckets) in sorted(stages.items()):
+            labels = f'store="{store}",stage="{stage}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets or (), buckets):
+                cumulative += n
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{{labels}}} {seconds:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {count}')
+
+        for counter in sorted({counter for _, counter in counters}):
+            name = f'{PROMETHEUS_PREFIX}_{counter}_total'
+            lines.append(f'# TYPE {name} counter')
+            for (store, c), value in sorted(counters.items()):
+                if c == counter:
+                    lines.append(f'{name}{{store="{store}"}} {value}')
+
+        name = f'{PROMETHEUS_PREFIX}_uptime_seconds'
+        lines += [f'# TYPE {name} gauge', f'{name} {time.monotonic() - self.started:.3f}']
+        return '\n'.join(lines) + '\n'
+
+
+_registry = Recorder(BUCKETS)
+_runs = contextvars.ContextVar('bhao_metrics_runs', default=())
+
+
+def registry() -> Recorder:
+    """The process-wide recorder (Prometheus endpoint, worker stats)."""
+    return _registry
+
+
+def observe(stage: str, seconds: float, store: str = ''):
+    """Record one stage timing, process-wide and for every run in progress."""
+    _registry.observe(stage, seconds, store)
+    for run in _runs.get():
+        run.observe(stage, seconds, store)
+
+
+def add(counter: str, n: float = 1, store: str = ''):
+    _registry.add(counter, n, store)
+    for run in _runs.get():
+        run.add(counter, n, store)
+
+
+@contextmanager
+def timer(stage: str, store: str = ''):
+    """Time the body of a with block as one stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started, store)
+
+
+@contextmanager
+def collect():
+    """Record the stages of everything run inside the block into a fresh Recorder."""
+    run = Recorder()
+    token = _runs.set(_runs.get() + (run,))
+    try:
+        yield run
+    finally:
+        _runs.reset(token)
+
+
+def bind(fn):
+    """
+    fn, running in a copy of the caller's context — pass the result to a
+    thread or executor so its stages count towards the caller's run. Each
+    bound callable may only run once at a time.
+    """
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+class Tape:
+    """Observations in the order they were made, to replay() in another process."""
+
+    def __init__(self):
+        self.events = []  # (kind, name, value, store)
+
+    def observe(self, stage: str, seconds: float, store: str = ''):
+        self.events.append(('observe', stage, seconds, store))
+
+    def add(self, counter: str, n: float = 1, store: str = ''):
+        self.events.append(('add', counter, n, store))
+
+
+@contextmanager
+def tape():
+    """Record the stages of everything run inside the block onto a fresh Tape."""
+    run = Tape()
+    token = _runs.set(_runs.get() + (run,))
+    try:
+        yield run
+    finally:
+        _runs.reset(token)
+
+
+def replay(events: list):
+    """Record a Tape's events here, as if they had happened in this process."""
+    for kind, name, value, store in events:
+        if kind == 'observe':
+            observe(name, value, store)
+        else:
+            add(name, value, store)
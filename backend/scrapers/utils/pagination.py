@@ -0,0 +1,86 @@
+"""
+Multi-page search: how deep a store's results are worth crawling.
+
+BaseScraper fetches page 1, then pages 2..N concurrently, and feeds the
+pages to a PageCrawl in page order. The crawl stops at the first page that:
+  - has no listings we haven't already seen (past the last page, or the
+    store repeating itself)
+  - is mostly off-topic: its mean keyword relevance falls below
+    MIN_PAGE_RELEVANCE. Stores sort by relevance, so later pages only get
+    worse. The relevant listings on that page are still kept.
+  - brings the total to max_results or more
+Pages after a stop are cancelled, or dropped if already in flight.
+"""
+
+import re
+
+MIN_PAGE_RELEVANCE = 0.5
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def keyword_terms(keyword: str) -> frozenset:
+    return frozenset(_TOKEN.findall((keyword or '').lower()))
+
+
+def relevance(terms: frozenset, name: str) -> float:
+    """Share of the keyword's terms that appear as words in a listing name (0-1)."""
+    if not terms:
+        return 1.0
+    words = set(_TOKEN.findall((name or '').lower()))
+    return len(terms & words) / len(terms)
+
+
+def page_relevance(terms: frozenset, listings: list) -> float:
+    """Mean relevance of a page's listings; 0 for an empty page."""
+    if not listings:
+        return 0.0
+    return sum(relevance(terms, listing.get('name')) for listing in listings) / len(listings)
+
+
+class PageCrawl:
+    """Accumulates a search's pages in order and decides when to stop."""
+
+    def __init__(self, keyword: str, max_results: int, min_relevance: float = MIN_PAGE_RELEVANCE):
+        self.terms = keyword_terms(keyword)
+        self.max_results = max_results
+        self.min_relevance = min_relevance
+        self.listings = []
+        self.pages = 0
+        self.stop_reason = None
+        self._seen = set()
+
+    @property
+    def done(self) -> bool:
+        return self.stop_reason is not None
+
+    @staticmethod
+    def _key(listing):
+        return listing.get('url') or (listing.get('name'), listing.get('price'))
+
+    def add(self, listings: list) -> list:
+        """
+        Take the next page's listings; returns the ones kept. Page 1 is
+        always kept whole, as a single-page search would return it.
+        """
+        self.pages += 1
+        if self.pages == 1:
+            new = list(listings)
+            self._seen.update(self._key(listing) for listing in new)
+        else:
+            new = []
+            for listing in listings:
+                key = self._key(listing)
+                if key not in self._seen:
+                    self._seen.add(key)
+                    new.append(listing)
+
+        if not new:
+            self.stop_reason = 'exhausted'
+        elif self.pages > 1 and page_relevance(self.terms, new) < self.min_relevance:
+            self.stop_reason = 'relevance'
+            new = [l for l in new if relevance(self.terms, l.get('name')) >= self.min_relevance]
+        self.listings.extend(new)
+        if self.stop_reason is None and len(self.listings) >= self.max_results:
+            self.stop_reason = 'max_results'
+        return new
@@ -0,0 +1,202 @@
+"""
+Search-result parsing in worker processes, so a multi-store, multi-page
+search parses on every core instead of one.
+
+Building a page's tree and walking its cards is CPU work under the GIL:
+however many stores and pages are fetched at once, their parsing queues
+up on one core. With a parse pool configured, BaseScraper hands each
+downloaded search body to a ProcessPoolExecutor instead:
+
+  - Workers are spawned (not forked: the parent has threads and SQLite
+    connections) and warmed up front. Each imports the store modules,
+    lxml and cssselect and compiles every store's selectors once, so the
+    first search doesn't pay for it. A worker that fails to warm up turns
+    the pool off.
+  - The body goes in and a ListingBatch (utils/listing.py) comes back:
+    columnar arrays that pickle smaller than Listing objects and turn
+    back into identical Listings. Prices are recorded in the parent as
+    before.
+  - The worker records its parse/extract stages on a metrics tape, which
+    the parent replays, so --metrics reads the same as in-process.
+  - Backpressure: at most max_pending bodies are queued or parsing. When
+    the pool is full, overflow='inline' parses the body in the calling
+    thread (counted as parse_pool_inline) and overflow='wait' blocks
+    until a worker frees up.
+  - Bodies under MIN_POOL_BYTES parse in-process: shipping them costs
+    more than parsing them.
+  - If the pool can't start or a worker dies, the pool turns itself off
+    with a message on stderr, and everything parses in-process as before.
+
+The pool is off by default (a one-shot CLI search would spend longer
+spawning workers than parsing). Turn it on with --parse-workers N, or
+BHAO_SCRAPER_PARSE_WORKERS=N for every run, e.g. in the Node-spawned
+worker's environment; 'auto' means one per core, leaving one for the
+parent. configure() is called once at startup; shared_parse_pool()
+returns the pool, or None when parsing stays in-process.
+"""
+
+import os
+import sys
+import threading
+import time
+
+from utils import metrics
+
+PARSE_WORKERS_ENV = 'BHAO_SCRAPER_PARSE_WORKERS'
+MIN_POOL_BYTES = 8192  # smaller bodies parse in-process
+PENDING_PER_WORKER = 2  # default max_pending = workers × this
+OVERFLOW_POLICIES = ('inline', 'wait')
+
+# Worker process state: {store key: scraper instance}
+_worker_scrapers = {}
+
+
+def worker_count(value) -> int:
+    """Parse a --parse-workers / env value: a number, 'auto' (cores - 1) or empty (0)."""
+    if value in (None, ''):
+        return 0
+    if str(value).strip().lower() == 'auto':
+        return max(0, (os.cpu_count() or 1) - 1)
+    return max(0, int(value))
+
+
+def _worker_scraper(store: str):
+    scraper = _worker_scrapers.get(store)
+    if scraper is None:
+        from stores import SCRAPERS
+
+        scraper = _worker_scrapers[store] = SCRAPERS[store]()
+    return scraper
+
+
+def _warm():
+    """Pool initializer: import every store and compile its selectors."""
+    from stores import SCRAPERS
+
+    for store in SCRAPERS:
+        _worker_scraper(store).parse_listings('<html><body></body></html>')
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _parse(store: str, parser: str, body: str):
+    """Worker side: (ListingBatch, metrics events) for one body."""
+    from utils.listing import ListingBatch
+
+    with metrics.tape() as tape:
+        listings = _worker_scraper(store).parse_listings(body, parser)
+    return ListingBatch(listings), tape.events
+
+
+class ParsePool:
+    def __init__(self, workers: int, max_pending: int = None, overflow: str = 'inline',
+                 min_bytes: int = MIN_POOL_BYTES):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {', '.join(OVERFLOW_POLICIES)}")
+        self.workers = workers
+        self.max_pending = max_pending or workers * PENDING_PER_WORKER
+        self.overflow = overflow
+        self.min_bytes = min_bytes
+        self.enabled = True
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _disable(self, error: Exception):
+        # A broken pool must never break searching — parse in-process instead
+        print(f"Parse pool unavailable ({error}), parsing in-process", file=sys.stderr)
+        self.enabled = False
+
+    def start(self):
+        """Spawn and warm the workers (in the background; returns at once)."""
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        with self._lock:
+            if self._executor is not None or not self.enabled:
+                return
+            try:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_warm)
+                for _ in range(self.workers):
+                    self._executor.submit(_ping).add_done_callback(self._warmed)
+            except (OSError, ImportError, ValueError) as e:
+                self._executor = None
+                self._disable(e)
+
+    def _warmed(self, future):
+        # Runs on the executor's thread once a worker answered (or its initializer failed)
+        if not future.cancelled() and future.exception() is not None:
+            self._disable(future.exception())
+
+    def parse(self, store: str, parser: str, body: str):
+        """
+        Listings parsed from body by scraper method `parser` in a worker, or
+        None when the caller should parse in-process (pool off, body small,
+        pool full with overflow='inline').
+        """
+        if not self.enabled or len(body) < self.min_bytes:
+            return None
+        executor = self._executor
+        if executor is None:
+            self.start()
+            executor = self._executor
+            if executor is None:
+                return None
+        if not self._slots.acquire(blocking=self.overflow == 'wait'):
+            metrics.add('parse_pool_inline', 1, store)
+            return None
+        from concurrent.futures.process import BrokenProcessPool
+
+        started = time.perf_counter()
+        try:
+            batch, events = executor.submit(_parse, store, parser, body).result()
+        except BrokenProcessPool as e:
+            self._disable(e)
+            return None
+        except RuntimeError:
+            # Submitted after shutdown(): the pool is going away, parse in-process
+            return None
+        finally:
+            self._slots.release()
+        listings = list(batch)
+        metrics.replay(events)
+        metrics.observe('parse_pool', time.perf_counter() - started, store)
+        metrics.add('parse_pool_jobs', 1, store)
+        return listings
+
+    def stats(self) -> dict:
+        return {'workers': self.workers, 'max_pending': self.max_pending, 'overflow': self.overflow,
+                'min_bytes': self.min_bytes, 'enabled': self.enabled}
+
+    def shutdown(self):
+        with self._lock:
+            self.enabled = False  # parse() must not start it again
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def configure(workers: int, max_pending: int = None, overflow: str = 'inline') -> ParsePool:
+    """Set up the process-wide pool (workers=0: parse in-process) and start it; returns it or None."""
+    global _shared
+    with _shared_lock:
+        if _shared is not None:
+            _shared.shutdown()
+        _shared = ParsePool(workers, max_pending, overflow) if workers > 0 else None
+    if _shared is not None:
+        _shared.start()
+    return _shared
+
+
+def shared_parse_pool():
+    """The configured pool, or None while parsing in-process."""
+    pool = _shared
+    return pool if pool is not None and pool.enabled else None
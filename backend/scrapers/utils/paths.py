@@ -0,0 +1,15 @@
+"""
+Local state shared by scraper processes (rate-limit buckets, caches, indexes).
+Lives in backend/scrapers/.data unless BHAO_SCRAPER_DATA_DIR is set.
+"""
+
+import os
+
+SCRAPERS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def data_path(filename: str) -> str:
+    """Absolute path for a file in the scraper data directory (created on demand)."""
+    data_dir = os.environ.get('BHAO_SCRAPER_DATA_DIR') or os.path.join(SCRAPERS_DIR, '.data')
+    os.makedirs(data_dir, exist_ok=True)
+    return os.path.join(data_dir, filename)
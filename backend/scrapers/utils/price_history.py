@@ -0,0 +1,238 @@
+"""
+Local price history — every price a scraper sees, kept as a time series.
+
+BaseScraper records each search listing and product-page check here, so
+"lowest in 30 days", alert checks against recent prices and price-drop
+detection can be answered from disk instead of a live re-scrape.
+
+Storage is append-only SQLite in the scraper data directory:
+  price_series  one row per product url (normalized) with its store
+  price_points  (series_id, ts) -> price, in_stock; a WITHOUT ROWID table
+                clustered on (series_id, ts), so a product's history is one
+                contiguous range scan
+  downsampled   how far back points have been downsampled (one row)
+
+Prices of 0 (unparseable) are never stored. Points older than FULL_DAYS
+are downsampled to the ones where the price or stock state changed, and
+anything older than MAX_AGE_DAYS is pruned.
+"""
+
+import sqlite3
+import sys
+import threading
+import time
+
+from utils.http_cache import normalize_url
+from utils.paths import data_path
+
+DAY = 86400
+FULL_DAYS = 30  # newer points are kept at full resolution
+MAX_AGE_DAYS = 365
+PRUNE_EVERY = 200  # record() calls between prunes
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS price_series (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    store TEXT
+);
+CREATE TABLE IF NOT EXISTS price_points (
+    series_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    price INTEGER NOT NULL,
+    in_stock INTEGER NOT NULL,
+    PRIMARY KEY (series_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS downsampled (
+    until INTEGER NOT NULL
+);
+'''
+
+
+class PriceHistory:
+    def __init__(self, path: str = None):
+        self.path = path
+        self.enabled = True
+        self._local = threading.local()
+        self._records = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path or data_path('price_history.sqlite3'),
+                                   timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def record(self, observations, ts: float = None) -> int:
+        """
+        Append observations: mappings (or Listings) with url, store, price
+        and inStock. Returns how many were stored; never raises on storage
+        errors, a broken history must not break scraping.
+        """
+        if not self.enabled:
+            return 0
+        ts = int(ts if ts is not None else time.time())
+        rows = []
+        for obs in observations:
+            url, price = obs.get('url'), obs.get('price')
+            if url and isinstance(price, (int, float)) and price > 0:
+                rows.append((normalize_url(url), obs.get('store'), int(price), 1 if obs.get('inStock', True) else 0))
+        if not rows:
+            return 0
+
+        try:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany('INSERT OR IGNORE INTO price_series (url, store) VALUES (?, ?)',
+                                 [(url, store) for url, store, _, _ in rows])
+                # Same url seen twice in one second: the later observation wins
+                conn.executemany(
+                    'INSERT OR REPLACE INTO price_points (series_id, ts, price, in_stock) '
+                    'SELECT id, ?, ?, ? FROM price_series WHERE url = ?',
+                    [(ts, price, in_stock, url) for url, _, price, in_stock in rows],
+                )
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            print(f"Price history unavailable ({e}), not recording", file=sys.stderr)
+            self.enabled = False
+            return 0
+
+        self._records += 1
+        if self._records % PRUNE_EVERY == 0:
+            try:
+                self.prune(now=ts)
+            except sqlite3.Error as e:
+                # e.g. locked by another process: recording goes on, the next prune catches up
+                print(f"Price history prune skipped ({e})", file=sys.stderr)
+        return len(rows)
+
+    def prune(self, max_age_days: float = MAX_AGE_DAYS, full_days: float = FULL_DAYS, now: float = None) -> int:
+        """
+        Drop points older than max_age_days (a series still recording keeps
+        its price as of that cutoff), and points older than full_days that
+        repeat the price and stock state before them (change points and
+        min/max survive), then series left empty. Returns how many points.
+        Only points that crossed full_days since the last prune are
+        downsampled; the rest already were.
+        """
+        now = now if now is not None else time.time()
+        until = int(now - full_days * DAY)
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT until FROM downsampled').fetchone()
+            since = row[0] if row else 0
+            oldest = int(now - max_age_days * DAY)
+            # A run's later points may already be downsampled away, so its
+            # price as of the cutoff moves there before the old points go
+            conn.execute(
+                'INSERT OR IGNORE INTO price_points (series_id, ts, price, in_stock) '
+                'SELECT p.series_id, ?, p.price, p.in_stock FROM price_series s JOIN price_points p '
+                'ON p.series_id = s.id AND p.ts = (SELECT MAX(ts) FROM price_points q WHERE q.series_id = s.id AND q.ts < ?) '
+                'WHERE EXISTS (SELECT 1 FROM price_points r WHERE r.series_id = s.id AND r.ts > ?)',
+                (oldest, oldest, oldest),
+            )
+            # "series_id IN price_series" turns each range into one seek per series
+            removed = conn.execute('DELETE FROM price_points WHERE series_id IN (SELECT id FROM price_series) '
+                                   'AND ts < ?', (oldest,)).rowcount
+            if until > since:
+                removed += conn.execute(
+                    'DELETE FROM price_points WHERE series_id IN (SELECT id FROM price_series) '
+                    'AND ts >= ? AND ts < ? AND (price, in_stock) = ('
+                    ' SELECT p.price, p.in_stock FROM price_points p'
+                    ' WHERE p.series_id = price_points.series_id AND p.ts < price_points.ts'
+                    ' ORDER BY p.ts DESC LIMIT 1)',
+                    (since, until),
+                ).rowcount
+                conn.execute('DELETE FROM downsampled')
+                conn.execute('INSERT INTO downsampled (until) VALUES (?)', (until,))
+            conn.execute('DELETE FROM price_series WHERE NOT EXISTS '
+                         '(SELECT 1 FROM price_points WHERE series_id = price_series.id)')
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return removed
+
+    def _series_id(self, url: str):
+        row = self._connection().execute('SELECT id FROM price_series WHERE url = ?',
+                                         (normalize_url(url),)).fetchone()
+        return row[0] if row else None
+
+    def latest(self, url: str):
+        """Most recent observation {'ts', 'price', 'inStock'}, or None."""
+        series_id = self._series_id(url)
+        if series_id is None:
+            return None
+        row = self._connection().execute(
+            'SELECT ts, price, in_stock FROM price_points WHERE series_id = ? ORDER BY ts DESC LIMIT 1',
+            (series_id,),
+        ).fetchone()
+        return {'ts': row[0], 'price': row[1], 'inStock': bool(row[2])} if row else None
+
+    def window(self, url: str, days: float = 30, now: float = None) -> dict:
+        """min/max/avg price and observation count over the last `days` days."""
+        series_id = self._series_id(url)
+        stats = {'days': days, 'count': 0, 'min': None, 'max': None, 'avg': None}
+        if series_id is None:
+            return stats
+        since = int((now if now is not None else time.time()) - days * DAY)
+        count, low, high, avg = self._connection().execute(
+            'SELECT COUNT(*), MIN(price), MAX(price), AVG(price) FROM price_points '
+            'WHERE series_id = ? AND ts >= ?',
+            (series_id, since),
+        ).fetchone()
+        stats.update(count=count, min=low, max=high, avg=round(avg) if avg is not None else None)
+        return stats
+
+    def change_points(self, url: str, days: float = None, now: float = None) -> list:
+        """
+        Observations where the price or stock state differs from the one
+        before it, oldest first: [{'ts', 'price', 'previousPrice', 'inStock'}].
+        The first observation in the range counts as a change.
+        """
+        series_id = self._series_id(url)
+        if series_id is None:
+            return []
+        since = int((now if now is not None else time.time()) - days * DAY) if days else 0
+        rows = self._connection().execute(
+            'SELECT ts, price, in_stock FROM price_points WHERE series_id = ? AND ts >= ? ORDER BY ts',
+            (series_id, since),
+        ).fetchall()
+        changes = []
+        previous = None
+        for ts, price, in_stock in rows:
+            if previous is None or price != previous[0] or in_stock != previous[1]:
+                changes.append({'ts': ts, 'price': price, 'previousPrice': previous[0] if previous else None,
+                                'inStock': bool(in_stock)})
+            previous = (price, in_stock)
+        return changes
+
+    def summary(self, url: str, days: float = 30) -> dict:
+        """latest + window + change points in one payload (the worker's history job)."""
+        return {
+            'url': url,
+            'latest': self.latest(url),
+            'window': self.window(url, days),
+            'changes': self.change_points(url, days),
+        }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_history() -> PriceHistory:
+    """The process-wide history every scraper records into."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = PriceHistory()
+        return _shared
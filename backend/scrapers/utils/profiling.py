@@ -0,0 +1,86 @@
+"""
+Opt-in CPU and memory profiles for a scraper run (run_search.py --profile).
+
+profiled(directory) runs its block under cProfile and tracemalloc, then
+writes, for one run:
+
+  <label>-<pid>-<time>.prof              cProfile stats of every thread
+                                         (pstats / snakeviz)
+  <label>-<pid>-<time>.tracemalloc       tracemalloc snapshot
+                                         (tracemalloc.Snapshot.load)
+  <label>-<pid>-<time>.tracemalloc.txt   peak traced memory and the top
+                                         allocation sites
+
+cProfile only profiles the thread that enables it, so a profile hook also
+starts one profiler in every thread created during the run (store searches,
+page fetches, executor workers); their stats are merged into one file.
+Threads that were already running before the block aren't covered. (From
+Python 3.12 the main profiler sees every thread by itself.)
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+TRACE_FRAMES = 10  # stack depth kept per allocation
+TOP_ALLOCATIONS = 30
+
+
+@contextmanager
+def profiled(directory: str, label: str = 'run'):
+    """Profile the block; yields the path prefix the dumps are written to."""
+    os.makedirs(directory, exist_ok=True)
+    prefix = os.path.join(directory, f"{label}-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}")
+    profiles = []
+    profiles_lock = threading.Lock()
+
+    def start_thread_profile(frame, event, arg):
+        # Runs once per new thread: swap this hook for a real profiler
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+: one profiler per interpreter, and it already sees every thread
+            sys.setprofile(None)
+            return
+        with profiles_lock:
+            profiles.append(profile)
+
+    main_profile = cProfile.Profile()
+    profiles.append(main_profile)
+    tracemalloc.start(TRACE_FRAMES)
+    threading.setprofile(start_thread_profile)
+    main_profile.enable()
+    try:
+        yield prefix
+    finally:
+        main_profile.disable()
+        threading.setprofile(None)
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        _write(prefix, profiles, profiles_lock, snapshot, current, peak)
+
+
+def _write(prefix: str, profiles: list, profiles_lock, snapshot, current: int, peak: int):
+    with profiles_lock:
+        profiles = list(profiles)
+    stats = pstats.Stats(profiles[0])
+    for profile in profiles[1:]:
+        # create_stats() stops the profiler of the calling thread only; the
+        # main one is already off, so this just snapshots the others
+        stats.add(profile)
+    stats.dump_stats(prefix + '.prof')
+
+    snapshot.dump(prefix + '.tracemalloc')
+    with open(prefix + '.tracemalloc.txt', 'w', encoding='utf-8') as f:
+        f.write(f'Traced memory: {current / 1e6:.1f} MB at exit, {peak / 1e6:.1f} MB peak\n\n')
+        for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+            f.write(f'{stat}\n')
+    print(f"Profile written to {prefix}.prof and {prefix}.tracemalloc[.txt] "
+          f"({len(profiles)} threads, peak {peak / 1e6:.1f} MB traced)", file=sys.stderr)
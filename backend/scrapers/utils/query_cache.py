@@ -0,0 +1,170 @@
+"""
+In-memory cache of search results per store, keyed by normalized query.
+
+Node caches a search under its exact keyword, so "iphone 15 128gb" scrapes
+every store again even when "iphone 15" was scraped a minute ago and its
+results already hold those listings. BaseScraper.search() (and
+iter_search()/asearch()) ask this cache first:
+
+  - Queries are normalized to a token set: lowercased words, stopwords
+    dropped, order and repeats ignored. "iPhone 15 for sale" and
+    "15 iphone" share one entry.
+  - Exact hit: an entry for the same tokens, fetched within the store's
+    TTL (query_cache_ttl_seconds) and at least as many pages deep.
+  - Subsumed hit: no exact entry, but a fresh entry for a broader query
+    (a subset of the tokens). Its listings are filtered to the ones whose
+    name has every token of the query ("128gb" matches "128GB" and
+    "128 GB"). All tokens, not just the extra ones: stores pad results
+    with near misses, and a Redmi "8GB/256GB" found for "iphone 15" is no
+    answer to "iphone 15 256gb". A broader search only holds its first
+    pages of results, so a filter that keeps fewer than
+    MIN_SUBSUMED_RESULTS listings counts as a miss and the store is
+    searched live.
+
+Entries are evicted least recently used once the cache holds more than
+MAX_ENTRIES queries or MAX_LISTINGS listings. The cache lives in the
+process, so the persistent worker (--serve) is where it pays off; a
+one-shot CLI run only shares it between its own searches. Counters are
+exposed through stats() (the worker's "stats" job).
+
+Cached Listing objects are handed out as-is (in a new list): callers that
+add fields, like the catalog's productId, set the same value every time.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+MAX_ENTRIES = 512  # (store, query) results kept
+MAX_LISTINGS = 20000  # listings kept across all entries
+MIN_SUBSUMED_RESULTS = 3  # fewer after filtering a broader query: search live instead
+
+# Words that don't narrow a product search
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'the', 'for', 'with', 'of', 'in', 'on', 'to', 'by', 'or',
+    'buy', 'online', 'sale', 'price', 'prices', 'best', 'pakistan', 'pk',
+))
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+_COUNTERS = ('hits', 'subsumed', 'misses', 'stored', 'evictions')
+
+
+def query_tokens(keyword: str) -> frozenset:
+    """A query's normalized token set: lowercase words, minus stopwords."""
+    tokens = frozenset(_TOKEN.findall((keyword or '').lower()))
+    return (tokens - STOPWORDS) or tokens  # a query made only of stopwords keeps them
+
+
+def name_has(name: str, token: str) -> bool:
+    """Does a listing name contain token as a word, or spelled without spaces ('128gb' in '128 GB')?"""
+    name = (name or '').lower()
+    return token in _TOKEN.findall(name) or token in ''.join(_TOKEN.findall(name))
+
+
+class _Entry:
+    __slots__ = ('tokens', 'listings', 'pages', 'fetched_at')
+
+    def __init__(self, tokens: frozenset, listings: list, pages: int, fetched_at: float):
+        self.tokens = tokens
+        self.listings = listings
+        self.pages = pages
+        self.fetched_at = fetched_at
+
+
+class QueryCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_listings: int = MAX_LISTINGS,
+                 min_subsumed: int = MIN_SUBSUMED_RESULTS):
+        self.max_entries = max_entries
+        self.max_listings = max_listings
+        self.min_subsumed = min_subsumed
+        self._entries = OrderedDict()  # (store, tokens) -> _Entry, least recently used first
+        self._listings = 0
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(_COUNTERS, 0)
+
+    def get(self, store: str, keyword: str, pages: int, ttl: float):
+        """
+        (listings, kind) for a store's search, kind 'exact' or 'subsumed';
+        None on a miss. Entries older than ttl seconds or fewer than pages
+        deep don't answer.
+        """
+        tokens = query_tokens(keyword)
+        if not tokens:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._usable(self._entries.get((store, tokens)), pages, ttl, now)
+            if entry is not None:
+                self._entries.move_to_end((store, tokens))
+                self._counters['hits'] += 1
+                return list(entry.listings), 'exact'
+
+            # Closest broader query first (most tokens in common), then the freshest
+            broader = sorted(
+                (e for (s, t), e in self._entries.items() if s == store and t < tokens),
+                key=lambda e: (len(e.tokens), e.fetched_at), reverse=True,
+            )
+            for entry in broader:
+                if self._usable(entry, pages, ttl, now) is None:
+                    continue
+                kept = [l for l in entry.listings if all(name_has(l.get('name'), t) for t in tokens)]
+                if len(kept) >= self.min_subsumed:
+                    self._entries.move_to_end((store, entry.tokens))
+                    self._counters['subsumed'] += 1
+                    return kept, 'subsumed'
+            self._counters['misses'] += 1
+        return None
+
+    @staticmethod
+    def _usable(entry, pages: int, ttl: float, now: float):
+        if entry is None or now - entry.fetched_at >= ttl or entry.pages < pages:
+            return None
+        return entry
+
+    def put(self, store: str, keyword: str, pages: int, listings: list):
+        """Remember a store's live search results for keyword, searched pages deep."""
+        tokens = query_tokens(keyword)
+        if not tokens:
+            return
+        entry = _Entry(tokens, list(listings), pages, time.time())
+        with self._lock:
+            old = self._entries.pop((store, tokens), None)
+            if old is not None:
+                self._listings -= len(old.listings)
+            self._entries[(store, tokens)] = entry
+            self._listings += len(entry.listings)
+            self._counters['stored'] += 1
+            while self._entries and (len(self._entries) > self.max_entries or self._listings > self.max_listings):
+                _, evicted = self._entries.popitem(last=False)
+                self._listings -= len(evicted.listings)
+                self._counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._listings = 0
+
+    def stats(self) -> dict:
+        """Counters since the process started, plus the current size."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update(entries=len(self._entries), listings=self._listings,
+                         max_entries=self.max_entries, max_listings=self.max_listings)
+        lookups = stats['hits'] + stats['subsumed'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['subsumed']) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_query_cache() -> QueryCache:
+    """The process-wide cache every scraper answers searches from."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = QueryCache()
+        return _shared
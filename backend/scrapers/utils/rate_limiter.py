@@ -1,20 +1,126 @@
 """
 Rate limiter to avoid getting banned by stores.
-Ensures minimum delay between requests to the same store.
+Token bucket per store: a steady rate of one request per `min_delay`
+seconds, with up to `burst` requests allowed back-to-back.
+
+With a `key`, the bucket lives in a SQLite file in the scraper data
+directory, so every process and thread scraping the same store shares it —
+concurrent searches can't multiply the request rate. Without a key the
+bucket is in-process only.
+
+Time spent in wait() (claiming the slot plus sleeping on it) is recorded
+as the rate_limit_wait stage (utils/metrics.py).
 """
 
+import sqlite3
+import sys
+import threading
 import time
 
+from utils import metrics
+from utils.paths import data_path
+
 
 class RateLimiter:
-    def __init__(self, min_delay: float = 2.0):
+    def __init__(self, min_delay: float = 2.0, burst: int = 1, key: str = None, path: str = None):
         self.min_delay = min_delay
-        self.last_request_time = 0.0
+        self.burst = max(1, burst)
+        self.key = key
+        self.label = key or ''  # metrics label; stays put if key falls back to None
+        self.path = path
+        self._tat = 0.0  # theoretical arrival time of the next request (in-process mode)
+        self._lock = threading.Lock()
+        self._local = threading.local()
 
-    def wait(self):
-        """Wait until enough time has passed since the last request."""
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path or data_path('rate_limits.sqlite3'),
+                                   timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, tat REAL NOT NULL)')
+            self._local.conn = conn
+        return conn
+
+    def _next_slot(self, tat: float, now: float):
+        """GCRA step: returns (slot, new_tat) for a request arriving at `now`."""
+        tat = max(tat, now)
+        slot = max(now, tat - (self.burst - 1) * self.min_delay)
+        return slot, tat + self.min_delay
+
+    def _reserve_shared(self, only_if_free: bool = False):
+        conn = self._connection()
+        # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write
+        # of the bucket is atomic across processes.
+        conn.execute('BEGIN IMMEDIATE')
         now = time.time()
-        elapsed = now - self.last_request_time
-        if elapsed < self.min_delay:
-            time.sleep(self.min_delay - elapsed)
-        self.last_request_time = time.time()
+        try:
+            row = conn.execute('SELECT tat FROM rate_buckets WHERE key = ?', (self.key,)).fetchone()
+            slot, tat = self._next_slot(row[0] if row else 0.0, now)
+            if only_if_free and slot > now:
+                conn.execute('ROLLBACK')
+                return None
+            conn.execute('INSERT OR REPLACE INTO rate_buckets (key, tat) VALUES (?, ?)', (self.key, tat))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return slot - now
+
+    def _reserve(self, only_if_free: bool = False):
+        with self._lock:
+            if self.key:
+                try:
+                    return self._reserve_shared(only_if_free)
+                except (sqlite3.Error, OSError) as e:
+                    print(f"Rate limiter: shared state unavailable ({e}), using in-process limits",
+                          file=sys.stderr)
+                    self.key = None
+            now = time.time()
+            slot, tat = self._next_slot(self._tat, now)
+            if only_if_free and slot > now:
+                return None
+            self._tat = tat
+        return slot - now
+
+    def reserve(self) -> float:
+        """Claim the next request slot; returns seconds to wait until it."""
+        # Slots are handed out under the lock and slept on outside it, so
+        # callers are served in arrival order instead of racing on wake-up.
+        return self._reserve()
+
+    def try_acquire(self) -> bool:
+        """Claim a slot only if one is free right now — for optional requests such as hedges."""
+        return self._reserve(only_if_free=True) is not None
+
+    def backlog(self) -> float:
+        """Seconds a request made now would wait for its slot, without claiming one."""
+        with self._lock:
+            tat = self._tat
+            if self.key:
+                try:
+                    row = self._connection().execute('SELECT tat FROM rate_buckets WHERE key = ?',
+                                                     (self.key,)).fetchone()
+                    tat = row[0] if row else 0.0
+                except (sqlite3.Error, OSError):
+                    pass
+        now = time.time()
+        slot, _ = self._next_slot(tat, now)
+        return max(0.0, slot - now)
+
+    def wait(self):
+        """Wait until this caller's request slot comes up."""
+        with metrics.timer('rate_limit_wait', self.label):
+            delay = self.reserve()
+            if delay > 0:
+                time.sleep(delay)
+
+    async def async_wait(self):
+        """Non-blocking variant of wait() for the asyncio fetch path."""
+        import asyncio
+
+        with metrics.timer('rate_limit_wait', self.label):
+            # reserve() can wait on another process's BEGIN IMMEDIATE: keep it off the loop
+            delay = await asyncio.get_running_loop().run_in_executor(None, self.reserve)
+            if delay > 0:
+                await asyncio.sleep(delay)
@@ -0,0 +1,108 @@
+"""
+Stored multi-store search results, refreshed in the background by prewarm.py.
+
+The prewarm crawler scrapes popular queries before their cached results
+expire and saves each result here (zlib-compressed JSON, one row per
+normalized query). The Node backend reads it through the worker's
+"prewarmed" job on a Redis miss, so popular searches skip the live scrape.
+"""
+
+import json
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+from utils.listing import json_default
+from utils.paths import data_path
+
+
+def normalize_query(query: str) -> str:
+    """The key Node caches searches under: trimmed and lowercased."""
+    return (query or '').strip().lower()
+
+
+class SearchResults:
+    def __init__(self, path: str = None):
+        self.path = path
+        self.enabled = True
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path or data_path('search_results.sqlite3'),
+                                   timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''CREATE TABLE IF NOT EXISTS searches (
+                query TEXT PRIMARY KEY,
+                result BLOB NOT NULL,
+                count INTEGER NOT NULL,
+                fetched_at REAL NOT NULL
+            )''')
+            self._local.conn = conn
+        return conn
+
+    def _disable(self, error: Exception):
+        print(f"Search result store unavailable ({error}), not using it", file=sys.stderr)
+        self.enabled = False
+
+    def put(self, query: str, result: dict, fetched_at: float = None):
+        """Save a multi-store result ({'results', 'stores'}) for a query."""
+        if not self.enabled:
+            return
+        blob = zlib.compress(json.dumps(result, ensure_ascii=False, default=json_default).encode('utf-8'))
+        try:
+            self._connection().execute(
+                'INSERT OR REPLACE INTO searches (query, result, count, fetched_at) VALUES (?, ?, ?, ?)',
+                (normalize_query(query), blob, len(result.get('results', [])),
+                 fetched_at if fetched_at is not None else time.time()),
+            )
+        except sqlite3.Error as e:
+            self._disable(e)
+
+    def get(self, query: str, max_age: float = None):
+        """
+        {'result', 'fetchedAt', 'age'} for a query, or None when there is no
+        entry or it is older than max_age seconds.
+        """
+        if not self.enabled:
+            return None
+        try:
+            row = self._connection().execute('SELECT result, fetched_at FROM searches WHERE query = ?',
+                                             (normalize_query(query),)).fetchone()
+        except sqlite3.Error as e:
+            self._disable(e)
+            return None
+        if row is None:
+            return None
+        age = time.time() - row[1]
+        if max_age is not None and age > max_age:
+            return None
+        return {'result': json.loads(zlib.decompress(row[0])), 'fetchedAt': row[1], 'age': round(age, 1)}
+
+    def fetched_at(self, queries) -> dict:
+        """{query: fetched_at} for the queries that have an entry."""
+        if not self.enabled:
+            return {}
+        try:
+            rows = self._connection().execute('SELECT query, fetched_at FROM searches').fetchall()
+        except sqlite3.Error as e:
+            self._disable(e)
+            return {}
+        wanted = {normalize_query(q) for q in queries}
+        return {query: ts for query, ts in rows if query in wanted}
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_search_results() -> SearchResults:
+    """The process-wide store the worker's prewarmed job reads."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SearchResults()
+        return _shared
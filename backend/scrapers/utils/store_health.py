@@ -0,0 +1,266 @@
+"""
+Per-store latency tracking and circuit breaking.
+
+Every request a scraper makes reports its outcome here. From the recent
+successful latencies (the last WINDOW within SAMPLE_MAX_AGE) a store gets
+
+  - an adaptive request timeout: TIMEOUT_FACTOR × p95, clamped to
+    [MIN_TIMEOUT, the scraper's request_timeout]. A store that normally
+    answers in 0.6s then fails after ~4s instead of hanging for 15s;
+  - a hedge delay: the p95 itself. A request still outstanding after that
+    gets a second, identical request, and whichever answers first wins.
+
+Failures (transport errors, timeouts, 429 and 5xx) feed a circuit breaker.
+After FAILURE_THRESHOLD in a row the breaker opens and check() fails fast
+with StoreUnavailable for COOLDOWN seconds. Then a single probe request is
+let through (half-open). Success closes the breaker; failure reopens it
+with the cooldown doubled, up to MAX_COOLDOWN.
+
+State lives in a SQLite file in the scraper data directory, like the rate
+limiter buckets, so the worker, batch checks and the prewarmer all share
+one view of each store. If SQLite fails, the store is tracked in-process.
+"""
+
+import sqlite3
+import sys
+import threading
+import time
+
+from utils.paths import data_path
+
+WINDOW = 50  # latency samples the percentile is taken over
+MIN_SAMPLES = 8  # fewer than this: use the scraper's fixed timeout, don't hedge
+SAMPLE_MAX_AGE = 3600.0  # seconds — older samples don't describe the store any more
+TIMEOUT_FACTOR = 3.0
+MIN_TIMEOUT = 4.0  # seconds
+MIN_HEDGE_DELAY = 0.25  # seconds — never hedge sooner than this
+STATS_TTL = 5.0  # seconds a computed p95 is reused before re-reading samples
+
+FAILURE_THRESHOLD = 5  # consecutive failures that open the breaker
+COOLDOWN = 30.0  # seconds the breaker stays open the first time
+MAX_COOLDOWN = 600.0
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class StoreUnavailable(Exception):
+    """Raised instead of contacting a store whose circuit breaker is open."""
+
+    def __init__(self, store: str, retry_in: float):
+        super().__init__(f"{store} circuit breaker open after repeated failures, retrying in {retry_in:.0f}s")
+        self.store = store
+        self.retry_in = retry_in
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class StoreHealth:
+    def __init__(self, key: str, path: str = None):
+        self.key = key
+        self.path = path
+        self.shared = True
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._p95 = None
+        self._p95_at = 0.0
+        # In-process fallback state
+        self._samples = []  # (at, seconds)
+        self._breaker = (0, 0.0, COOLDOWN)  # (failures, opened_at, cooldown)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path or data_path('store_health.sqlite3'),
+                                   timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''CREATE TABLE IF NOT EXISTS latency (
+                id INTEGER PRIMARY KEY,
+                store TEXT NOT NULL,
+                at REAL NOT NULL,
+                seconds REAL NOT NULL
+            )''')
+            conn.execute('CREATE INDEX IF NOT EXISTS latency_store ON latency (store, id)')
+            conn.execute('''CREATE TABLE IF NOT EXISTS breakers (
+                store TEXT PRIMARY KEY,
+                failures INTEGER NOT NULL,
+                opened_at REAL NOT NULL,
+                cooldown REAL NOT NULL
+            )''')
+            self._local.conn = conn
+        return conn
+
+    def _fall_back(self, error: Exception):
+        print(f"Store health: shared state unavailable ({error}), tracking {self.key} in-process",
+              file=sys.stderr)
+        self.shared = False
+
+    # ── Breaker state ───────────────────────────────────────────
+
+    def _read_breaker(self, conn=None) -> tuple:
+        if not self.shared:
+            return self._breaker
+        row = (conn or self._connection()).execute(
+            'SELECT failures, opened_at, cooldown FROM breakers WHERE store = ?', (self.key,)).fetchone()
+        return row or (0, 0.0, COOLDOWN)
+
+    def _write_breaker(self, breaker: tuple, conn=None):
+        if not self.shared:
+            self._breaker = breaker
+            return
+        (conn or self._connection()).execute(
+            'INSERT OR REPLACE INTO breakers (store, failures, opened_at, cooldown) VALUES (?, ?, ?, ?)',
+            (self.key, *breaker))
+
+    def _update_breaker(self, update):
+        """Apply update(breaker, now) -> new breaker or None atomically; returns update's breaker."""
+        with self._lock:
+            if self.shared:
+                try:
+                    conn = self._connection()
+                    conn.execute('BEGIN IMMEDIATE')
+                    try:
+                        now = time.time()
+                        breaker = self._read_breaker(conn)
+                        new = update(breaker, now)
+                        if new is not None:
+                            self._write_breaker(new, conn)
+                        conn.execute('COMMIT')
+                    except BaseException:
+                        conn.execute('ROLLBACK')
+                        raise
+                    return new if new is not None else breaker
+                except sqlite3.Error as e:
+                    self._fall_back(e)
+            new = update(self._breaker, time.time())
+            if new is not None:
+                self._breaker = new
+            return new if new is not None else self._breaker
+
+    @staticmethod
+    def _state(breaker: tuple, now: float) -> str:
+        failures, opened_at, cooldown = breaker
+        if failures < FAILURE_THRESHOLD:
+            return CLOSED
+        return OPEN if now < opened_at + cooldown else HALF_OPEN
+
+    def _read_breaker_safe(self) -> tuple:
+        try:
+            return self._read_breaker()
+        except sqlite3.Error as e:
+            self._fall_back(e)
+            return self._breaker
+
+    def state(self) -> str:
+        """'closed', 'open' or 'half_open' (cooldown over, next request is a probe)."""
+        return self._state(self._read_breaker_safe(), time.time())
+
+    def check(self):
+        """Raise StoreUnavailable while the breaker is open; let one probe through once it cools down."""
+        if self._state(self._read_breaker_safe(), time.time()) == CLOSED:
+            return
+        blocked = []
+
+        def claim_probe(breaker, now):
+            failures, opened_at, cooldown = breaker
+            state = self._state(breaker, now)
+            if state == OPEN:
+                blocked.append(opened_at + cooldown - now)
+                return None
+            if state == HALF_OPEN:
+                # Re-arm for the probe's duration, so concurrent callers keep failing fast
+                return failures, now, cooldown
+            return None
+
+        self._update_breaker(claim_probe)
+        if blocked:
+            raise StoreUnavailable(self.key, blocked[0])
+
+    # ── Outcomes ────────────────────────────────────────────────
+
+    def success(self, seconds: float):
+        """A request answered (any status but 429/5xx) in `seconds`."""
+        now = time.time()
+        with self._lock:
+            if self.shared:
+                try:
+                    conn = self._connection()
+                    conn.execute('INSERT INTO latency (store, at, seconds) VALUES (?, ?, ?)', (self.key, now, seconds))
+                    # Keep a little more than the window per store
+                    conn.execute('DELETE FROM latency WHERE store = ? AND id <= '
+                                 '(SELECT id FROM latency WHERE store = ? ORDER BY id DESC LIMIT 1 OFFSET ?)',
+                                 (self.key, self.key, WINDOW * 2))
+                except sqlite3.Error as e:
+                    self._fall_back(e)
+            if not self.shared:
+                self._samples = self._samples[-(WINDOW - 1):] + [(now, seconds)]
+            if self._p95 is None:
+                self._p95_at = 0.0  # still warming up: count this sample right away
+        if self._read_breaker_safe()[0]:
+            self._update_breaker(lambda breaker, now: (0, 0.0, COOLDOWN) if breaker[0] else None)
+
+    def failure(self):
+        """A request failed (transport error, timeout, 429 or 5xx)."""
+        def count(breaker, now):
+            failures, opened_at, cooldown = breaker
+            failures += 1
+            if failures < FAILURE_THRESHOLD:
+                return failures, opened_at, cooldown
+            if failures == FAILURE_THRESHOLD:
+                return failures, now, COOLDOWN
+            # A failed probe (or a straggler while open): back off further
+            return failures, now, min(cooldown * 2, MAX_COOLDOWN)
+
+        self._update_breaker(count)
+
+    # ── Latency-derived settings ────────────────────────────────
+
+    def p95(self):
+        """p95 of recent successful latencies in seconds, or None without enough samples."""
+        now = time.time()
+        if now - self._p95_at < STATS_TTL:
+            return self._p95
+        samples = None
+        if self.shared:
+            try:
+                samples = [s for (s,) in self._connection().execute(
+                    'SELECT seconds FROM latency WHERE store = ? AND at >= ? ORDER BY id DESC LIMIT ?',
+                    (self.key, now - SAMPLE_MAX_AGE, WINDOW))]
+            except sqlite3.Error as e:
+                self._fall_back(e)
+        if samples is None:
+            samples = [s for at, s in self._samples if at >= now - SAMPLE_MAX_AGE]
+        self._p95 = percentile(samples, 0.95) if len(samples) >= MIN_SAMPLES else None
+        self._p95_at = now
+        return self._p95
+
+    def timeout(self, default: float) -> float:
+        """Request timeout: TIMEOUT_FACTOR × p95 within [MIN_TIMEOUT, default]."""
+        p95 = self.p95()
+        if p95 is None:
+            return default
+        return max(min(MIN_TIMEOUT, default), min(default, p95 * TIMEOUT_FACTOR))
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging a request, or None when there's too little data."""
+        p95 = self.p95()
+        return None if p95 is None else max(MIN_HEDGE_DELAY, p95)
+
+    def report(self) -> dict:
+        """{'breaker', 'p95'} for status output."""
+        p95 = self.p95()
+        return {'breaker': self.state(), 'p95': round(p95, 3) if p95 is not None else None}
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def store_health(key: str) -> StoreHealth:
+    """The process-wide StoreHealth for a store (one per key)."""
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = StoreHealth(key)
+        return _shared[key]
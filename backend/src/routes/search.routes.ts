@@ -1,11 +1,41 @@
 import { Router, Request, Response } from 'express';
-import { searchAllStores } from '../services/scraper.service';
+import {
+  getPrewarmedResults,
+  queryListingIndex,
+  searchAllStores,
+  streamAllStores,
+} from '../services/scraper.service';
 import { cacheGet, cacheSet } from '../services/cache.service';
 import { rankProducts } from '../services/ranking.service';
 import { prisma } from '../services/prisma.service';
 
 const router = Router();
 
+const SEARCH_CACHE_TTL = 3600; // seconds
+
+/**
+ * Record the search in the user's history (if authenticated).
+ */
+async function logSearch(req: Request, query: string) {
+  const authHeader = req.headers.authorization;
+  if (!authHeader) return;
+  try {
+    const jwt = require('jsonwebtoken');
+    const decoded = jwt.verify(
+      authHeader.split(' ')[1],
+      process.env.JWT_SECRET || 'bhao-super-secret-key'
+    ) as { userId: string };
+    await prisma.searchHistory.create({
+      data: {
+        userId: decoded.userId,
+        query
+      }
+    });
+  } catch {
+    // Non-critical — skip logging if token invalid
+  }
+}
+
 // POST /api/search
 router.post('/', async (req: Request, res: Response) => {
   try {
@@ -24,42 +54,110 @@ router.post('/', async (req: Request, res: Response) => {
       return res.json({ results: cached, source: 'cache' });
     }
 
-    // 2. Cache miss — scrape all stores in parallel
-    const rawResults = await searchAllStores(normalizedKeyword);
+    // 2. Cache miss — popular queries are kept fresh by the prewarmer
+    const prewarmed = await getPrewarmedResults(normalizedKeyword);
+
+    // 2b. Anything the scrapers have seen before: answer from the local index now,
+    //     the worker refreshes it in the background. Not cached — the next request
+    //     reads the refreshed index.
+    if (!prewarmed) {
+      const indexed = await queryListingIndex(normalizedKeyword);
+      if (indexed) {
+        const ranked = rankProducts(indexed.results);
+        await logSearch(req, normalizedKeyword);
+        return res.json({
+          results: ranked, source: 'index', count: ranked.length, stale: indexed.stale, age: indexed.age,
+        });
+      }
+    }
+
+    // Otherwise scrape all stores in parallel
+    const rawResults = prewarmed ? prewarmed.results : await searchAllStores(normalizedKeyword);
 
     // 3. Rank results using Bayesian avg + composite scoring
     const ranked = rankProducts(rawResults);
 
-    // 4. Cache for 1 hour
-    await cacheSet(cacheKey, ranked, 3600);
+    // 4. Cache for 1 hour (prewarmed results: for what's left of their hour)
+    const ttl = prewarmed ? Math.max(60, Math.round(SEARCH_CACHE_TTL - prewarmed.age)) : SEARCH_CACHE_TTL;
+    await cacheSet(cacheKey, ranked, ttl);
 
     // 5. Log search (if authenticated)
-    const authHeader = req.headers.authorization;
-    if (authHeader) {
-      try {
-        const jwt = require('jsonwebtoken');
-        const decoded = jwt.verify(
-          authHeader.split(' ')[1],
-          process.env.JWT_SECRET || 'bhao-super-secret-key'
-        ) as { userId: string };
-        await prisma.searchHistory.create({
-          data: {
-            userId: decoded.userId,
-            query: normalizedKeyword
-          }
-        });
-      } catch {
-        // Non-critical — skip logging if token invalid
-      }
-    }
+    await logSearch(req, normalizedKeyword);
 
-    res.json({ results: ranked, source: 'live', count: ranked.length });
+    res.json({ results: ranked, source: prewarmed ? 'prewarm' : 'live', count: ranked.length });
   } catch (error) {
     console.error('Search error:', error);
     res.status(500).json({ error: 'Search failed' });
   }
 });
 
+// POST /api/search/stream — same search, as newline-delimited JSON events:
+//   {"event":"product","store":"mega","product":{...}}  as soon as a store parses it
+//   {"event":"store","store":"mega","status":"ok","count":30,"elapsed":1.2}
+//   {"event":"done","source":"live","count":112,"results":[...ranked...]}  (source: live, prewarm, index or cache)
+// so the UI can show the fastest store's results while slower stores load
+router.post('/stream', async (req: Request, res: Response) => {
+  const { keyword } = req.body;
+
+  if (!keyword || keyword.trim().length === 0) {
+    return res.status(400).json({ error: 'Search keyword is required' });
+  }
+
+  const normalizedKeyword = keyword.trim().toLowerCase();
+  const cacheKey = `search:${normalizedKeyword}`;
+
+  res.setHeader('Content-Type', 'application/x-ndjson; charset=utf-8');
+  res.setHeader('Cache-Control', 'no-cache');
+  res.flushHeaders();
+  const send = (event: object) => res.write(JSON.stringify(event) + '\n');
+
+  try {
+    const cached = await cacheGet(cacheKey);
+    if (cached) {
+      for (const product of cached) send({ event: 'product', store: product.store, product });
+      send({ event: 'done', source: 'cache', count: cached.length, results: cached });
+      return res.end();
+    }
+
+    const prewarmed = await getPrewarmedResults(normalizedKeyword);
+    if (prewarmed) {
+      const ranked = rankProducts(prewarmed.results);
+      await cacheSet(cacheKey, ranked, Math.max(60, Math.round(SEARCH_CACHE_TTL - prewarmed.age)));
+      await logSearch(req, normalizedKeyword);
+      for (const product of ranked) send({ event: 'product', store: product.store, product });
+      send({ event: 'done', source: 'prewarm', count: ranked.length, results: ranked });
+      return res.end();
+    }
+
+    const indexed = await queryListingIndex(normalizedKeyword);
+    if (indexed) {
+      const ranked = rankProducts(indexed.results);
+      await logSearch(req, normalizedKeyword);
+      for (const product of ranked) send({ event: 'product', store: product.store, product });
+      send({ event: 'done', source: 'index', count: ranked.length, results: ranked, stale: indexed.stale, age: indexed.age });
+      return res.end();
+    }
+
+    const rawResults = await streamAllStores(
+      normalizedKeyword,
+      (product) => send({ event: 'product', store: product.store, product }),
+      (store, status) => send({ event: 'store', store, ...status }),
+    );
+
+    // Final order once every store is in — same ranking and cache as POST /
+    const ranked = rankProducts(rawResults);
+    await cacheSet(cacheKey, ranked, SEARCH_CACHE_TTL);
+    await logSearch(req, normalizedKeyword);
+
+    send({ event: 'done', source: 'live', count: ranked.length, results: ranked });
+    res.end();
+  } catch (error) {
+    console.error('Search stream error:', error);
+    send({ event: 'error', error: 'Search failed' });
+    res.end();
+  }
+});
+
 // GET /api/search/trending — cached trending products
 router.get('/trending', async (_req: Request, res: Response) => {
   try {
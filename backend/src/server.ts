@@ -30,7 +30,7 @@ app.get('/api/health', (_req, res) => {
 app.listen(PORT, () => {
   console.log(`Bhao.pk API running on port ${PORT}`);
 
-  // Start periodic alert checker (every 30 minutes)
+  // Start periodic alert checker (ticks every 5 minutes; checks URLs as they come due)
   startAlertChecker();
 });
 
@@ -1,8 +1,16 @@
 import cron from 'node-cron';
 import { prisma } from './prisma.service';
-import { scrapeProductPage } from './scraper.service';
+import { checkAlertPrices, AlertCheckJob } from './scraper.service';
+
+let running = false;
 
 async function checkAlerts() {
+  // A slow tick must not overlap the next one — its URLs would be checked twice
+  if (running) {
+    console.warn('[Alert Checker] Previous check still running, skipping this tick');
+    return;
+  }
+  running = true;
   console.log(`[Alert Checker] Starting check at ${new Date().toISOString()}`);
 
   try {
@@ -10,62 +18,66 @@ async function checkAlerts() {
       where: { isNotified: false }
     });
 
-    console.log(`[Alert Checker] Checking ${alerts.length} active alerts`);
-
+    // Every active alert goes to the scraper on every tick: it collapses alerts by URL,
+    // detects the store from the URL, and only scrapes the URLs that are due
+    const jobs: AlertCheckJob[] = [];
     for (const alert of alerts) {
-      try {
-        if (!alert.productUrl) continue;
-
-        // Split store namespace out since our DB doesn't have an explicit store column in PriceAlert right now
-        const storeName = alert.productUrl.includes('daraz') ? 'daraz' :
-          (alert.productUrl.includes('mega') ? 'mega' : 'unknown');
-
-        if (storeName === 'unknown') continue;
+      if (!alert.productUrl) continue;
+      jobs.push({ id: alert.id, url: alert.productUrl, targetPrice: alert.targetPrice });
+    }
 
-        const scraped = await scrapeProductPage(alert.productUrl, storeName);
+    console.log(`[Alert Checker] Evaluating ${jobs.length} active alerts`);
 
-        if (!scraped) {
-          console.warn(`[Alert Checker] Failed to scrape alert ${alert.id}`);
-          continue;
+    let checked = 0;
+    await checkAlertPrices(jobs, async (scraped) => {
+      try {
+        if (!scraped.ok) {
+          console.warn(
+            `[Alert Checker] Failed to check ${scraped.url || 'alert'} (alerts ${scraped.ids.join(', ')}):`,
+            (scraped.error || '').slice(0, 200),
+          );
+          return;
         }
+        checked++;
 
-        const currentPrice = scraped.price;
+        const triggered = scraped.triggered || [];
+        if (triggered.length === 0) return;
 
-        if (currentPrice <= alert.targetPrice) {
-          console.log(
-            `[Alert Checker] TRIGGERED: Alert ${alert.id} — ` +
-            `Rs. ${currentPrice} ` +
-            `(target: Rs. ${alert.targetPrice})`
-          );
+        console.log(
+          `[Alert Checker] TRIGGERED: Alerts ${triggered.join(', ')} — ` +
+          `Rs. ${scraped.price} at ${scraped.url}`
+        );
 
-          await prisma.priceAlert.update({
-            where: { id: alert.id },
-            data: { isNotified: true }
-          });
+        await prisma.priceAlert.updateMany({
+          where: { id: { in: triggered } },
+          data: { isNotified: true }
+        });
 
-          // TODO: Send push notification (Expo) and/or email (SendGrid/nodemailer)
-          // For now, just log the trigger
-        }
+        // TODO: Send push notification (Expo) and/or email (SendGrid/nodemailer)
+        // For now, just log the trigger
       } catch (err) {
-        console.error(`[Alert Checker] Error checking alert ${alert.id}:`, err);
+        console.error(`[Alert Checker] Error settling alerts ${scraped.ids.join(', ')}:`, err);
       }
-    }
+    });
 
-    console.log(`[Alert Checker] Check complete`);
+    console.log(`[Alert Checker] Check complete: ${checked} URLs were due and checked`);
   } catch (error) {
     console.error('[Alert Checker] Fatal error:', error);
+  } finally {
+    running = false;
   }
 }
 
 /**
  * Start the periodic alert checker cron job.
- * Runs every 30 minutes.
+ * Ticks every 5 minutes; the scraper decides which product URLs are due,
+ * checking a URL more often the closer its price is to a target.
  */
 export function startAlertChecker() {
-  // Every 30 minutes
-  cron.schedule('*/30 * * * *', () => {
+  // Every 5 minutes
+  cron.schedule('*/5 * * * *', () => {
     checkAlerts();
   });
 
-  console.log('[Alert Checker] Scheduled to run every 30 minutes');
+  console.log('[Alert Checker] Scheduled to tick every 5 minutes');
 }
@@ -12,6 +12,7 @@ interface ScrapedProduct {
   store: string;
   inStock: boolean;
   category?: string;
+  productId?: number;
 }
 
 const CONFIDENCE_THRESHOLD = 25;
@@ -1,7 +1,8 @@
-// Scraper service — spawns Python scrapers and collects results
-// Node.js <-> Python communication via child_process.spawn
+// Scraper service — talks to a long-lived Python scraper worker
+// Node.js <-> Python communication via child_process.spawn + NDJSON over stdio
 
-import { spawn } from 'child_process';
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
+import readline from 'readline';
 import path from 'path';
 import fs from 'fs';
 
@@ -16,6 +17,57 @@ interface ScrapedProduct {
   store: string;
   inStock: boolean;
   category?: string;
+  productId?: number; // Canonical catalog id — same product, same id across searches
+}
+
+interface WorkerJob {
+  mode: 'search' | 'product' | 'prewarmed' | 'query';
+  store: string;
+  keyword?: string;
+  url?: string;
+  catalog?: boolean;
+  stream?: boolean; // Send product/store events while the search runs
+  pages?: number; // Results pages per store (default 1)
+  maxAge?: number; // prewarmed: oldest stored result to accept, in seconds
+  minResults?: number; // query: only refresh in the background if the index had this many
+  wire?: 'json' | 'rows'; // rows: search results as {fields, rows} — smaller and cheaper to encode
+}
+
+// Search results in the worker's compact "rows" wire format: field names once, one array per product
+interface ProductRows {
+  fields: string[];
+  rows: unknown[][];
+}
+
+// Fields left out of a product object when they're unset
+const OPTIONAL_FIELDS = new Set(['category', 'productId']);
+
+interface WorkerResponse {
+  id: string;
+  ok: boolean;
+  result?: any;
+  error?: string;
+}
+
+export interface StoreStatus {
+  status: 'ok' | 'error' | 'timeout' | 'unavailable'; // unavailable: circuit breaker open, store not contacted
+  count: number;
+  elapsed: number;
+  error?: string;
+  breaker?: 'closed' | 'open' | 'half_open';
+}
+
+// Lines a streaming job sends before its final response
+interface WorkerEvent extends Partial<StoreStatus> {
+  id: string;
+  event: 'product' | 'store';
+  store: string;
+  product?: ScrapedProduct;
+}
+
+interface PendingJob {
+  resolve: (response: WorkerResponse | null) => void;
+  onEvent?: (event: WorkerEvent) => void;
 }
 
 const SCRAPERS_DIR = path.join(__dirname, '../../scrapers');
@@ -24,99 +76,330 @@ const VENV_PYTHON = path.join(SCRAPERS_DIR, '.venv', 'bin', 'python3');
 const PYTHON_BIN = fs.existsSync(VENV_PYTHON) ? VENV_PYTHON : 'python3';
 const STORES = ['daraz', 'shophive', 'mega', 'priceoye'];
 const SCRAPER_TIMEOUT = 30000; // 30s per store
+const ALERT_BATCH_TIMEOUT = 4 * 60 * 1000; // an alert tick must end before the next 5-min tick
+// Results pages per store for streamed searches. Later pages arrive after the first results are
+// already on screen, and the worker stops early once a page goes off-topic.
+const STREAM_SEARCH_PAGES = 3;
+const PREWARMED_MAX_AGE = 3600; // seconds — same lifetime as a cached search
+const MIN_INDEX_RESULTS = 5; // fewer local matches than this: search live instead
 
 /**
- * Scrape a single store for a keyword.
- * Spawns the Python scraper as a child process, reads JSON from stdout.
+ * Single long-lived `run_search.py --serve` process.
+ * Keeps the interpreter, imports and HTTP sessions warm across searches.
+ * Respawned lazily on the next job if it exits.
  */
-function scrapeStore(keyword: string, store: string): Promise<ScrapedProduct[]> {
-  return new Promise((resolve, reject) => {
-    const proc = spawn(PYTHON_BIN, [
-      path.join(SCRAPERS_DIR, 'run_search.py'),
-      '--keyword', keyword,
-      '--store', store,
-    ], {
-      timeout: SCRAPER_TIMEOUT,
+class ScraperWorker {
+  private proc: ChildProcessWithoutNullStreams | null = null;
+  private pending = new Map<string, PendingJob>();
+  private nextId = 0;
+
+  private ensureProcess(): ChildProcessWithoutNullStreams {
+    if (this.proc) return this.proc;
+
+    const proc = spawn(PYTHON_BIN, [path.join(SCRAPERS_DIR, 'run_search.py'), '--serve'], {
+      cwd: SCRAPERS_DIR,
       env: { ...process.env, PYTHONIOENCODING: 'utf-8' },
     });
 
-    let stdout = '';
-    let stderr = '';
+    readline.createInterface({ input: proc.stdout }).on('line', (line) => {
+      let response: WorkerResponse | WorkerEvent;
+      try {
+        response = JSON.parse(line);
+      } catch {
+        console.error('Failed to parse scraper worker output:', line.slice(0, 200));
+        return;
+      }
+      const job = this.pending.get(response.id);
+      if (!job) return;
+      if ('event' in response) {
+        job.onEvent?.(response);
+        return;
+      }
+      this.pending.delete(response.id);
+      job.resolve(response);
+    });
+
+    proc.stderr.on('data', (data) => {
+      console.error('Scraper worker:', data.toString().slice(0, 300));
+    });
 
-    proc.stdout.on('data', (data) => { stdout += data.toString(); });
-    proc.stderr.on('data', (data) => { stderr += data.toString(); });
+    const onExit = () => {
+      if (this.proc !== proc) return;
+      this.proc = null;
+      // Fail everything in flight — callers degrade gracefully
+      for (const job of this.pending.values()) job.resolve(null);
+      this.pending.clear();
+    };
+    proc.on('exit', onExit);
+    proc.on('error', (err) => {
+      console.error('Failed to spawn scraper worker:', err.message);
+      onExit();
+    });
 
-    proc.on('close', (code) => {
-      if (code === 0 && stdout.trim()) {
-        try {
-          const products: ScrapedProduct[] = JSON.parse(stdout);
-          resolve(products);
-        } catch (e) {
-          console.error(`Failed to parse ${store} scraper output:`, stdout.slice(0, 200));
-          resolve([]); // Don't fail the whole search for one store
-        }
-      } else {
-        if (stderr) console.error(`${store} scraper error:`, stderr.slice(0, 300));
-        resolve([]); // Graceful degradation — skip failed stores
+    this.proc = proc;
+    return proc;
+  }
+
+  /**
+   * Send one job; resolves with the worker response, or null on timeout/crash.
+   * onEvent receives a streaming job's events as they arrive.
+   */
+  request(
+    job: WorkerJob,
+    timeoutMs: number = SCRAPER_TIMEOUT,
+    onEvent?: (event: WorkerEvent) => void,
+  ): Promise<WorkerResponse | null> {
+    return new Promise((resolve) => {
+      const id = String(++this.nextId);
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        resolve(null);
+      }, timeoutMs);
+
+      this.pending.set(id, {
+        resolve: (response) => {
+          clearTimeout(timer);
+          resolve(response);
+        },
+        onEvent,
+      });
+
+      try {
+        this.ensureProcess().stdin.write(JSON.stringify({ id, ...job }) + '\n');
+      } catch (err) {
+        this.pending.delete(id);
+        clearTimeout(timer);
+        resolve(null);
       }
     });
+  }
+}
 
-    proc.on('error', (err) => {
-      console.error(`Failed to spawn ${store} scraper:`, err.message);
-      resolve([]);
+const worker = new ScraperWorker();
+
+/**
+ * Products from a search result in either wire format ("rows" is zipped
+ * back into the same objects the default format sends).
+ */
+function expandRows(results: ScrapedProduct[] | ProductRows | undefined): ScrapedProduct[] {
+  if (Array.isArray(results)) return results;
+  if (!results || !Array.isArray(results.fields) || !Array.isArray(results.rows)) return [];
+  const { fields, rows } = results;
+  return rows.map((row) => {
+    const product: Record<string, unknown> = {};
+    fields.forEach((field, i) => {
+      if (row[i] === null && OPTIONAL_FIELDS.has(field)) return;
+      product[field] = row[i];
     });
+    return product as unknown as ScrapedProduct;
   });
 }
 
 /**
- * Scrape all stores in parallel for a keyword.
- * Uses Promise.allSettled so one store failure doesn't block others.
+ * Scrape all stores for a keyword.
+ * One multi-store job — the worker fans out to every store concurrently,
+ * so a failed or slow store is reported instead of blocking the others.
  */
 export async function searchAllStores(keyword: string): Promise<ScrapedProduct[]> {
-  const results = await Promise.allSettled(
-    STORES.map(store => scrapeStore(keyword, store))
-  );
+  const response = await worker.request({
+    mode: 'search', store: STORES.join(','), keyword, catalog: true, wire: 'rows',
+  });
 
-  const allProducts: ScrapedProduct[] = [];
+  if (!response) {
+    console.error('Scraper worker timed out or unavailable');
+    return []; // Graceful degradation
+  }
+  if (!response.ok || !response.result) {
+    console.error('Scraper error:', (response.error || '').slice(0, 300));
+    return [];
+  }
 
-  for (const result of results) {
-    if (result.status === 'fulfilled' && result.value.length > 0) {
-      allProducts.push(...result.value);
+  const stores: Record<string, StoreStatus> = response.result.stores || {};
+  for (const [store, status] of Object.entries(stores)) {
+    if (status.status !== 'ok') {
+      console.error(`${store} scraper ${status.status}:`, (status.error || '').slice(0, 300));
     }
   }
 
-  return allProducts;
+  return expandRows(response.result.results);
+}
+
+/**
+ * Results the background prewarmer (scrapers/prewarm.py) already scraped for
+ * a popular query, or null if it has none fresh enough. A local read in the
+ * worker — no store is contacted.
+ */
+export async function getPrewarmedResults(
+  keyword: string,
+): Promise<{ results: ScrapedProduct[]; age: number } | null> {
+  const response = await worker.request({ mode: 'prewarmed', store: '', keyword, maxAge: PREWARMED_MAX_AGE });
+  if (!response || !response.ok || !response.result) return null;
+  const results = response.result.result?.results;
+  if (!Array.isArray(results)) return null;
+  return { results, age: response.result.age || 0 };
+}
+
+export interface IndexedResults {
+  results: (ScrapedProduct & { seenAt: number })[];
+  age: number; // seconds since the freshest result was scraped
+  stale: boolean;
+}
+
+/**
+ * Answer a keyword from the worker's local full-text index of everything the
+ * scrapers have seen (milliseconds, no scraping). If the answer is stale the
+ * worker refreshes it live in the background for the next request.
+ * Returns null when the index has fewer than MIN_INDEX_RESULTS matches.
+ */
+export async function queryListingIndex(keyword: string): Promise<IndexedResults | null> {
+  const response = await worker.request({
+    mode: 'query', store: STORES.join(','), keyword, catalog: true, minResults: MIN_INDEX_RESULTS,
+  });
+  if (!response || !response.ok || !response.result) return null;
+  const { results, age, stale } = response.result;
+  if (!Array.isArray(results) || results.length < MIN_INDEX_RESULTS) return null;
+  return { results, age: age || 0, stale: Boolean(stale) };
+}
+
+/**
+ * Streaming variant of searchAllStores(): onProduct fires for every product
+ * as soon as its store has parsed it, onStore as each store finishes, so
+ * callers can show the fastest store's results first.
+ * Resolves with every product received (empty on timeout/crash).
+ */
+export async function streamAllStores(
+  keyword: string,
+  onProduct: (product: ScrapedProduct) => void,
+  onStore?: (store: string, status: StoreStatus) => void,
+): Promise<ScrapedProduct[]> {
+  const products: ScrapedProduct[] = [];
+  const response = await worker.request(
+    { mode: 'search', store: STORES.join(','), keyword, catalog: true, stream: true, pages: STREAM_SEARCH_PAGES },
+    SCRAPER_TIMEOUT,
+    (event) => {
+      if (event.event === 'product' && event.product) {
+        products.push(event.product);
+        onProduct(event.product);
+      } else if (event.event === 'store') {
+        const status: StoreStatus = {
+          status: event.status || 'error',
+          count: event.count || 0,
+          elapsed: event.elapsed || 0,
+          error: event.error,
+        };
+        if (status.status !== 'ok') {
+          console.error(`${event.store} scraper ${status.status}:`, (status.error || '').slice(0, 300));
+        }
+        onStore?.(event.store, status);
+      }
+    },
+  );
+
+  if (!response) {
+    console.error('Scraper worker timed out or unavailable');
+    return products;
+  }
+  if (!response.ok) {
+    console.error('Scraper error:', (response.error || '').slice(0, 300));
+  }
+  return products;
+}
+
+export interface AlertCheckJob {
+  id: string;
+  url: string;
+  targetPrice: number;
+}
+
+export interface AlertCheckResult {
+  url?: string;
+  store?: string;
+  ids: string[]; // every alert on this URL
+  ok: boolean;
+  price?: number;
+  inStock?: boolean;
+  triggered?: string[]; // ids whose targetPrice the price has reached
+  nextCheck?: number; // unix seconds — when the worker will check this URL again
+  error?: string;
+}
+
+/**
+ * Evaluate price alerts in one `run_search.py --mode alerts` process.
+ * Alerts on the same URL share one check, the store is detected from the
+ * URL, and a URL is only checked when it is due (sooner the closer its price
+ * is to a target), so callers can send every active alert on each tick.
+ * onResult fires once per checked URL, and once per alert that can't be
+ * checked. Resolves with the number of lines received.
+ */
+export function checkAlertPrices(
+  alerts: AlertCheckJob[],
+  onResult: (result: AlertCheckResult) => void | Promise<void>,
+  timeoutMs: number = ALERT_BATCH_TIMEOUT,
+): Promise<number> {
+  return runBatchProcess('alerts', alerts, onResult, timeoutMs, 'Alert check batch');
 }
 
 /**
- * Scrape a single product page to get current price (used by alert checker).
+ * Spawn `run_search.py --mode <mode>`, write jobs as NDJSON to its stdin and
+ * hand every output line to onLine. Resolves with the number of lines once
+ * the process has exited and every onLine call has settled.
  */
-export function scrapeProductPage(url: string, store: string): Promise<{ price: number; inStock: boolean } | null> {
+function runBatchProcess<J, R>(
+  mode: 'batch' | 'alerts',
+  jobs: J[],
+  onLine: (line: R) => void | Promise<void>,
+  timeoutMs: number,
+  label: string,
+): Promise<number> {
   return new Promise((resolve) => {
-    const proc = spawn(PYTHON_BIN, [
-      path.join(SCRAPERS_DIR, 'run_search.py'),
-      '--url', url,
-      '--store', store,
-      '--mode', 'product',
-    ], {
-      timeout: SCRAPER_TIMEOUT,
+    if (jobs.length === 0) return resolve(0);
+
+    const proc = spawn(PYTHON_BIN, [path.join(SCRAPERS_DIR, 'run_search.py'), '--mode', mode], {
+      cwd: SCRAPERS_DIR,
       env: { ...process.env, PYTHONIOENCODING: 'utf-8' },
     });
 
-    let stdout = '';
+    let received = 0;
+    const handlers: Promise<void>[] = [];
+    const timer = setTimeout(() => {
+      console.error(`${label} timed out after ${received} results for ${jobs.length} jobs`);
+      proc.kill();
+    }, timeoutMs);
 
-    proc.stdout.on('data', (data) => { stdout += data.toString(); });
-    proc.on('close', (code) => {
-      if (code === 0 && stdout.trim()) {
-        try {
-          resolve(JSON.parse(stdout));
-        } catch {
-          resolve(null);
-        }
-      } else {
-        resolve(null);
+    readline.createInterface({ input: proc.stdout }).on('line', (line) => {
+      let result: R;
+      try {
+        result = JSON.parse(line);
+      } catch {
+        console.error(`Failed to parse ${mode} output:`, line.slice(0, 200));
+        return;
       }
+      received++;
+      handlers.push(
+        Promise.resolve()
+          .then(() => onLine(result))
+          .catch((err) => console.error(`${label} handler error:`, err)),
+      );
+    });
+
+    proc.stderr.on('data', (data) => {
+      console.error(`${label}:`, data.toString().slice(0, 300));
     });
-    proc.on('error', () => resolve(null));
+
+    let finished = false;
+    const finish = () => {
+      if (finished) return;
+      finished = true;
+      clearTimeout(timer);
+      Promise.all(handlers).then(() => resolve(received));
+    };
+    proc.on('close', finish);
+    proc.on('error', (err) => {
+      console.error(`Failed to spawn ${label.toLowerCase()}:`, err.message);
+      finish();
+    });
+
+    proc.stdin.on('error', () => { /* process died early; reported via close */ });
+    proc.stdin.end(jobs.map((job) => JSON.stringify(job)).join('\n') + '\n');
   });
 }